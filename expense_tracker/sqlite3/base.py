@@ -0,0 +1,16 @@
+"""SQLite backend whose transactions take the write lock when they begin.
+
+Django's backend opens transactions with a deferred ``BEGIN``, so a
+transaction that reads before it writes (e.g. ``select_for_update()``, which
+SQLite ignores) has to upgrade its WAL read snapshot to a write. Once another
+connection has committed in between, SQLite refuses the upgrade with
+"database is locked" straight away; busy_timeout only applies to waiting for
+the lock, not to a stale snapshot. ``BEGIN IMMEDIATE`` waits for the lock up
+front instead, which is what ``select_for_update()`` means to ask for.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,27 @@
+"""Settings for the test suite.
+
+    python manage.py test --settings=expense_tracker.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Tests process queued budget alerts explicitly (alert_queue.process_pending)
+EXPENSES_ALERT_WORKERS = 0
+
+# A view running more queries than its EXPENSES_QUERY_BUDGETS entry fails
+# the test that requested it
+EXPENSES_QUERY_BUDGET_STRICT = True
+
+# A separate replica, so routing is tested against rows that differ from the
+# primary's. Both are migrated; tests that read from it turn it on with
+# override_settings(EXPENSES_READ_REPLICA='replica').
+DATABASES['replica'] = {  # noqa: F405
+    'ENGINE': 'expense_tracker.sqlite3',
+    'NAME': BASE_DIR / 'replica.sqlite3',  # noqa: F405
+}
+EXPENSES_READ_REPLICA = None
+
+# A file rather than SQLite's shared-cache in-memory database, so tests that
+# write from several threads get the WAL locking production runs with
+DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}  # noqa: F405
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .budgets import check_budget_alerts
+from .models import AlertJob, Expense
+
+_executor = None
+_executor_lock = threading.Lock()
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+# Times a job that timed out waiting for another worker's lock is retried
+LOCK_RETRIES = 5
+
+
+def enqueue_alert_check(user, category_id, related_expense=None):
+    """Queue a budget alert evaluation for (user, category).
+
+    Call inside the transaction that wrote the expense: the job commits with
+    it, and the in-process workers are woken once it has.
+    """
+    jobs = AlertJob.objects.filter(user=user, category_id=category_id)
+    if not jobs.update(related_expense=related_expense):
+        try:
+            with transaction.atomic():
+                AlertJob.objects.create(user=user, category_id=category_id, related_expense=related_expense)
+        except IntegrityError:
+            # Coalesced into a job another request just created
+            jobs.update(related_expense=related_expense)
+    transaction.on_commit(schedule_processing)
+
+
+def enqueue_alert_checks(user, category_ids):
+    for category_id in category_ids:
+        enqueue_alert_check(user, category_id)
+
+
+def enqueue_alert_checks_many(pairs):
+    """Queue evaluations for many ``(user_id, category_id)`` pairs with one
+    insert; pairs that already have a pending job keep it."""
+    AlertJob.objects.bulk_create(
+        [AlertJob(user_id=user_id, category_id=category_id) for user_id, category_id in pairs],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    transaction.on_commit(schedule_processing)
+
+
+def process_job(job_id):
+    """Claim and evaluate one job. Returns False if another worker got it."""
+    with transaction.atomic():
+        # Claim with a write before reading anything. SQLite cannot upgrade a
+        # WAL read snapshot to a write once another connection has committed
+        # (SQLITE_BUSY_SNAPSHOT, which busy_timeout does not wait out), while
+        # a transaction that writes first simply queues for the lock.
+        if not AlertJob.objects.filter(pk=job_id).update(enqueued_at=F('enqueued_at')):
+            return False
+        job = AlertJob.objects.select_related('user').get(pk=job_id)
+        AlertJob.objects.filter(pk=job_id).delete()
+        related_expense = None
+        if job.related_expense_id:
+            related_expense = Expense.objects.filter(pk=job.related_expense_id).first()
+        check_budget_alerts(job.user, [job.category_id], related_expense=related_expense)
+
+    lag = (timezone.now() - job.enqueued_at).total_seconds()
+    with _metrics_lock:
+        _metrics['processed'] += 1
+        _metrics['lag_total'] += lag
+        _metrics['lag_max'] = max(_metrics['lag_max'], lag)
+    return True
+
+
+def process_pending(limit=100):
+    """Process up to ``limit`` pending jobs, oldest first."""
+    processed = 0
+    for job_id in AlertJob.objects.order_by('enqueued_at').values_list('pk', flat=True)[:limit]:
+        retries = 0
+        while True:
+            try:
+                claimed = process_job(job_id)
+            except OperationalError:
+                # e.g. SQLite's busy timeout while writers hold the lock; the
+                # claim rolled back, so the job is still queued
+                retries += 1
+                if retries > LOCK_RETRIES:
+                    raise
+                time.sleep(0.1 * 2 ** retries)
+                continue
+            break
+        if claimed:
+            processed += 1
+    return processed
+
+
+def _drain():
+    try:
+        while process_pending():
+            pass
+    finally:
+        connections.close_all()
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Alert worker failed', exc_info=future.exception())
+
+
+def schedule_processing():
+    """Hand pending jobs to the in-process worker pool, if one is configured.
+
+    With ``EXPENSES_ALERT_WORKERS = 0`` jobs wait for ``manage.py
+    run_alert_worker`` instead.
+    """
+    global _executor
+    workers = getattr(settings, 'EXPENSES_ALERT_WORKERS', 1)
+    if workers <= 0:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='alert-worker')
+    _executor.submit(_drain).add_done_callback(_log_failure)
+
+
+def queue_metrics():
+    """Return queue depth and processing lag figures."""
+    pending = AlertJob.objects.aggregate(depth=Count('pk'), oldest=Min('enqueued_at'))
+    with _metrics_lock:
+        processed = _metrics['processed']
+        return {
+            'depth': pending['depth'],
+            'oldest_pending_seconds': (
+                (timezone.now() - pending['oldest']).total_seconds() if pending['oldest'] else 0.0
+            ),
+            'processed': processed,
+            'avg_lag_seconds': _metrics['lag_total'] / processed if processed else 0.0,
+            'max_lag_seconds': _metrics['lag_max'],
+        }
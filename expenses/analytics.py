@@ -0,0 +1,177 @@
+"""Columnar report analytics.
+
+A user's expenses are loaded once into compact NumPy arrays (amounts in
+integer cents, ordinal dates, dense category codes) and every report
+breakdown is computed from them with vectorized ``bincount``/``cumsum``
+kernels instead of one GROUP BY per breakdown. The arrays are memoized per
+process under the user's data version, so any write reloads them on next
+use.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+
+from .caching import get_version
+from .models import Category, Expense
+
+LOAD_CHUNK_SIZE = 10000
+TOP_EXPENSES = 10
+
+_columns = OrderedDict()
+_columns_lock = threading.Lock()
+
+
+class ExpenseColumns:
+    """One user's expenses as parallel arrays, in no particular order."""
+
+    def __init__(self, ids, cents, days, categories, category_ids, category_names):
+        self.ids = ids                    # int64 expense primary keys
+        self.cents = cents                # int64 amounts in cents
+        self.days = days                  # int32 proleptic Gregorian ordinals
+        self.categories = categories      # int32 codes into category_ids
+        self.category_ids = category_ids
+        self.category_names = category_names
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.cents.nbytes + self.days.nbytes + self.categories.nbytes
+
+
+def load_columns(user):
+    """Read the user's expenses from the database into ``ExpenseColumns``."""
+    rows = Expense.objects.filter(user=user).order_by().values_list(
+        'id', 'amount', 'date', 'category_id'
+    ).iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+    ids, cents, days, category_ids = [], [], [], []
+    for pk, amount, day, category_id in rows:
+        ids.append(pk)
+        cents.append(int(amount * 100))
+        days.append(day.toordinal())
+        category_ids.append(category_id)
+
+    codes, categories = np.unique(np.array(category_ids, dtype=np.int64), return_inverse=True)
+    names = dict(Category.objects.filter(pk__in=codes.tolist()).values_list('id', 'name'))
+    return ExpenseColumns(
+        ids=np.array(ids, dtype=np.int64),
+        cents=np.array(cents, dtype=np.int64),
+        days=np.array(days, dtype=np.int32),
+        categories=categories.astype(np.int32),
+        category_ids=codes.tolist(),
+        category_names=[names.get(pk, '') for pk in codes.tolist()]
+    )
+
+
+def user_columns(user):
+    """Return the user's ``ExpenseColumns``, loading them only when the
+    user's data version has moved on since they were last loaded."""
+    version = get_version(user.pk)
+    with _columns_lock:
+        entry = _columns.get(user.pk)
+        if entry is not None and entry[0] == version:
+            _columns.move_to_end(user.pk)
+            return entry[1]
+
+    columns = load_columns(user)
+    with _columns_lock:
+        _columns[user.pk] = (version, columns)
+        _columns.move_to_end(user.pk)
+        while len(_columns) > getattr(settings, 'EXPENSES_ANALYTICS_MAX_USERS', 16):
+            _columns.popitem(last=False)
+    return columns
+
+
+def _month_index(days, year):
+    """Month (0-11) of each ordinal day; only meaningful for days in ``year``."""
+    # Month starts of the year as ordinals, searched with one vectorized call
+    starts = np.array([date(year, month, 1).toordinal() for month in range(1, 13)], dtype=np.int32)
+    return np.searchsorted(starts, days, side='right') - 1
+
+
+def moving_average(values, window):
+    """Trailing moving average; the first ``window - 1`` points average
+    over the values seen so far."""
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def category_percentiles(cents, categories, category_count, percents=(50, 90, 99)):
+    """Per-category amount percentiles (in cents) as a
+    ``category_count x len(percents)`` array, from a single sort."""
+    result = np.zeros((category_count, len(percents)))
+    if not len(cents):
+        return result
+    order = np.lexsort((cents, categories))
+    sorted_cents = cents[order]
+    bounds = np.searchsorted(categories[order], np.arange(category_count + 1))
+    for code in range(category_count):
+        start, end = bounds[code], bounds[code + 1]
+        if end > start:
+            result[code] = np.percentile(sorted_cents[start:end], percents)
+    return result
+
+
+def year_report(columns, year):
+    """Every report breakdown for ``year``.
+
+    Amounts are returned in currency units (floats). Keys: ``monthly_totals``
+    and ``monthly_counts`` (12 each), ``previous_year_totals`` (12),
+    ``category_totals``/``category_counts`` (per category code),
+    ``category_months`` (category x month matrix), ``weekday_averages``
+    (Sunday first, averaged over the days of the year), ``weekly_totals``,
+    ``daily_moving_average`` (30-day, one point per day of the year),
+    ``category_percentiles`` (p50/p90/p99 per category) and ``top_ids``
+    (largest expenses first).
+    """
+    first = date(year, 1, 1).toordinal()
+    last = date(year, 12, 31).toordinal()
+    category_count = len(columns.category_ids)
+
+    in_year = (columns.days >= first) & (columns.days <= last)
+    cents = columns.cents[in_year]
+    days = columns.days[in_year]
+    categories = columns.categories[in_year]
+    months = _month_index(days, year)
+
+    previous = (columns.days >= date(year - 1, 1, 1).toordinal()) & (columns.days < first)
+    previous_months = _month_index(columns.days[previous], year - 1)
+
+    day_of_year = days - first
+    year_length = last - first + 1
+    daily = np.bincount(day_of_year, weights=cents, minlength=year_length)
+
+    # date.toordinal() is 1 for Monday 0001-01-01, so ordinal % 7 is 0 on Sundays
+    weekday_totals = np.bincount(days % 7, weights=cents, minlength=7)
+    weekday_days = np.bincount(np.arange(first, last + 1) % 7, minlength=7)
+
+    # Largest expenses: partition out the top k, then sort only those
+    k = min(TOP_EXPENSES, len(cents))
+    top = np.argpartition(cents, len(cents) - k)[len(cents) - k:] if k else np.zeros(0, dtype=np.int64)
+    top = top[np.argsort(cents[top])[::-1]]
+
+    return {
+        'monthly_totals': np.bincount(months, weights=cents, minlength=12) / 100,
+        'monthly_counts': np.bincount(months, minlength=12),
+        'previous_year_totals': np.bincount(
+            previous_months, weights=columns.cents[previous], minlength=12
+        ) / 100,
+        'category_totals': np.bincount(categories, weights=cents, minlength=category_count) / 100,
+        'category_counts': np.bincount(categories, minlength=category_count),
+        'category_months': np.bincount(
+            categories * 12 + months, weights=cents, minlength=category_count * 12
+        ).reshape(category_count, 12) / 100,
+        'weekday_averages': weekday_totals / weekday_days / 100,
+        'weekly_totals': np.bincount(day_of_year // 7, weights=cents, minlength=(year_length + 6) // 7) / 100,
+        'daily_moving_average': moving_average(daily, 30) / 100,
+        'category_percentiles': category_percentiles(cents, categories, category_count) / 100,
+        'top_ids': columns.ids[in_year][top].tolist(),
+    }
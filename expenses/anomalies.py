@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .inbox import create_alert
+from .models import Expense, SpendingStats
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def ewma_update(count, mean, variance, amount, alpha):
+    """Fold one observation into exponentially weighted mean/variance."""
+    if count == 0:
+        return 1, amount, 0.0
+    diff = amount - mean
+    increment = alpha * diff
+    return count + 1, mean + increment, (1 - alpha) * (variance + diff * increment)
+
+
+def is_irregular(count, mean, variance, amount):
+    """True if ``amount`` is an upward outlier against the current stats."""
+    if count < _setting('EXPENSES_ANOMALY_MIN_SAMPLES', 10):
+        return False
+    # Floor the deviation so categories with near-constant amounts (rent,
+    # subscriptions) are not flagged for a few cents of difference
+    deviation = max(math.sqrt(variance), abs(mean) * 0.1, 0.01)
+    return (amount - mean) / deviation > _setting('EXPENSES_ANOMALY_Z', 3.0)
+
+
+def _locked_stats(user_id, category_id):
+    stats = SpendingStats.objects.select_for_update().filter(user_id=user_id, category_id=category_id).first()
+    if stats is None:
+        try:
+            with transaction.atomic():
+                stats = SpendingStats.objects.create(user_id=user_id, category_id=category_id)
+        except IntegrityError:
+            stats = SpendingStats.objects.select_for_update().get(user_id=user_id, category_id=category_id)
+    return stats
+
+
+def observe_expense(expense):
+    """Check a new expense against its category's statistics, then fold it in.
+
+    Raises an ``irregular_spending`` alert for outliers. Costs one row read
+    and write regardless of history size. Returns the alert, if any.
+    """
+    amount = float(expense.amount)
+    alert = None
+    with transaction.atomic():
+        stats = _locked_stats(expense.user_id, expense.category_id)
+        if is_irregular(stats.count, stats.mean, stats.variance, amount):
+            alert = create_alert(
+                user_id=expense.user_id,
+                alert_type='irregular_spending',
+                message=(
+                    f'Unusual spending in {expense.category.name}: {expense.amount} is well above '
+                    f'your typical {stats.mean:.2f}.'
+                ),
+                related_expense=expense
+            )
+        stats.count, stats.mean, stats.variance = ewma_update(
+            stats.count, stats.mean, stats.variance, amount, _setting('EXPENSES_ANOMALY_ALPHA', 0.1)
+        )
+        stats.save(update_fields=['count', 'mean', 'variance', 'updated_at'])
+    return alert
+
+
+def observe_amounts(user_id, amounts_by_category):
+    """Fold many amounts into the statistics without alerting, e.g. for
+    imported history. ``amounts_by_category`` maps category id to amounts in
+    chronological order."""
+    alpha = _setting('EXPENSES_ANOMALY_ALPHA', 0.1)
+    with transaction.atomic():
+        for category_id, amounts in amounts_by_category.items():
+            stats = _locked_stats(user_id, category_id)
+            state = (stats.count, stats.mean, stats.variance)
+            for amount in amounts:
+                state = ewma_update(*state, float(amount), alpha)
+            stats.count, stats.mean, stats.variance = state
+            stats.save(update_fields=['count', 'mean', 'variance', 'updated_at'])
+
+
+def _affine_scan(scale, shift):
+    """Return the running result of applying ``x -> scale[i] * x + shift[i]``
+    for i = 0, 1, ... starting from 0, for every i. A zero scale starts over.
+
+    Composes the maps pairwise at doubling distances, so it takes log2(n)
+    vectorized steps instead of n Python ones; products of factors at most 1
+    cannot overflow.
+    """
+    scale, shift = scale.copy(), shift.copy()
+    step = 1
+    while step < len(scale):
+        shift[step:] = scale[step:] * shift[:-step] + shift[step:]
+        scale[step:] = scale[step:] * scale[:-step]
+        step *= 2
+    return shift
+
+
+def ewma_scan(amounts, starts, alpha):
+    """``ewma_update`` over whole sequences at once: ``amounts`` holds runs of
+    observations, each beginning where ``starts`` is True. Returns the
+    (mean, variance) arrays after every observation."""
+    kept = np.where(starts, 0.0, 1 - alpha)
+    mean = _affine_scan(kept, np.where(starts, amounts, alpha * amounts))
+    diff = np.where(starts, 0.0, amounts - np.concatenate(([0.0], mean[:-1])))
+    variance = _affine_scan(kept, kept * alpha * diff * diff)
+    return mean, variance
+
+
+def backfill_spending_stats(user=None, chunk_size=5000):
+    """Recompute statistics from existing history in one ordered read,
+    folding every category's amounts with ``ewma_scan``.
+
+    Returns the number of (user, category) statistics written.
+    """
+    alpha = _setting('EXPENSES_ANOMALY_ALPHA', 0.1)
+    expenses = Expense.objects.all()
+    existing = SpendingStats.objects.all()
+    if user is not None:
+        expenses = expenses.filter(user=user)
+        existing = existing.filter(user=user)
+
+    # Cast in SQL: the amounts become floats anyway, and building a Decimal
+    # per row was most of the read's cost
+    rows = np.fromiter(
+        expenses.order_by('user_id', 'category_id', 'date', 'created_at', 'id').values_list(
+            'user_id', 'category_id', Cast('amount', FloatField())
+        ).iterator(chunk_size=chunk_size),
+        dtype=[('user_id', np.int64), ('category_id', np.int64), ('amount', np.float64)]
+    )
+    stats = []
+    if len(rows):
+        keys = rows[['user_id', 'category_id']]
+        starts = np.concatenate(([True], keys[1:] != keys[:-1]))
+        mean, variance = ewma_scan(rows['amount'], starts, alpha)
+        first = np.flatnonzero(starts)
+        last = np.concatenate((first[1:], [len(rows)])) - 1
+        stats = [
+            SpendingStats(user_id=user_id, category_id=category_id, count=count, mean=m, variance=v)
+            for user_id, category_id, count, m, v in zip(
+                rows['user_id'][first].tolist(), rows['category_id'][first].tolist(),
+                (last - first + 1).tolist(), mean[last].tolist(), variance[last].tolist()
+            )
+        ]
+
+    with transaction.atomic():
+        existing.delete()
+        SpendingStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
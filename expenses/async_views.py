@@ -0,0 +1,135 @@
+"""Async counterparts of the JSON API views.
+
+Served through ASGI (``expense_tracker.asgi``) their independent aggregate
+queries run concurrently, each on its own worker thread and database
+connection, instead of one after another.
+"""
+import asyncio
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .caching import acached, data_etag
+from .charts import chart_series
+from .dashboard import DASHBOARD_SECTIONS
+from .views import (
+    CHART_GRANULARITIES, CHART_MAX_MONTHS, COMPACT_JSON, _month_total, _summary_payload,
+    _top_categories,
+)
+
+
+def async_login_required(view):
+    """``login_required`` for async views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _in_thread(func, *args):
+    """Run a blocking ORM call on its own thread so several can overlap."""
+    def run():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+async def _check_etag(request, today):
+    """Return ``(etag, response)``; ``response`` is a 304 when the client
+    already holds the current data, else ``None``."""
+    etag = await sync_to_async(data_etag)(request.user.pk, today)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        _private(response)
+    return etag, response
+
+
+def _private(response):
+    # Private to the user, and always revalidated since any write changes it
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def _json_response(data, etag):
+    response = JsonResponse(data, json_dumps_params=COMPACT_JSON)
+    response['ETag'] = etag
+    _private(response)
+    return response
+
+
+@async_login_required
+async def api_expense_summary(request):
+    """Async API endpoint for expense summary data"""
+    user = request.user
+    today = timezone.now().date()
+    last_month = today - timedelta(days=30)
+    etag, not_modified = await _check_etag(request, today)
+    if not_modified is not None:
+        return not_modified
+
+    async def compute():
+        monthly_total, last_month_total, top_categories = await asyncio.gather(
+            _in_thread(_month_total, user, today),
+            _in_thread(_month_total, user, last_month),
+            _in_thread(_top_categories, user, today),
+        )
+        return _summary_payload(monthly_total, last_month_total, top_categories)
+
+    return _json_response(await acached(user, 'expense_summary', compute, today), etag)
+
+
+@async_login_required
+async def api_expense_chart_data(request):
+    """Async API endpoint for expense chart data"""
+    granularity = request.GET.get('granularity', 'month')
+    if granularity not in CHART_GRANULARITIES:
+        return JsonResponse({'error': 'granularity must be one of day, week, month'}, status=400)
+    try:
+        months = int(request.GET.get('months', 6))
+    except ValueError:
+        return JsonResponse({'error': 'months must be an integer'}, status=400)
+    months = max(1, min(months, CHART_MAX_MONTHS))
+
+    user = request.user
+    today = timezone.now().date()
+    etag, not_modified = await _check_etag(request, today)
+    if not_modified is not None:
+        return not_modified
+
+    async def compute():
+        return await _in_thread(chart_series, user, today, months, granularity)
+
+    return _json_response(await acached(user, 'expense_chart', compute, today, months, granularity), etag)
+
+
+@async_login_required
+async def api_dashboard(request):
+    """Everything the dashboard shows, with each section queried concurrently.
+
+    The ETag is the user's data version, so a client holding the current
+    payload gets a 304 without any aggregate being computed or fetched.
+    """
+    user = request.user
+    today = timezone.now().date()
+
+    etag, not_modified = await _check_etag(request, today)
+    if not_modified is not None:
+        return not_modified
+
+    async def compute():
+        results = await asyncio.gather(*(
+            _in_thread(section, user, today) for section in DASHBOARD_SECTIONS.values()
+        ))
+        return dict(zip(DASHBOARD_SECTIONS, results))
+
+    return _json_response(await acached(user, 'dashboard_payload', compute, today), etag)
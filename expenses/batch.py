@@ -0,0 +1,222 @@
+"""Many expense writes in one request.
+
+``apply_batch`` validates every operation up front without per-item
+queries, then applies them all in one transaction: a single
+``bulk_create``, ``bulk_update`` and filtered delete. What the single-row
+views keep in step per expense (monthly rollup, spending statistics,
+categorizer, budget alert queue) is updated once from the summed changes,
+so budget alerts are re-evaluated once per affected category instead of
+once per row.
+"""
+from collections import Counter, defaultdict
+from copy import copy
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import categorizer, rollups
+from .alert_queue import enqueue_alert_checks
+from .anomalies import observe_amounts
+from .caching import bump_version
+from .forms import ExpenseBatchItemForm
+from .models import Category, Expense
+
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+BATCH_SIZE = 500
+# Batch item field -> Expense attribute
+EXPENSE_FIELDS = {'amount': 'amount', 'description': 'description', 'date': 'date', 'category': 'category_id'}
+
+
+def _invalid(errors):
+    return {'status': 'invalid', 'errors': errors}
+
+
+def _form_errors(form):
+    return {name: list(messages) for name, messages in form.errors.items()}
+
+
+def apply_batch(user, operations):
+    """Apply ``operations`` to the user's expenses, all or nothing.
+
+    Each operation is a dict: ``{"op": "create", "amount", "description",
+    "date", "category"}``, ``{"op": "update", "id", ...}`` with only the
+    fields to change, or ``{"op": "delete", "id"}``. Returns ``(applied,
+    results)`` with one result per operation: its ``status`` (created,
+    updated, deleted, or invalid with ``errors``) and ``id``. If any
+    operation is invalid nothing is written and the valid ones are reported
+    as ``valid``.
+
+    Raises ValueError if ``operations`` is not a list or is longer than
+    ``EXPENSES_BATCH_MAX_OPERATIONS``.
+    """
+    max_operations = getattr(settings, 'EXPENSES_BATCH_MAX_OPERATIONS', 1000)
+    if not isinstance(operations, list):
+        raise ValueError('operations must be a list')
+    if len(operations) > max_operations:
+        raise ValueError(f'A batch may have at most {max_operations} operations')
+
+    category_ids = set(Category.objects.filter(user=user).values_list('id', flat=True))
+    results = [None] * len(operations)
+    creates = []        # (index, cleaned values)
+    updates = {}        # id -> (index, values to change)
+    deletes = {}        # id -> index
+
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in BATCH_OPERATIONS:
+            results[index] = _invalid({'op': [f"op must be one of {', '.join(BATCH_OPERATIONS)}"]})
+            continue
+        if op == 'create':
+            form = ExpenseBatchItemForm(category_ids, operation)
+            if form.is_valid():
+                creates.append((index, form.cleaned_data))
+            else:
+                results[index] = _invalid(_form_errors(form))
+            continue
+
+        pk = operation.get('id')
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            results[index] = _invalid({'id': ['id must be an integer']})
+        elif pk in updates or pk in deletes:
+            results[index] = _invalid({'id': ['The expense appears more than once in the batch']})
+        elif op == 'delete':
+            deletes[pk] = index
+        else:
+            form = ExpenseBatchItemForm(category_ids, operation, partial=True)
+            if form.is_valid():
+                updates[pk] = (index, form.changed_values())
+            else:
+                # Still claim the id, so a later operation on it is rejected too
+                updates[pk] = (index, None)
+                results[index] = _invalid(_form_errors(form))
+
+    with transaction.atomic():
+        existing = Expense.objects.select_for_update().filter(user=user).in_bulk([*updates, *deletes])
+        for pk, index in [*((pk, index) for pk, (index, values) in updates.items()), *deletes.items()]:
+            if pk not in existing and results[index] is None:
+                results[index] = _invalid({'id': ['No such expense']})
+
+        for index, errors in _recurring_clashes(existing, updates).items():
+            results[index] = results[index] or _invalid(errors)
+
+        if any(results):
+            return False, [result or {'status': 'valid'} for result in results]
+
+        created = Expense.objects.bulk_create([
+            Expense(
+                user=user,
+                amount=values['amount'],
+                description=values['description'],
+                date=values['date'],
+                category_id=values['category'],
+                learned=True
+            )
+            for index, values in creates
+        ], batch_size=BATCH_SIZE)
+
+        changed, fields = [], set()
+        now = timezone.now()
+        for pk, (index, values) in updates.items():
+            expense = existing[pk]
+            previous = copy(expense)
+            for name, value in values.items():
+                setattr(expense, EXPENSE_FIELDS[name], value)
+                fields.add(EXPENSE_FIELDS[name])
+            if 'category' in values:
+                # A category set explicitly is the caller's choice, so it is learned
+                expense.learned = True
+                fields.add('learned')
+            # bulk_update does not touch auto_now fields
+            expense.updated_at = now
+            changed.append((previous, expense))
+        if changed:
+            Expense.objects.bulk_update(
+                [expense for previous, expense in changed], sorted(fields | {'updated_at'}), batch_size=BATCH_SIZE
+            )
+
+        deleted = [existing[pk] for pk in deletes]
+        if deleted:
+            Expense.objects.filter(user=user, pk__in=list(deletes)).delete()
+
+        _apply_derived_changes(user, created, changed, deleted)
+
+    for (index, values), expense in zip(creates, created):
+        results[index] = {'status': 'created', 'id': expense.pk}
+    for pk, (index, values) in updates.items():
+        results[index] = {'status': 'updated', 'id': pk}
+    for pk, index in deletes.items():
+        results[index] = {'status': 'deleted', 'id': pk}
+    return True, results
+
+
+def _recurring_clashes(existing, updates):
+    """Errors for the updates that would leave two expenses materialized from
+    one schedule on the same date, by operation index. Queries only when an
+    update moves such an expense."""
+    final = {}
+    moved = []
+    for pk, (index, values) in updates.items():
+        expense = existing.get(pk)
+        if expense is None or values is None or expense.recurring_id is None:
+            continue
+        final[pk] = (index, (expense.recurring_id, values.get('date', expense.date)))
+        if final[pk][1][1] != expense.date:
+            moved.append(pk)
+    if not moved:
+        return {}
+
+    # Every current holder counts, even one the batch moves away or deletes:
+    # the unique key is checked row by row as the update runs, before the
+    # deletes
+    taken = set(Expense.objects.filter(
+        recurring_id__in={final[pk][1][0] for pk in moved},
+        date__in={final[pk][1][1] for pk in moved}
+    ).values_list('recurring_id', 'date'))
+    claims = Counter(key for index, key in final.values())
+    return {
+        final[pk][0]: {'date': ['This recurring expense already has an occurrence on that date.']}
+        for pk in moved
+        if final[pk][1] in taken or claims[final[pk][1]] > 1
+    }
+
+
+def _apply_derived_changes(user, created, changed, deleted):
+    """Bring the rollup, statistics, categorizer and alert queue in step
+    with a batch, one write per bucket or category."""
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    model_changes = []
+    affected = set()
+
+    def count(expense, sign):
+        bucket = totals[(expense.category_id, expense.date.year, expense.date.month)]
+        bucket[0] += sign * expense.amount
+        bucket[1] += sign
+        if expense.learned:
+            model_changes.append(
+                (categorizer.features(expense.description, expense.amount), expense.category_id, sign)
+            )
+        affected.add(expense.category_id)
+
+    for expense in created:
+        count(expense, 1)
+    for previous, expense in changed:
+        count(previous, -1)
+        count(expense, 1)
+    for expense in deleted:
+        count(expense, -1)
+
+    rollups.add_totals(user.pk, {
+        key: (amount, number) for key, (amount, number) in totals.items() if amount or number
+    })
+    categorizer.update_model(user.pk, model_changes)
+    # Like imports, new expenses train the statistics without a per-row alert
+    amounts = defaultdict(list)
+    for expense in sorted(created, key=lambda expense: expense.date):
+        amounts[expense.category_id].append(expense.amount)
+    if amounts:
+        observe_amounts(user.pk, amounts)
+    enqueue_alert_checks(user, sorted(affected))
+    # Bulk writes skip the signals that would bump the version
+    transaction.on_commit(lambda: bump_version(user.pk))
@@ -0,0 +1,188 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .inbox import create_alert
+from .models import Alert, Budget, Expense, MonthlySpend
+from .periods import budget_window, budget_windows, is_full_period
+
+
+def active_budgets(user, today=None, category=None, categories=None):
+    """Return the user's budgets that are running on ``today``."""
+    today = today or timezone.now().date()
+    budgets = Budget.objects.filter(
+        user=user,
+        start_date__lte=today
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=today)
+    )
+    if category is not None:
+        budgets = budgets.filter(category=category)
+    if categories is not None:
+        budgets = budgets.filter(category__in=categories)
+    return budgets
+
+
+def spend_queries(windows):
+    """Build the queries that sum spending over many budget windows.
+
+    ``windows`` is a list of ``(key, budget, (start, end))``. Windows that
+    cover a whole calendar month or year read the MonthlySpend rollup; the
+    rest (days, weeks and partial periods) sum expenses over the window's
+    date range. Every window becomes one conditional ``Sum`` column, so at
+    most two queries run however many windows are asked for.
+    """
+    rollup_sums, rollup_windows = {}, []
+    expense_sums, expense_windows = {}, []
+    for key, budget, (start, end) in windows:
+        owner = Q(user_id=budget.user_id, category_id=budget.category_id)
+        if budget.period in ('monthly', 'yearly') and is_full_period(budget, (start, end)):
+            condition = owner & Q(year=start.year)
+            if budget.period == 'monthly':
+                condition &= Q(month=start.month)
+            rollup_sums[key] = Sum('total', filter=condition)
+            rollup_windows.append((start, end))
+        else:
+            expense_sums[key] = Sum('amount', filter=owner & Q(date__gte=start, date__lte=end))
+            expense_windows.append((start, end))
+
+    user_ids = {budget.user_id for key, budget, window in windows}
+    category_ids = {budget.category_id for key, budget, window in windows}
+
+    # Each query scans only the dates its own windows cover: years of
+    # rollup history must not widen the expense scan
+    queries = []
+    if expense_sums:
+        queries.append(Expense.objects.filter(
+            user_id__in=user_ids,
+            category_id__in=category_ids,
+            date__gte=min(start for start, end in expense_windows),
+            date__lte=max(end for start, end in expense_windows)
+        ).order_by().values('user_id').annotate(**expense_sums))
+    if rollup_sums:
+        queries.append(MonthlySpend.objects.filter(
+            user_id__in=user_ids,
+            category_id__in=category_ids,
+            year__gte=min(start for start, end in rollup_windows).year,
+            year__lte=max(end for start, end in rollup_windows).year
+        ).order_by().values('user_id').annotate(**rollup_sums))
+    return queries
+
+
+def window_spend(windows):
+    """Return ``{key: spent}`` for ``(key, budget, (start, end))`` windows."""
+    spend = {key: Decimal('0') for key, budget, window in windows}
+    for query in spend_queries(windows):
+        for row in query:
+            for key, total in row.items():
+                if key != 'user_id' and total is not None:
+                    spend[key] = total
+    return spend
+
+
+def evaluate_budgets(budgets, today=None):
+    """Evaluate budgets against spending in their current period.
+
+    Returns a list of dicts with ``budget``, ``window_start``/``window_end``
+    (the period bucket containing ``today``), ``spent``, ``remaining`` and
+    ``percent_used`` for every budget in ``budgets``.
+    """
+    today = today or timezone.now().date()
+    budgets = list(budgets.select_related('category'))
+    windows = [(f'b{budget.pk}', budget, budget_window(budget, today)) for budget in budgets]
+    spend = window_spend([item for item in windows if item[2]])
+
+    results = []
+    for key, budget, window in windows:
+        spent = spend.get(key, Decimal('0'))
+        results.append({
+            'budget': budget,
+            'window_start': window[0] if window else None,
+            'window_end': window[1] if window else None,
+            'spent': spent,
+            'remaining': budget.amount - spent,
+            'percent_used': min(100, (spent / budget.amount * 100) if budget.amount > 0 else 0)
+        })
+    return results
+
+
+def budget_history(budgets, today=None, periods=6):
+    """Return ``{budget_id: [...]}`` with the spend of each budget's last
+    ``periods`` windows (oldest first), as dicts with ``start``, ``end``,
+    ``spent`` and ``percent_used``."""
+    today = today or timezone.now().date()
+    windows = []
+    for budget in budgets:
+        for index, window in enumerate(budget_windows(budget, today, periods)):
+            windows.append((f'b{budget.pk}_{index}', budget, window))
+    spend = window_spend(windows)
+
+    history = {budget.pk: [] for budget in budgets}
+    for key, budget, (start, end) in reversed(windows):
+        spent = spend[key]
+        history[budget.pk].append({
+            'start': start,
+            'end': end,
+            'spent': spent,
+            'percent_used': (spent / budget.amount * 100) if budget.amount > 0 else 0
+        })
+    return history
+
+
+def check_budget_alerts(user, categories, related_expense=None, today=None):
+    """Raise budget alerts for the active budgets in ``categories``.
+
+    A budget over its amount gets a ``budget_exceeded`` alert; otherwise the
+    highest ``EXPENSES_BUDGET_THRESHOLDS`` percentage it has reached gets a
+    ``threshold_reached`` alert. Spending is measured over the budget's
+    current period. Each affected budget is evaluated once,
+    however many expenses touched it, and each alert fires at most once per
+    budget period; the database enforces that against concurrent workers.
+    """
+    today = today or timezone.now().date()
+    thresholds = sorted(getattr(settings, 'EXPENSES_BUDGET_THRESHOLDS', [80]))
+
+    pending = []
+    for status in evaluate_budgets(active_budgets(user, today, categories=categories), today):
+        budget = status['budget']
+        if status['spent'] > budget.amount:
+            pending.append((status, 'budget_exceeded', None))
+        elif budget.amount > 0:
+            reached = [level for level in thresholds if status['spent'] * 100 >= budget.amount * level]
+            if reached:
+                pending.append((status, 'threshold_reached', reached[-1]))
+    if not pending:
+        return []
+
+    already_alerted = set(Alert.objects.filter(
+        alert_type__in=['budget_exceeded', 'threshold_reached'],
+        budget__in=[status['budget'] for status, alert_type, level in pending]
+    ).values_list('budget_id', 'period_start', 'alert_type', 'threshold'))
+
+    created = []
+    for status, alert_type, level in pending:
+        budget = status['budget']
+        period_start = status['window_start']
+        if (budget.pk, period_start, alert_type, level) in already_alerted:
+            continue
+        if alert_type == 'budget_exceeded':
+            message = f'Budget exceeded for {budget.category.name}! You have spent {status["spent"]} out of {budget.amount} {budget.get_period_display()}.'
+        else:
+            message = f'You have used {level}% of your {budget.get_period_display().lower()} {budget.category.name} budget ({status["spent"]} of {budget.amount}).'
+        try:
+            created.append(create_alert(
+                user=user,
+                alert_type=alert_type,
+                message=message,
+                related_expense=related_expense,
+                budget=budget,
+                period_start=period_start,
+                threshold=level
+            ))
+        except IntegrityError:
+            # Another worker raised the same alert since the check above
+            pass
+    return created
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+_versions = ContextVar('expenses_data_versions', default=None)
+_pending = ContextVar('expenses_pending_bumps', default=None)
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the cache backend used for per-user aggregates."""
+    return caches[getattr(settings, 'EXPENSES_CACHE_ALIAS', 'default')]
+
+
+def get_version(user_id):
+    """Return the user's current data version.
+
+    The version is a ``DataVersion`` row, so every worker process sees each
+    bump. Within a ``version_scope`` (one request) it is read once.
+    """
+    versions = _versions.get()
+    if versions is not None and user_id in versions:
+        return versions[user_id]
+    version = DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    if version is None:
+        # Seeded from the clock, so it can never collide with a version that
+        # older cached entries were stored under
+        version = DataVersion.objects.get_or_create(user_id=user_id, defaults={'version': time.time_ns()})[0].version
+    if versions is not None:
+        versions[user_id] = version
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached aggregate for the user."""
+    versions = _versions.get()
+    if versions is not None:
+        versions.pop(user_id, None)
+    rows = DataVersion.objects.filter(user_id=user_id)
+    if rows.update(version=F('version') + 1):
+        return
+    # Deleting a user cascades through rows that signal bumps; a user who is
+    # gone has nothing left to invalidate, and a new row would break the key
+    if not User.objects.filter(pk=user_id).exists():
+        return
+    row, created = DataVersion.objects.get_or_create(user_id=user_id, defaults={'version': time.time_ns()})
+    if not created:
+        rows.update(version=F('version') + 1)
+
+
+def bump_on_commit(user_id):
+    """Bump the user's version once the current transaction commits; inside
+    ``bumps_once`` only once per user for the whole block."""
+    pending = _pending.get()
+    if pending is not None:
+        pending.add(user_id)
+    else:
+        transaction.on_commit(lambda: bump_version(user_id))
+
+
+@contextmanager
+def bumps_once():
+    """Collect the bumps of a block that changes many rows (each change
+    signals one) into one per user."""
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for user_id in pending:
+        bump_on_commit(user_id)
+
+
+def replica_caught_up(user_id, alias):
+    """Whether the ``alias`` database holds the user's current version.
+
+    Only then may a request read the user's data there: what it caches and
+    the ETags it sends are keyed by the version of the rows it read.
+    """
+    primary = router.db_for_write(DataVersion)
+    version, replicated = [
+        DataVersion.objects.using(db).filter(user_id=user_id).values_list('version', flat=True).first()
+        for db in (primary, alias)
+    ]
+    versions = _versions.get()
+    if versions is not None and version is not None:
+        # The request reads this version either way: from the replica, or
+        # from the primary when the replica is behind
+        versions[user_id] = version
+    return version is not None and version == replicated
+
+
+@contextmanager
+def version_scope():
+    """Read each user's version at most once until the block exits."""
+    token = _versions.set({})
+    try:
+        yield
+    finally:
+        _versions.reset(token)
+
+
+class DataVersionMiddleware:
+    """Scope version reads to the request: its ETag and cached aggregates
+    share one read of the version."""
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with version_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with version_scope():
+            return await self.get_response(request)
+
+
+def data_etag(user_id, *parts):
+    """Return an ETag that changes whenever the user's data version does.
+
+    It can be compared against ``If-None-Match`` before any aggregate is
+    computed; ``parts`` are the other inputs of the response (e.g. the day).
+    Every worker builds the same ETag, since the version is in the database.
+    """
+    return '"' + '-'.join([str(get_version(user_id))] + [str(part) for part in parts]) + '"'
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[(name, outcome)] += 1
+
+
+def _key(name, user_id, version, parts):
+    return ':'.join(['expenses', name, str(user_id), str(version)] + [str(part) for part in parts])
+
+
+def cached(user, name, compute, *parts):
+    """Return ``compute()`` for the user, cached under their data version.
+
+    ``name`` identifies the aggregate and ``parts`` any parameters it depends
+    on (e.g. the report year).
+    """
+    cache = get_cache()
+    key = _key(name, user.pk, get_version(user.pk), parts)
+    value = cache.get(key)
+    if value is not None:
+        _record(name, 'hits')
+        return value
+
+    _record(name, 'misses')
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+async def acached(user, name, compute, *parts):
+    """Async counterpart of ``cached``; ``compute`` is a coroutine function."""
+    cache = get_cache()
+    key = _key(name, user.pk, await sync_to_async(get_version)(user.pk), parts)
+    value = await cache.aget(key)
+    if value is not None:
+        _record(name, 'hits')
+        return value
+
+    _record(name, 'misses')
+    value = await compute()
+    await cache.aset(key, value)
+    return value
+
+
+def cache_stats():
+    """Return hit/miss counters per aggregate name."""
+    with _stats_lock:
+        stats = {}
+        for (name, outcome), count in _stats.items():
+            stats.setdefault(name, {'hits': 0, 'misses': 0})[outcome] = count
+        return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
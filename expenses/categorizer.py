@@ -0,0 +1,275 @@
+"""Category suggestions from each user's own expense history.
+
+A multinomial naive Bayes model over the words of the description plus a
+coarse amount bucket. Its state is a single ``CategorizerModel`` row per
+user holding how many expenses of each category contained each token, so
+adding, editing or deleting an expense is a counter update rather than a
+retrain. Predicting compiles those counts once into per-token log-odds
+(memoized per process under the user's data version) and then costs one
+dictionary lookup per token.
+"""
+import math
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .caching import get_version
+from .models import CategorizerModel, Category, Expense
+from .search import search_terms
+
+MAX_TOKENS = 20
+SMOOTHING = 1.0
+# The amounts an expense can hold (DecimalField(max_digits=12, decimal_places=2))
+MIN_AMOUNT = Decimal('0.01')
+MAX_AMOUNT = Decimal('9999999999.99')
+
+_classifiers = OrderedDict()
+_classifiers_lock = threading.Lock()
+
+
+def features(description, amount=None):
+    """The distinct tokens of an expense: description words (numbers such
+    as receipt or order ids dropped) and the amount's power-of-two bucket."""
+    tokens = list(dict.fromkeys(term for term in search_terms(description) if not term.isdigit()))[:MAX_TOKENS]
+    if amount is not None and amount > 0:
+        # Clamped first, as log2 overflows or underflows far outside it
+        amount = min(max(amount, MIN_AMOUNT), MAX_AMOUNT)
+        # ':' never occurs in a word token, so buckets cannot collide with words
+        tokens.append(f'amount:{math.floor(math.log2(amount))}')
+    return tokens
+
+
+def add_counts(counts, tokens, category_id, delta):
+    """Add ``delta`` expenses of ``category_id`` with ``tokens`` to ``counts``."""
+    category = str(category_id)
+    docs = counts.setdefault('docs', {})
+    docs[category] = docs.get(category, 0) + delta
+    if docs[category] <= 0:
+        del docs[category]
+    all_tokens = counts.setdefault('tokens', {})
+    for token in tokens:
+        per_category = all_tokens.setdefault(token, {})
+        per_category[category] = per_category.get(category, 0) + delta
+        if per_category[category] <= 0:
+            del per_category[category]
+            if not per_category:
+                del all_tokens[token]
+
+
+def build_counts(rows):
+    """Counts for ``(description, amount, category_id)`` rows, as stored in
+    ``CategorizerModel.counts``."""
+    docs = Counter()
+    tokens = defaultdict(Counter)
+    for description, amount, category_id in rows:
+        docs[category_id] += 1
+        for token in features(description, amount):
+            tokens[token][category_id] += 1
+    return {
+        'docs': {str(category_id): count for category_id, count in docs.items()},
+        'tokens': {
+            token: {str(category_id): count for category_id, count in per_category.items()}
+            for token, per_category in tokens.items()
+        },
+    }
+
+
+def _locked_model(user_id):
+    model = CategorizerModel.objects.select_for_update().filter(user_id=user_id).first()
+    if model is None:
+        try:
+            with transaction.atomic():
+                model = CategorizerModel.objects.create(user_id=user_id)
+        except IntegrityError:
+            model = CategorizerModel.objects.select_for_update().get(user_id=user_id)
+    return model
+
+
+def update_model(user_id, changes):
+    """Apply ``(tokens, category_id, delta)`` changes to the user's model
+    with one locked read and write."""
+    if not changes:
+        return
+    with transaction.atomic():
+        model = _locked_model(user_id)
+        for tokens, category_id, delta in changes:
+            add_counts(model.counts, tokens, category_id, delta)
+        model.save(update_fields=['counts', 'updated_at'])
+
+
+def learn(expense):
+    """Teach the user's model a newly saved expense, saved as ``learned``."""
+    update_model(expense.user_id, [(features(expense.description, expense.amount), expense.category_id, 1)])
+
+
+def forget(expense):
+    """Take an expense (or a snapshot of its previous state) out of the
+    model, if it was ever learned."""
+    if expense.learned:
+        update_model(expense.user_id, [(features(expense.description, expense.amount), expense.category_id, -1)])
+
+
+def relearn(previous, expense):
+    """Move an edited expense's contribution from its previous state to its
+    current one; edits that change no token or category cost nothing. Only
+    states marked ``learned`` are counted."""
+    before = features(previous.description, previous.amount)
+    after = features(expense.description, expense.amount)
+    if (previous.learned == expense.learned and before == after
+            and previous.category_id == expense.category_id):
+        return
+    changes = []
+    if previous.learned:
+        changes.append((before, previous.category_id, -1))
+    if expense.learned:
+        changes.append((after, expense.category_id, 1))
+    update_model(expense.user_id, changes)
+
+
+def learn_many(user_id, rows):
+    """Teach the model many ``(description, amount, category_id)`` rows at
+    once, e.g. from a bulk import."""
+    update_model(user_id, [
+        (features(description, amount), category_id, 1) for description, amount, category_id in rows
+    ])
+
+
+def forget_category(user_id, category_id):
+    """Drop a deleted category from the model."""
+    with transaction.atomic():
+        model = CategorizerModel.objects.select_for_update().filter(user_id=user_id).first()
+        if model is None:
+            return
+        category = str(category_id)
+        model.counts.get('docs', {}).pop(category, None)
+        tokens = model.counts.get('tokens', {})
+        for token in list(tokens):
+            tokens[token].pop(category, None)
+            if not tokens[token]:
+                del tokens[token]
+        model.save(update_fields=['counts', 'updated_at'])
+
+
+def train_categorizer(user=None, chunk_size=5000):
+    """Rebuild models from the ``learned`` expenses in one ordered pass, for
+    one user or everybody. Returns the number of models written."""
+    expenses = Expense.objects.filter(learned=True)
+    existing = CategorizerModel.objects.all()
+    if user is not None:
+        expenses = expenses.filter(user=user)
+        existing = existing.filter(user=user)
+
+    rows = expenses.order_by('user_id').values_list(
+        'user_id', 'description', 'amount', 'category_id'
+    ).iterator(chunk_size=chunk_size)
+
+    models = []
+    current, batch = None, []
+    for user_id, description, amount, category_id in rows:
+        if user_id != current:
+            if current is not None:
+                models.append(CategorizerModel(user_id=current, counts=build_counts(batch)))
+            current, batch = user_id, []
+        batch.append((description, amount, category_id))
+    if current is not None:
+        models.append(CategorizerModel(user_id=current, counts=build_counts(batch)))
+
+    with transaction.atomic():
+        existing.delete()
+        CategorizerModel.objects.bulk_create(models, batch_size=100)
+    return len(models)
+
+
+class Classifier:
+    """A compiled model: per-category log priors and per-token log-odds.
+
+    For category c with N_c tokens seen, a token seen n times in c has
+    log P(token | c) = log(alpha / (N_c + alpha V)) + log((n + alpha) / alpha).
+    The first term is shared by every token, so scoring only visits the
+    categories a token was actually seen in.
+
+    With ``category_names`` (id to name), categories missing from it, i.e.
+    deleted since, are never predicted.
+    """
+
+    def __init__(self, counts, category_names=None, alpha=SMOOTHING):
+        docs = {int(category): count for category, count in counts.get('docs', {}).items() if count > 0}
+        if category_names is not None:
+            docs = {category: count for category, count in docs.items() if category in category_names}
+        self.category_names = category_names or {}
+        tokens = counts.get('tokens', {})
+        token_totals = Counter()
+        self._log_odds = {}
+        for token, per_category in tokens.items():
+            odds = {}
+            for category, count in per_category.items():
+                if int(category) in docs:
+                    token_totals[int(category)] += count
+                    odds[int(category)] = math.log((count + alpha) / alpha)
+            if odds:
+                self._log_odds[token] = odds
+
+        vocabulary = len(self._log_odds) + 1
+        expenses = sum(docs.values())
+        self.category_ids = list(docs)
+        self._prior = {category: math.log(count / expenses) for category, count in docs.items()}
+        self._unseen = {
+            category: math.log(alpha / (token_totals[category] + alpha * vocabulary)) for category in docs
+        }
+
+    def __len__(self):
+        return len(self.category_ids)
+
+    def predict(self, tokens, limit=3):
+        """Return up to ``limit`` ``(category_id, probability)`` pairs, most
+        likely first; empty for a model that has seen no expenses."""
+        if not self._prior:
+            return []
+        known = [self._log_odds[token] for token in tokens if token in self._log_odds]
+        scores = {
+            category: prior + len(known) * self._unseen[category] for category, prior in self._prior.items()
+        }
+        for odds in known:
+            for category, value in odds.items():
+                scores[category] += value
+        best = max(scores.values())
+        weights = {category: math.exp(score - best) for category, score in scores.items()}
+        total = sum(weights.values())
+        ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(category, weight / total) for category, weight in ranked]
+
+    def suggest(self, description, amount=None, limit=3):
+        return self.predict(features(description, amount), limit)
+
+
+def user_classifier(user):
+    """Return the user's compiled ``Classifier``, recompiling only when the
+    user's data version has moved on since it was built."""
+    version = get_version(user.pk)
+    with _classifiers_lock:
+        entry = _classifiers.get(user.pk)
+        if entry is not None and entry[0] == version:
+            _classifiers.move_to_end(user.pk)
+            return entry[1]
+
+    counts = CategorizerModel.objects.filter(user=user).values_list('counts', flat=True).first()
+    classifier = Classifier(counts or {}, dict(Category.objects.filter(user=user).values_list('id', 'name')))
+    with _classifiers_lock:
+        _classifiers[user.pk] = (version, classifier)
+        _classifiers.move_to_end(user.pk)
+        while len(_classifiers) > getattr(settings, 'EXPENSES_CATEGORIZER_MAX_USERS', 256):
+            _classifiers.popitem(last=False)
+    return classifier
+
+
+def suggest_categories(user, description, amount=None, limit=3):
+    """Likely categories for an expense as dicts with ``category_id``,
+    ``category`` and ``probability``."""
+    classifier = user_classifier(user)
+    return [
+        {'category_id': category, 'category': classifier.category_names[category], 'probability': round(probability, 4)}
+        for category, probability in classifier.suggest(description, amount, limit)
+    ]
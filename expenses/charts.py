@@ -0,0 +1,75 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum
+
+from .models import Expense, MonthlySpend
+
+
+def add_months(day, months):
+    """Return the first day of the month ``months`` after ``day``'s month."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def daily_totals(user, start, end):
+    """Spend per day from ``start`` to ``end`` as ``date``/``total`` rows.
+
+    Grouped on the bare date column: a Trunc expression runs a function per
+    row, which SQLite does in Python.
+    """
+    return Expense.objects.filter(
+        user=user,
+        date__gte=start,
+        date__lte=end
+    ).order_by().values('date').annotate(total=Sum('amount'))
+
+
+def chart_series(user, today, months=6, granularity='month'):
+    """Return zero-filled spend totals per day, week or month for the
+    ``months`` calendar months up to ``today``."""
+    # Window covers the current month and the ``months - 1`` before it
+    start = add_months(today, 1 - months)
+
+    if granularity == 'month':
+        # Whole months are already summed in the rollup
+        totals = {
+            date(row['year'], row['month'], 1): row['total']
+            for row in MonthlySpend.objects.filter(
+                user=user
+            ).filter(
+                Q(year__gt=start.year) |
+                Q(year=start.year, month__gte=start.month)
+            ).values('year', 'month').annotate(total=Sum('total'))
+        }
+        step = lambda bucket: add_months(bucket, 1)
+        label_format = '%b %Y'
+    else:
+        if granularity == 'week':
+            start = start - timedelta(days=start.weekday())
+        # Weeks are folded together here from the daily totals
+        totals = defaultdict(int)
+        for row in daily_totals(user, start, today):
+            day = row['date']
+            if granularity == 'week':
+                day -= timedelta(days=day.weekday())
+            totals[day] += row['total']
+        days = 1 if granularity == 'day' else 7
+        step = lambda bucket: bucket + timedelta(days=days)
+        label_format = '%b %d'
+
+    # Zero-fill every bucket in the window
+    labels = []
+    amounts = []
+    bucket = start
+    while bucket <= today:
+        labels.append(bucket.strftime(label_format))
+        amounts.append(float(totals.get(bucket, 0)))
+        bucket = step(bucket)
+
+    return {
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'labels': labels,
+        'data': amounts,
+    }
@@ -0,0 +1,66 @@
+from .budgets import active_budgets, evaluate_budgets
+from .charts import chart_series
+from .inbox import unread_count
+from .models import Expense, MonthlySpend
+
+RECENT_EXPENSES = 5
+
+
+def recent_expenses(user, today):
+    """Latest expenses as compact ``[id, date, amount, category, description]`` rows."""
+    rows = Expense.objects.filter(user=user).order_by('-date', '-created_at', '-id').values_list(
+        'id', 'date', 'amount', 'category__name', 'description'
+    )[:RECENT_EXPENSES]
+    return [
+        [pk, day.isoformat(), float(amount), category, description[:50]]
+        for pk, day, amount, category, description in rows
+    ]
+
+
+def category_totals(user, today):
+    """This month's spend per category, largest first."""
+    rows = MonthlySpend.objects.filter(
+        user=user,
+        year=today.year,
+        month=today.month
+    ).order_by('-total').values_list('category__name', 'total', 'count')
+    return [[category, float(total), count] for category, total, count in rows]
+
+
+def budget_utilization(user, today):
+    """Spend against each active budget's current period."""
+    return [
+        {
+            'id': status['budget'].pk,
+            'category': status['budget'].category.name,
+            'period': status['budget'].period,
+            'amount': float(status['budget'].amount),
+            'spent': float(status['spent']),
+            'percent_used': float(status['percent_used']),
+        }
+        for status in evaluate_budgets(active_budgets(user, today), today)
+    ]
+
+
+def unread_alert_count(user, today):
+    return unread_count(user.pk)
+
+
+def chart(user, today):
+    return chart_series(user, today)
+
+
+# Independent parts of the dashboard payload; each costs its own queries and
+# can be computed concurrently
+DASHBOARD_SECTIONS = {
+    'recent_expenses': recent_expenses,
+    'category_totals': category_totals,
+    'budgets': budget_utilization,
+    'unread_alerts': unread_alert_count,
+    'chart': chart,
+}
+
+
+def dashboard_payload(user, today):
+    """Build every dashboard section one after another."""
+    return {name: section(user, today) for name, section in DASHBOARD_SECTIONS.items()}
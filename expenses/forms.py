@@ -2,8 +2,9 @@ from django import forms
 from django.forms import ModelForm
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
-from .models import Category, Budget, Expense, Alert
+from .models import Category, Budget, Expense, Alert, RecurringExpense
 from django.utils import timezone
+from decimal import Decimal
 
 class CategoryForm(ModelForm):
     class Meta:
@@ -41,6 +42,10 @@ class BudgetForm(ModelForm):
             }),
         }
 
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].queryset = Category.objects.filter(user=user)
+
 class ExpenseForm(ModelForm):
     class Meta:
         model = Expense
@@ -66,6 +71,94 @@ class ExpenseForm(ModelForm):
             'category': forms.Select(attrs={'class': 'form-select'}),
         }
 
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].queryset = Category.objects.filter(user=user)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # A materialized expense cannot move onto another occurrence of its
+        # schedule; the form leaves out ``recurring``, so Django won't check
+        day = cleaned_data.get('date')
+        if day and self.instance.recurring_id and Expense.objects.filter(
+            recurring_id=self.instance.recurring_id, date=day
+        ).exclude(pk=self.instance.pk).exists():
+            self.add_error('date', 'This recurring expense already has an occurrence on that date.')
+        return cleaned_data
+
+class RecurringExpenseForm(ModelForm):
+    class Meta:
+        model = RecurringExpense
+        fields = ['amount', 'description', 'category', 'frequency', 'interval', 'start_date', 'end_date']
+        labels = {
+            'interval': 'Every',
+        }
+        help_texts = {
+            'interval': 'e.g. 2 with a weekly frequency for every other week',
+        }
+        widgets = {
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
+            'description': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. Rent'}),
+            'category': forms.Select(attrs={'class': 'form-select'}),
+            'frequency': forms.Select(attrs={'class': 'form-select'}),
+            'interval': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
+            'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'end_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        }
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].queryset = Category.objects.filter(user=user)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'The end date must not be before the start date.')
+        return cleaned_data
+
+class ExpenseImportForm(forms.Form):
+    file = forms.FileField(
+        label='CSV file',
+        help_text=(
+            'Columns: date (YYYY-MM-DD), description, amount and optionally category. '
+            'Rows without a category get one suggested from your history.'
+        ),
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        })
+    )
+
+class ExpenseBatchItemForm(forms.Form):
+    """One create or update of the batch expense API.
+
+    Categories are checked against the user's category ids passed in, so
+    validating a whole batch costs no queries. With ``partial`` (updates)
+    only the fields sent are validated and changed.
+    """
+    amount = forms.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    description = forms.CharField()
+    date = forms.DateField()
+    category = forms.IntegerField()
+
+    def __init__(self, category_ids, *args, partial=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.category_ids = category_ids
+        if partial:
+            for name, field in self.fields.items():
+                field.required = name in self.data
+
+    def clean_category(self):
+        category = self.cleaned_data['category']
+        if category is not None and category not in self.category_ids:
+            raise forms.ValidationError('Select one of your categories.')
+        return category
+
+    def changed_values(self):
+        """The cleaned values of the fields that were sent."""
+        return {name: value for name, value in self.cleaned_data.items() if name in self.data}
+
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(max_length=254, required=True, widget=forms.EmailInput(attrs={
         'class': 'form-control',
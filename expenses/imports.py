@@ -0,0 +1,177 @@
+import csv
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import rollups
+from .alert_queue import enqueue_alert_checks
+from .anomalies import observe_amounts
+from .caching import bump_version
+from .categorizer import learn_many, user_classifier
+from .models import Category, Expense
+
+DEFAULT_CATEGORY = 'Uncategorized'
+# Rows without a category take the suggested one when it is at least this likely
+SUGGESTION_MIN_PROBABILITY = 0.6
+IMPORT_BATCH_SIZE = 1000
+REQUIRED_COLUMNS = ('date', 'description', 'amount')
+
+
+def _parse_row(row):
+    """Return ``(date, description, amount, category_name)`` or raise
+    ValueError describing what is wrong with the row. ``category_name`` is
+    empty when the row has none."""
+    day = parse_date((row.get('date') or '').strip())
+    if day is None:
+        raise ValueError('invalid date')
+
+    description = (row.get('description') or '').strip()
+    if not description:
+        raise ValueError('missing description')
+    # Text columns cannot store NUL (PostgreSQL rejects it)
+    if '\x00' in description or '\x00' in (row.get('category') or ''):
+        raise ValueError('contains a NUL character')
+
+    try:
+        amount = Decimal((row.get('amount') or '').strip())
+    except InvalidOperation:
+        raise ValueError('invalid amount')
+    if not amount.is_finite() or amount < Decimal('0.01') or amount.as_tuple().exponent < -2:
+        raise ValueError('amount must be at least 0.01 with at most 2 decimal places')
+    if amount.adjusted() >= 10:
+        raise ValueError('amount is too large')
+
+    category = (row.get('category') or '').strip()[:100]
+    return day, description, amount, category
+
+
+def _category_id(user, categories, name):
+    """Look up a category by name in ``categories``, creating it on first sight."""
+    category_id = categories.get(name)
+    if category_id is None:
+        category_id = Category.objects.create(name=name, user=user).pk
+        categories[name] = category_id
+    return category_id
+
+
+@contextmanager
+def _reading(reader):
+    """Report a file that is not UTF-8 text or not CSV as a ValueError."""
+    try:
+        yield
+    except UnicodeDecodeError:
+        raise ValueError('The file is not UTF-8 text; save it as "CSV UTF-8" and try again.') from None
+    except csv.Error as exc:
+        raise ValueError(f'Line {reader.line_num} is not valid CSV ({exc}).') from None
+
+
+def import_expenses(user, lines, batch_size=IMPORT_BATCH_SIZE):
+    """Import expenses for ``user`` from CSV text.
+
+    ``lines`` is any iterable of CSV lines (an open file, an uploaded file
+    wrapped in a text stream, ...) with ``date``, ``description``, ``amount``
+    and an optional ``category`` column. Rows are parsed as they are read and
+    inserted with ``bulk_create`` in batches of ``batch_size``, all inside one
+    transaction. Unknown categories are created on first sight.
+
+    Rows without a category get the one the user's categorizer suggests when
+    it is confident enough, and ``DEFAULT_CATEGORY`` otherwise; rows with
+    one are learned from. Budget alerts are queued once per affected
+    category after the import rather than once per row. Returns a dict with
+    ``imported``, ``categorized`` (rows given a suggested category),
+    ``errors`` (a list of ``(line_number, message)``), ``elapsed`` and
+    ``rows_per_sec``.
+
+    Raises ValueError when the file cannot be read (not UTF-8, or not CSV);
+    nothing is imported then.
+    """
+    started = time.monotonic()
+    reader = csv.DictReader(lines)
+    with _reading(reader):
+        fieldnames = reader.fieldnames or []
+    missing = [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+    if missing:
+        return {
+            'imported': 0,
+            'categorized': 0,
+            'errors': [(1, f"missing column(s): {', '.join(missing)}")],
+            'elapsed': 0.0,
+            'rows_per_sec': 0.0,
+        }
+
+    categories = {
+        name: pk for name, pk in Category.objects.filter(user=user).values_list('name', 'id')
+    }
+    classifier = user_classifier(user)
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    amounts = defaultdict(list)
+    learned = []
+    errors = []
+    imported = categorized = 0
+    batch = []
+
+    with _reading(reader), transaction.atomic():
+        for row in reader:
+            try:
+                day, description, amount, category = _parse_row(row)
+            except ValueError as exc:
+                errors.append((reader.line_num, str(exc)))
+                continue
+
+            if category:
+                category_id = _category_id(user, categories, category)
+                learned.append((description, amount, category_id))
+            else:
+                suggestions = classifier.suggest(description, amount, limit=1)
+                if suggestions and suggestions[0][1] >= SUGGESTION_MIN_PROBABILITY:
+                    category_id = suggestions[0][0]
+                    categorized += 1
+                else:
+                    category_id = _category_id(user, categories, DEFAULT_CATEGORY)
+
+            batch.append(Expense(
+                user=user,
+                category_id=category_id,
+                date=day,
+                description=description,
+                amount=amount,
+                learned=bool(category)
+            ))
+            bucket = totals[(category_id, day.year, day.month)]
+            bucket[0] += amount
+            bucket[1] += 1
+            amounts[category_id].append((day, amount))
+
+            if len(batch) >= batch_size:
+                Expense.objects.bulk_create(batch)
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            Expense.objects.bulk_create(batch)
+            imported += len(batch)
+
+        # bulk_create skips signals, so keep the rollup and cache in step here
+        rollups.add_totals(user.pk, {key: tuple(value) for key, value in totals.items()})
+        # Imported history trains the spending statistics without alerting
+        observe_amounts(user.pk, {
+            category_id: [amount for day, amount in sorted(rows, key=lambda row: row[0])]
+            for category_id, rows in amounts.items()
+        })
+        # Only rows that named their category teach the categorizer
+        learn_many(user.pk, learned)
+        enqueue_alert_checks(user, {category_id for category_id, year, month in totals})
+        transaction.on_commit(lambda: bump_version(user.pk))
+
+    elapsed = time.monotonic() - started
+    return {
+        'imported': imported,
+        'categorized': categorized,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rows_per_sec': imported / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,218 @@
+"""The alert inbox: unread counters, read state, deletion and retention.
+
+Each user's unread count lives in an ``AlertInbox`` row, so showing it is a
+primary-key read instead of counting the alerts table. Everything that
+changes what is unread goes through here and moves the counter in the same
+transaction. Reads and deletes lock the inbox row first, which serializes
+them per user, so the counter moves by exactly the rows each statement
+changed. An inbox is created from the true count the first time it is
+needed.
+
+``compact_alerts`` keeps the table bounded: it collapses duplicates of the
+same alert (irregular spending on one expense) and purges
+alerts past ``EXPENSES_ALERT_RETENTION_DAYS``, a batch per transaction.
+"""
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .caching import bump_version, bumps_once
+from .models import Alert, AlertInbox
+
+COMPACT_BATCH_SIZE = 500
+# Alerts that are copies of one another share these fields; budget alerts
+# cannot be copied, a unique constraint covers them
+DUPLICATE_KEYS = [
+    (Q(alert_type='irregular_spending', related_expense__isnull=False), ('user_id', 'related_expense_id')),
+]
+
+
+def _count_unread(user_id):
+    return Alert.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def _locked_inbox(user_id):
+    inbox = AlertInbox.objects.select_for_update().filter(user_id=user_id).first()
+    if inbox is None:
+        try:
+            with transaction.atomic():
+                inbox = AlertInbox.objects.create(user_id=user_id, unread=_count_unread(user_id))
+        except IntegrityError:
+            inbox = AlertInbox.objects.select_for_update().get(user_id=user_id)
+    return inbox
+
+
+def _add_unread(user_id, delta):
+    """Move the counter by ``delta`` without reading it first."""
+    inbox = AlertInbox.objects.filter(user_id=user_id)
+    if inbox.update(unread=F('unread') + delta, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            AlertInbox.objects.create(user_id=user_id, unread=max(_count_unread(user_id) + delta, 0))
+    except IntegrityError:
+        inbox.update(unread=F('unread') + delta, updated_at=timezone.now())
+
+
+def create_alert(**fields):
+    """Create an alert and count it as unread."""
+    with transaction.atomic():
+        # The counter first: creating a missing inbox counts the alerts,
+        # which must not include this one yet
+        if not fields.get('is_read'):
+            _add_unread(fields['user'].pk if 'user' in fields else fields['user_id'], 1)
+        return Alert.objects.create(**fields)
+
+
+def unread_count(user_id):
+    count = AlertInbox.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    if count is None:
+        with transaction.atomic():
+            count = _locked_inbox(user_id).unread
+    return count
+
+
+def _set_read(user_id, alert_ids, is_read):
+    alerts = Alert.objects.filter(user_id=user_id, is_read=not is_read)
+    if alert_ids is not None:
+        alerts = alerts.filter(pk__in=alert_ids)
+    with transaction.atomic():
+        inbox = _locked_inbox(user_id)
+        changed = alerts.update(is_read=is_read)
+        if changed:
+            inbox.unread = max(inbox.unread + (changed if not is_read else -changed), 0)
+            inbox.save(update_fields=['unread', 'updated_at'])
+            # update() skips the signals that would bump the version
+            transaction.on_commit(lambda: bump_version(user_id))
+    return inbox.unread
+
+
+def mark_read(user_id, alert_ids=None):
+    """Mark the user's alerts ``alert_ids`` (all when None) read. Returns the
+    unread count afterwards."""
+    return _set_read(user_id, alert_ids, True)
+
+
+def mark_unread(user_id, alert_ids):
+    """Mark the user's alerts ``alert_ids`` unread again. Returns the unread
+    count afterwards."""
+    return _set_read(user_id, alert_ids, False)
+
+
+def delete_alerts(user_id, alert_ids=None):
+    """Delete the user's alerts ``alert_ids`` (all when None). Returns how
+    many were deleted."""
+    alerts = Alert.objects.filter(user_id=user_id)
+    if alert_ids is not None:
+        alerts = alerts.filter(pk__in=alert_ids)
+    with transaction.atomic(), bumps_once():
+        inbox = _locked_inbox(user_id)
+        unread = alerts.filter(is_read=False).delete()[0]
+        read = alerts.delete()[0]
+        if unread:
+            inbox.unread = max(inbox.unread - unread, 0)
+            inbox.save(update_fields=['unread', 'updated_at'])
+    return unread + read
+
+
+def _remove(user_ids, deleted, revived=()):
+    """Delete alerts of many users and mark the ``revived`` ones unread,
+    keeping every affected counter exact."""
+    # Each deleted alert signals a version bump, one per user is enough; a
+    # revived alert's user always loses a copy too
+    with transaction.atomic(), bumps_once():
+        # In a fixed order, so two compactions cannot deadlock
+        list(AlertInbox.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id').values_list('pk'))
+        deltas = Counter()
+        for user_id in Alert.objects.filter(pk__in=deleted, is_read=False).values_list('user_id', flat=True):
+            deltas[user_id] -= 1
+        for user_id in Alert.objects.filter(pk__in=revived, is_read=True).values_list('user_id', flat=True):
+            deltas[user_id] += 1
+        removed = Alert.objects.filter(pk__in=deleted).delete()[0]
+        if revived:
+            Alert.objects.filter(pk__in=revived).update(is_read=False)
+        for user_id, delta in deltas.items():
+            if delta:
+                AlertInbox.objects.filter(user_id=user_id).update(
+                    unread=F('unread') + delta, updated_at=timezone.now()
+                )
+    return removed
+
+
+def _copies(rows):
+    """Group ``(id, is_read, user_id, ...)`` rows sorted by everything after
+    ``is_read``; yields ``(user_id, rows)`` for groups of two or more."""
+    current, group = None, []
+    for pk, is_read, *key in rows:
+        if key != current:
+            if len(group) > 1:
+                yield current[0], group
+            current, group = key, []
+        group.append((pk, is_read))
+    if len(group) > 1:
+        yield current[0], group
+
+
+def _duplicate_groups(chunk_size=5000):
+    """Yield ``(user_id, keep, duplicates, unread)`` for every set of copies
+    of one alert: the newest is kept, and ``unread`` says whether any copy
+    dropped was still unread."""
+    for condition, key in DUPLICATE_KEYS:
+        rows = Alert.objects.filter(condition).order_by(*key, '-id').values_list(
+            'id', 'is_read', *key
+        ).iterator(chunk_size=chunk_size)
+        for user_id, group in _copies(rows):
+            copies = group[1:]
+            yield user_id, group[0][0], [pk for pk, is_read in copies], not all(is_read for pk, is_read in copies)
+
+
+def collapse_duplicates(batch_size=COMPACT_BATCH_SIZE):
+    """Delete every copy of an alert but the newest one, which stays unread if
+    any copy was. Returns how many alerts were deleted."""
+    # Planned from one pass over the table, then applied a batch at a time
+    groups = list(_duplicate_groups())
+    removed = 0
+    for start in range(0, len(groups), batch_size):
+        batch = groups[start:start + batch_size]
+        removed += _remove(
+            sorted({user_id for user_id, keep, duplicates, unread in batch}),
+            [pk for user_id, keep, duplicates, unread in batch for pk in duplicates],
+            [keep for user_id, keep, duplicates, unread in batch if unread]
+        )
+    return removed
+
+
+def purge_alerts(before, batch_size=COMPACT_BATCH_SIZE):
+    """Delete alerts created before ``before``, oldest first. Returns how
+    many were deleted."""
+    removed = 0
+    while True:
+        rows = list(Alert.objects.filter(created_at__lt=before).order_by('created_at', 'id').values_list(
+            'id', 'user_id'
+        )[:batch_size])
+        if not rows:
+            return removed
+        removed += _remove(sorted({user_id for pk, user_id in rows}), [pk for pk, user_id in rows])
+
+
+def compact_alerts(now=None, retention_days=None, batch_size=COMPACT_BATCH_SIZE):
+    """Collapse duplicate alerts, then purge those past the retention period.
+
+    Returns a dict with ``duplicates`` and ``purged`` counts and ``elapsed``.
+    """
+    started = time.monotonic()
+    if retention_days is None:
+        retention_days = getattr(settings, 'EXPENSES_ALERT_RETENTION_DAYS', 180)
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    duplicates = collapse_duplicates(batch_size)
+    purged = purge_alerts(cutoff, batch_size)
+    return {
+        'duplicates': duplicates,
+        'purged': purged,
+        'elapsed': time.monotonic() - started,
+    }
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.anomalies import backfill_spending_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-category spending statistics from expense history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only backfill statistics for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        written = backfill_spending_stats(user=user)
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {written} spending statistics.'))
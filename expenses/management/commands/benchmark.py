@@ -0,0 +1,165 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from expenses.caching import bump_version
+from expenses.metrics import request_metrics, reset_request_metrics
+from expenses.models import Expense
+from expenses.pagination import encode_cursor
+
+from .loadtest import percentile
+
+# How far into the expense list the deep-page scenario starts
+DEEP_PAGE_OFFSET = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the expenses views and APIs through the Django test client '
+        'and write latency percentiles and query counts as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to run the requests as, e.g. from seed_synthetic')
+        parser.add_argument('--iterations', type=int, default=50, help='Requests per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per scenario')
+        parser.add_argument('--cold', action='store_true',
+                            help="Invalidate the user's cached aggregates before every request")
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario; repeat for several')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+        parser.add_argument('--tolerance', type=float, default=20.0,
+                            help='Percent p50 slowdown against the baseline counted as a regression')
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        scenarios = self.scenarios(user)
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+            scenarios = {name: path for name, path in scenarios.items() if name in options['scenarios']}
+
+        client = Client(HTTP_HOST=options['host'], raise_request_exception=False)
+        client.force_login(user)
+
+        results = {}
+        for name, path in scenarios.items():
+            results[name] = self.run(client, user, path, options)
+            self.report(name, results[name])
+
+        run = {
+            'started_at': timezone.now().isoformat(),
+            'user': user.username,
+            'expenses': Expense.objects.filter(user=user).count(),
+            'iterations': options['iterations'],
+            'cold': options['cold'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(run, output, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = self.compare(json.load(baseline)['results'], results, options['tolerance'])
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}: {', '.join(regressions)}")
+
+    def scenarios(self, user):
+        """Map scenario names to the paths they request."""
+        scenarios = {
+            'dashboard': reverse('expenses:dashboard'),
+            'api_dashboard': reverse('expenses:api_dashboard'),
+            'expense_list': reverse('expenses:expense_list'),
+        }
+        deep = Expense.objects.filter(user=user).order_by('-date', '-created_at', '-id').values_list(
+            'date', 'created_at', 'id'
+        )[DEEP_PAGE_OFFSET:DEEP_PAGE_OFFSET + 1]
+        if deep:
+            scenarios['expense_list_deep'] = f"{reverse('expenses:expense_list')}?cursor={encode_cursor({}, deep[0])}"
+        scenarios.update({
+            'reports': reverse('expenses:reports'),
+            'budget_list': reverse('expenses:budget_list'),
+            'alerts': reverse('expenses:alerts'),
+            'api_expense_summary': reverse('expenses:api_expense_summary'),
+            'api_expense_chart_data': reverse('expenses:api_expense_chart_data'),
+        })
+        return scenarios
+
+    def run(self, client, user, path, options):
+        for _ in range(options['warmup']):
+            client.get(path)
+
+        view_name = resolve(path.split('?')[0]).view_name
+        reset_request_metrics()
+        latencies = []
+        statuses = {}
+        for _ in range(options['iterations']):
+            if options['cold']:
+                bump_version(user.pk)
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        # Query counts come from RequestMetricsMiddleware, which also sees the
+        # queries async views run on other threads
+        measured = request_metrics().get(view_name, {})
+        return {
+            'path': path,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p90_ms': round(percentile(latencies, 90), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'max_ms': round(max(latencies), 3),
+            'avg_queries': measured.get('avg_queries'),
+            'max_queries': measured.get('max_queries'),
+            'avg_db_ms': measured.get('avg_db_ms'),
+        }
+
+    def report(self, name, result):
+        statuses = ' '.join(f'{status}x{count}' for status, count in result['statuses'].items())
+        self.stdout.write(
+            f"{name:<24} p50 {result['p50_ms']:>8.2f}ms  p90 {result['p90_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  queries {result['max_queries']}  [{statuses}]"
+        )
+
+    def compare(self, baseline, results, tolerance):
+        """Print changes against the baseline and return the regressed scenarios."""
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+            more_queries = (result['max_queries'] or 0) > (before['max_queries'] or 0)
+            regressed = change > tolerance or more_queries
+            line = (
+                f"{name:<24} p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f}ms ({change:+.1f}%)  "
+                f"queries {before['max_queries']} -> {result['max_queries']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+            if regressed:
+                regressions.append(name)
+        return regressions
@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractWeekDay
+from django.utils import timezone
+
+from expenses.analytics import load_columns, year_report
+from expenses.models import Expense
+
+
+def orm_year_report(user, year):
+    """The breakdowns ``year_report`` computes, as one GROUP BY query each."""
+    expenses = Expense.objects.filter(user=user, date__year=year).order_by()
+    previous = Expense.objects.filter(user=user, date__year=year - 1).order_by()
+    return {
+        'monthly': list(expenses.annotate(month=ExtractMonth('date')).values('month').annotate(
+            total=Sum('amount'), count=Count('id'))),
+        'previous_year': list(previous.annotate(month=ExtractMonth('date')).values('month').annotate(
+            total=Sum('amount'))),
+        'categories': list(expenses.values('category_id').annotate(total=Sum('amount'), count=Count('id'))),
+        'category_months': list(expenses.annotate(month=ExtractMonth('date')).values(
+            'category_id', 'month').annotate(total=Sum('amount'))),
+        'weekdays': list(expenses.annotate(weekday=ExtractWeekDay('date')).values('weekday').annotate(
+            total=Sum('amount'))),
+        'daily': list(expenses.values('date').annotate(total=Sum('amount'))),
+        'top': list(expenses.order_by('-amount').values_list('id', flat=True)[:10]),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare building a year's report breakdowns with the NumPy columnar "
+        'engine against one ORM GROUP BY per breakdown'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to report on, e.g. from seed_synthetic')
+        parser.add_argument('--year', type=int, help='Report year (default this year)')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        year = options['year'] or timezone.now().year
+
+        columns = load_columns(user)
+        self.stdout.write(
+            f'{len(columns)} expenses, {columns.nbytes / 1024 / 1024:.1f} MiB of columns, '
+            f'{len(columns.category_ids)} categories'
+        )
+
+        self.report('ORM, one query per breakdown', options['repeat'], lambda: orm_year_report(user, year))
+        self.report('NumPy, load columns', options['repeat'], lambda: load_columns(user))
+        self.report('NumPy, breakdowns from loaded columns', options['repeat'], lambda: year_report(columns, year))
+
+    def report(self, label, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f'{label:<40} median {statistics.median(timings):>10.2f}ms  min {min(timings):>10.2f}ms')
@@ -0,0 +1,79 @@
+import time
+from copy import copy
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from expenses import categorizer, rollups
+from expenses.alert_queue import enqueue_alert_check
+from expenses.batch import apply_batch
+from expenses.models import Expense
+
+DESCRIPTION = 'benchmark_batch'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare recategorizing expenses one at a time, as expense_edit does, '
+        'with one batch, and time batch creates and deletes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to write expenses for, e.g. from seed_synthetic')
+        parser.add_argument('--count', type=int, default=200, help='Expenses per operation (default 200)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        categories = list(user.categories.values_list('id', flat=True))
+        if len(categories) < 2:
+            raise CommandError(f"User '{user.username}' needs at least two categories")
+        today = timezone.now().date()
+        count = options['count']
+
+        applied, results = self.run('batch create', lambda: apply_batch(user, [
+            {
+                'op': 'create',
+                'amount': '12.34',
+                'description': f'{DESCRIPTION} {index}',
+                'date': (today - timedelta(days=index % 60)).isoformat(),
+                'category': categories[index % len(categories)],
+            }
+            for index in range(count)
+        ]))
+        if not applied:
+            raise CommandError(f'Batch create failed: {results}')
+        ids = [result['id'] for result in results]
+
+        def edit_one_by_one():
+            for index, pk in enumerate(ids):
+                with transaction.atomic():
+                    expense = Expense.objects.get(pk=pk, user=user)
+                    previous = copy(expense)
+                    expense.category_id = categories[(index + 1) % len(categories)]
+                    expense.save()
+                    rollups.update_expense(previous, expense)
+                    categorizer.relearn(previous, expense)
+                    enqueue_alert_check(user, expense.category_id, expense)
+
+        self.run('recategorize one by one', edit_one_by_one)
+        self.run('recategorize as a batch', lambda: apply_batch(user, [
+            {'op': 'update', 'id': pk, 'category': categories[index % len(categories)], 'amount': Decimal('23.45')}
+            for index, pk in enumerate(ids)
+        ]))
+        self.run('batch delete', lambda: apply_batch(user, [{'op': 'delete', 'id': pk} for pk in ids]))
+
+    def run(self, label, operation):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = operation()
+            elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'{label:<26} {elapsed:>9.1f}ms  {len(queries):>6} queries')
+        return result
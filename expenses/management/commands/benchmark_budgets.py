@@ -0,0 +1,94 @@
+import statistics
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from expenses.budgets import active_budgets, budget_history
+from expenses.models import Budget, Category, Expense
+from expenses.periods import budget_windows
+
+PERIODS = ['daily', 'weekly', 'monthly', 'yearly']
+
+
+def per_window_history(budgets, today, periods):
+    """What ``budget_history`` returns, with one aggregate query per window."""
+    return {
+        budget.pk: [
+            Expense.objects.filter(
+                user_id=budget.user_id, category_id=budget.category_id, date__gte=start, date__lte=end
+            ).aggregate(total=Sum('amount'))['total']
+            for start, end in reversed(budget_windows(budget, today, periods))
+        ]
+        for budget in budgets
+    }
+
+
+def lifetime_spend(budgets):
+    """The budget's whole lifetime summed, once per budget (the measure that
+    period windows replaced); grows with the budget's age."""
+    return {
+        budget.pk: Expense.objects.filter(
+            user_id=budget.user_id, category_id=budget.category_id, date__gte=budget.start_date
+        ).aggregate(total=Sum('amount'))['total']
+        for budget in budgets
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare budget_history's batched window sums against one query per "
+        'window and against lifetime sums, over open-ended budgets that '
+        'started years ago'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username with expenses, e.g. from seed_synthetic')
+        parser.add_argument('--years', type=int, default=3, help='How long ago the extra budgets started')
+        parser.add_argument('--periods', type=int, default=6, help='Windows of history per budget')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        today = timezone.now().date()
+
+        # The extra budgets are rolled back afterwards
+        with transaction.atomic():
+            start = date(today.year - options['years'], 1, 1)
+            Budget.objects.bulk_create([
+                Budget(user=user, category=category, amount=100, period=period, start_date=start)
+                for category in Category.objects.filter(user=user)
+                for period in PERIODS
+            ])
+            budgets = list(active_budgets(user, today).select_related('category'))
+            self.stdout.write(
+                f"{len(budgets)} open-ended budgets, {Expense.objects.filter(user=user).count()} expenses, "
+                f"{options['periods']} windows each"
+            )
+
+            self.report('budget_history, batched sums', options['repeat'],
+                        lambda: budget_history(budgets, today, options['periods']))
+            self.report('one query per window', options['repeat'],
+                        lambda: per_window_history(budgets, today, options['periods']))
+            self.report('lifetime sum per budget', options['repeat'], lambda: lifetime_spend(budgets))
+            transaction.set_rollback(True)
+
+    def report(self, label, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{label:<32} median {statistics.median(timings):>10.2f}ms  min {min(timings):>10.2f}ms  '
+            f'{len(queries)} queries'
+        )
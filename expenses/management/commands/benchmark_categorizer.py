@@ -0,0 +1,90 @@
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.categorizer import Classifier, add_counts, build_counts, features, suggest_categories
+from expenses.models import Expense
+
+from .loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure category suggestion accuracy on a user's most recent expenses "
+        'after training on the older ones, and prediction and update latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to evaluate, e.g. from seed_synthetic')
+        parser.add_argument('--holdout', type=float, default=0.2,
+                            help='Fraction of the newest expenses to predict (default 0.2)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        if not 0 < options['holdout'] < 1:
+            raise CommandError('--holdout must be between 0 and 1')
+
+        rows = list(Expense.objects.filter(user=user).order_by('date', 'created_at', 'id').values_list(
+            'description', 'amount', 'category_id'
+        ))
+        split = int(len(rows) * (1 - options['holdout']))
+        train, test = rows[:split], rows[split:]
+        if not train or not test:
+            raise CommandError('Not enough expenses to split into training and test sets')
+
+        started = time.perf_counter()
+        counts = build_counts(train)
+        trained = time.perf_counter() - started
+        started = time.perf_counter()
+        classifier = Classifier(counts)
+        compiled = time.perf_counter() - started
+        self.stdout.write(
+            f'{len(train)} training and {len(test)} test expenses, {len(counts["tokens"])} tokens, '
+            f'{len(classifier)} categories; trained in {trained * 1000:.1f}ms, compiled in {compiled * 1000:.1f}ms'
+        )
+
+        # Accuracy, against always guessing the most common category
+        top1 = top3 = 0
+        timings = []
+        for description, amount, category_id in test:
+            started = time.perf_counter()
+            predicted = classifier.suggest(description, amount, limit=3)
+            timings.append((time.perf_counter() - started) * 1e6)
+            ranked = [category for category, probability in predicted]
+            top1 += ranked[:1] == [category_id]
+            top3 += category_id in ranked
+        majority = Counter(category_id for description, amount, category_id in train).most_common(1)[0][0]
+        baseline = sum(category_id == majority for description, amount, category_id in test)
+        self.stdout.write(
+            f'accuracy: top-1 {top1 / len(test):.1%}, top-3 {top3 / len(test):.1%}, '
+            f'most-common-category baseline {baseline / len(test):.1%}'
+        )
+        self.report('predict (compiled model)', timings)
+
+        # Incremental update of the stored counts, without the database round trip
+        timings = []
+        for description, amount, category_id in test:
+            tokens = features(description, amount)
+            started = time.perf_counter()
+            add_counts(counts, tokens, category_id, 1)
+            timings.append((time.perf_counter() - started) * 1e6)
+        self.report('learn (count update)', timings)
+
+        # End to end as the suggest API serves it, model already compiled
+        suggest_categories(user, test[0][0], test[0][1])
+        timings = []
+        for description, amount, category_id in test[:1000]:
+            started = time.perf_counter()
+            suggest_categories(user, description, amount)
+            timings.append((time.perf_counter() - started) * 1e6)
+        self.report('suggest_categories', timings)
+
+    def report(self, label, timings):
+        self.stdout.write(
+            f'{label:<26} p50 {percentile(timings, 50):>9.1f}us  p99 {percentile(timings, 99):>9.1f}us'
+        )
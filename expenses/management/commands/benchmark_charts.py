@@ -0,0 +1,87 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from expenses.charts import add_months, chart_series
+from expenses.models import Expense
+
+
+TRUNCS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def trunc_series(user, today, months, granularity):
+    """Buckets from a ``Trunc`` expression over a date range of expenses."""
+    start = add_months(today, 1 - months)
+    if granularity == 'week':
+        start -= timedelta(days=start.weekday())
+    return list(Expense.objects.filter(user=user, date__gte=start, date__lte=today).annotate(
+        bucket=TRUNCS[granularity]('date', output_field=DateField())
+    ).order_by().values('bucket').annotate(total=Sum('amount')))
+
+
+def per_bucket_series(user, today, months, granularity):
+    """The same buckets as ``chart_series``, one aggregate query each."""
+    bucket = add_months(today, 1 - months)
+    if granularity == 'week':
+        bucket -= timedelta(days=bucket.weekday())
+    totals = []
+    while bucket <= today:
+        if granularity == 'month':
+            end = add_months(bucket, 1)
+        else:
+            end = bucket + timedelta(days=1 if granularity == 'day' else 7)
+        totals.append(Expense.objects.filter(user=user, date__gte=bucket, date__lt=end).aggregate(
+            total=Sum('amount'))['total'])
+        bucket = end
+    return totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the chart endpoint's bucketing (MonthlySpend rollup for "
+        'months, a GROUP BY date otherwise) against Trunc expressions and one '
+        'query per bucket'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, action='append',
+                            help='Username to chart, e.g. from seed_synthetic; repeat for several users')
+        parser.add_argument('--months', type=int, default=12, help='Window size in months')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        months = options['months']
+        self.stdout.write(f'{connection.vendor}, {months} month window')
+        for username in options['user']:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist")
+            self.stdout.write(f'{username}: {Expense.objects.filter(user=user).count()} expenses')
+
+            self.report('month, MonthlySpend rollup', options['repeat'],
+                        lambda: chart_series(user, today, months, 'month'))
+            for granularity in ('month', 'week', 'day'):
+                if granularity != 'month':
+                    self.report(f'{granularity}, date GROUP BY', options['repeat'],
+                                lambda: chart_series(user, today, months, granularity))
+                self.report(f'{granularity}, Trunc{granularity.title()} GROUP BY', options['repeat'],
+                            lambda: trunc_series(user, today, months, granularity))
+                self.report(f'{granularity}, one query per bucket', options['repeat'],
+                            lambda: per_bucket_series(user, today, months, granularity))
+
+    def report(self, label, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f'{label:<40} median {statistics.median(timings):>10.2f}ms  min {min(timings):>10.2f}ms')
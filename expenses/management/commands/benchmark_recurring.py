@@ -0,0 +1,124 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from expenses.models import Category, Expense, RecurringExpense
+from expenses.recurring import MATERIALIZE_BATCH_SIZE, due_dates, materialize_due, reschedule
+
+SCHEDULES = [
+    ('Rent', 'monthly', 1, 1500),
+    ('Streaming subscription', 'monthly', 1, 15),
+    ('Gym membership', 'monthly', 1, 40),
+    ('Phone plan', 'monthly', 1, 35),
+    ('Internet', 'monthly', 1, 60),
+    ('Cleaning service', 'weekly', 2, 80),
+    ('Commuter pass', 'weekly', 1, 25),
+    ('Insurance', 'monthly', 3, 300),
+    ('Domain renewal', 'yearly', 1, 12),
+    ('Coffee beans', 'weekly', 1, 18),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Create synthetic users with recurring schedules and measure how fast '
+        'materialize_recurring turns them into expenses, with several workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--schedules', type=int, default=10, help='Schedules per user')
+        parser.add_argument('--days', type=int, default=31, help='Days of occurrences to catch up on')
+        parser.add_argument('--workers', type=int, default=1, help='Concurrent materializing threads')
+        parser.add_argument('--batch-size', type=int, default=MATERIALIZE_BATCH_SIZE)
+        parser.add_argument('--prefix', default='recurring', help='Username prefix, e.g. recurring0, recurring1, ...')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--flush', action='store_true', help='Delete existing users with the prefix first')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['schedules'] <= len(SCHEDULES):
+            raise CommandError(f'--schedules must be between 1 and {len(SCHEDULES)}')
+        usernames = [f"{options['prefix']}{index}" for index in range(options['users'])]
+        existing = User.objects.filter(username__startswith=options['prefix'])
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"Users with prefix '{options['prefix']}' already exist; pass --flush to replace them")
+            existing.delete()
+
+        today = timezone.now().date()
+        started = time.monotonic()
+        self.create_schedules(usernames, options['schedules'], today - timedelta(days=options['days'] - 1),
+                              random.Random(options['seed']))
+        self.stdout.write(
+            f"Created {len(usernames)} users with {len(usernames) * options['schedules']} schedules "
+            f'in {time.monotonic() - started:.1f}s'
+        )
+
+        expected = self.expected_occurrences(today)
+        self.stdout.write(f'{expected} occurrences due by {today}')
+
+        started = time.monotonic()
+        results = self.run_workers(today, options['workers'], options['batch_size'])
+        elapsed = time.monotonic() - started
+        created = sum(result['expenses'] for result in results)
+        self.stdout.write(
+            f"{options['workers']} workers: {created} expenses from "
+            f"{sum(result['schedules'] for result in results)} schedules in {elapsed:.2f}s "
+            f'({created / elapsed if elapsed else 0:.0f} expenses/sec)'
+        )
+
+        rerun = self.run_workers(today, options['workers'], options['batch_size'])
+        stored = Expense.objects.filter(recurring__user__username__startswith=options['prefix']).count()
+        self.stdout.write(
+            f"Rerun created {sum(result['expenses'] for result in rerun)} expenses; "
+            f'{stored} stored for {expected} due occurrences'
+        )
+        if stored != expected:
+            raise CommandError('Materialized expenses do not match the due occurrences')
+
+    def create_schedules(self, usernames, per_user, first, rng):
+        for offset in range(0, len(usernames), 1000):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=username, password='!') for username in usernames[offset:offset + 1000]
+                ])
+                users = list(User.objects.filter(username__in=[user.username for user in users]))
+                categories = Category.objects.bulk_create([Category(name='Bills', user=user) for user in users])
+                schedules = []
+                for user, category in zip(users, categories):
+                    for description, frequency, interval, median in SCHEDULES[:per_user]:
+                        schedule = RecurringExpense(
+                            user=user,
+                            category=category,
+                            description=description,
+                            amount=Decimal(median * rng.uniform(0.8, 1.2)).quantize(Decimal('0.01')),
+                            frequency=frequency,
+                            interval=interval,
+                            start_date=first + timedelta(days=rng.randrange(28))
+                        )
+                        reschedule(schedule)
+                        schedules.append(schedule)
+                RecurringExpense.objects.bulk_create(schedules, batch_size=5000)
+
+    def expected_occurrences(self, until):
+        return sum(
+            len(due_dates(schedule, until))
+            for schedule in RecurringExpense.objects.filter(next_date__lte=until).iterator(chunk_size=5000)
+        )
+
+    def run_workers(self, until, workers, batch_size):
+        def work(worker):
+            try:
+                return materialize_due(until, batch_size=batch_size)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(work, range(workers)))
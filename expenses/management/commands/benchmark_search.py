@@ -0,0 +1,51 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.models import Expense
+from expenses.search import ranked_search, search_expenses, search_terms
+
+
+class Command(BaseCommand):
+    help = 'Compare full-text search over expense descriptions with an icontains scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to search, e.g. from seed_synthetic')
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Search text; repeat for several (default "uber", "whole foods", "hot", "zzyzx")')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        expenses = Expense.objects.filter(user=user)
+        self.stdout.write(f'{expenses.count()} expenses')
+
+        for text in options['queries'] or ['uber', 'whole foods', 'hot', 'zzyzx']:
+            def scan():
+                matches = expenses
+                for term in search_terms(text):
+                    matches = matches.filter(description__icontains=term)
+                return list(matches.order_by('-date', '-created_at', '-id').values_list('id', flat=True)[:20])
+
+            def indexed():
+                return list(search_expenses(expenses, text).order_by(
+                    '-date', '-created_at', '-id'
+                ).values_list('id', flat=True)[:20])
+
+            def ranked():
+                return list(ranked_search(expenses, text).values_list('id', flat=True)[:20])
+
+            matches = search_expenses(expenses, text).count()
+            self.stdout.write(f'"{text}": {matches} matches')
+            for label, run in (('icontains scan', scan), ('index, newest first', indexed), ('index, ranked', ranked)):
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(f'  {label:<22} median {statistics.median(timings):>9.2f}ms')
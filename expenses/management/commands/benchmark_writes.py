@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from expenses import rollups
+from expenses.alert_queue import enqueue_alert_check
+from expenses.anomalies import backfill_spending_stats, observe_expense
+from expenses.models import Expense
+
+from .loadtest import percentile
+
+DESCRIPTION = 'benchmark_writes'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure write throughput with many threads adding expenses at once, '
+        'making the same writes as expense_add'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to add the expenses for')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Expenses added per thread')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--keep', action='store_true', help='Keep the added expenses instead of deleting them')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        categories = list(user.categories.values_list('id', flat=True))
+        if not categories:
+            raise CommandError(f"User '{user.username}' has no categories")
+
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f"{connection.vendor} {settings_dict['NAME']}, CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}, "
+            f"journal_mode={self.journal_mode()}"
+        )
+
+        today = timezone.now().date()
+        created = []
+        created_lock = threading.Lock()
+
+        def add(thread):
+            latencies = []
+            errors = 0
+            try:
+                for index in range(options['writes']):
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            expense = Expense.objects.create(
+                                user=user,
+                                category_id=categories[(thread + index) % len(categories)],
+                                amount=Decimal('12.34'),
+                                description=DESCRIPTION,
+                                date=today - timedelta(days=index % 60)
+                            )
+                            rollups.add_expense(expense)
+                            enqueue_alert_check(user, expense.category_id, expense)
+                            observe_expense(expense)
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    with created_lock:
+                        created.append(expense.pk)
+            finally:
+                connection.close()
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = list(pool.map(add, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for thread_latencies, errors in outcomes for latency in thread_latencies]
+        result = {
+            'vendor': connection.vendor,
+            'journal_mode': self.journal_mode(),
+            'threads': options['threads'],
+            'writes': len(latencies),
+            'errors': sum(errors for thread_latencies, errors in outcomes),
+            'elapsed_s': round(elapsed, 3),
+            'writes_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        }
+        self.stdout.write(
+            f"{result['writes']} writes in {result['elapsed_s']}s: {result['writes_per_sec']} writes/sec, "
+            f"p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, {result['errors']} failed"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2)
+
+        if not options['keep']:
+            Expense.objects.filter(pk__in=created).delete()
+            rollups.rebuild_monthly_spend(user=user)
+            backfill_spending_stats(user=user)
+
+    def journal_mode(self):
+        if connection.vendor != 'sqlite':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
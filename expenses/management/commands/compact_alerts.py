@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.inbox import COMPACT_BATCH_SIZE, compact_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        'Collapse duplicate alerts and delete those older than '
+        'EXPENSES_ALERT_RETENTION_DAYS, a batch per transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int,
+                            help='Delete alerts older than this many days (default EXPENSES_ALERT_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE,
+                            help='Alerts (or duplicate groups) per transaction')
+
+    def handle(self, *args, **options):
+        if options['retention_days'] is not None and options['retention_days'] < 0:
+            raise CommandError('--retention-days must not be negative')
+
+        result = compact_alerts(retention_days=options['retention_days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {result['duplicates']} duplicate and {result['purged']} expired alerts "
+            f"in {result['elapsed']:.2f}s."
+        ))
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from expenses.budgets import active_budgets, spend_queries
+from expenses.charts import daily_totals
+from expenses.periods import budget_window
+from expenses.models import Alert, AlertInbox, Budget, Category, Expense, MonthlySpend
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN plans for the queries issued by each expenses view"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to build the queries for (defaults to the first user)')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        else:
+            user = User.objects.order_by('pk').first()
+            if user is None:
+                raise CommandError('No users found')
+
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze is only supported on PostgreSQL')
+            explain_options['analyze'] = True
+
+        for view, label, queryset in self.get_queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{view}: {label}'))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
+
+    def get_queries(self, user):
+        """Return (view, description, queryset) for each query worth checking."""
+        today = timezone.now().date()
+        category = Category.objects.filter(user=user).first()
+        expenses = Expense.objects.filter(user=user)
+
+        queries = [
+            ('dashboard', 'recent expenses',
+             expenses.select_related('category').order_by('-date', '-created_at')[:5]),
+            ('dashboard', 'monthly spend by category',
+             MonthlySpend.objects.filter(user=user, year=today.year, month=today.month)
+             .values('category__name', 'total', 'count').order_by('-total')),
+            ('dashboard', 'unread alerts',
+             AlertInbox.objects.filter(user=user).values('unread')),
+            ('expense_list', 'first page',
+             expenses.order_by('-date', '-created_at', '-id')[:10]),
+            ('expense_list', 'date range page',
+             expenses.filter(date__gte=today - timedelta(days=90), date__lte=today)
+             .order_by('-date', '-created_at', '-id')[:10]),
+            ('budget_list', 'expired budgets',
+             Budget.objects.filter(user=user, end_date__lt=today).order_by('-end_date')),
+            ('reports', 'monthly totals',
+             MonthlySpend.objects.filter(user=user, year=today.year)
+             .values('month').annotate(total=Sum('total')).order_by('month')),
+            ('alerts', 'first page',
+             Alert.objects.filter(user=user).order_by('-created_at', '-id')[:20]),
+            ('api_expense_chart_data', 'daily buckets',
+             daily_totals(user, today - timedelta(days=30), today)),
+        ]
+        if category is not None:
+            queries.insert(4, (
+                'expense_list', 'category filter',
+                expenses.filter(category=category).order_by('-date', '-created_at', '-id')[:10]
+            ))
+        budgets = active_budgets(user, today).select_related('category')
+        windows = [(f'b{budget.pk}', budget, budget_window(budget, today)) for budget in budgets]
+        for query in spend_queries(windows):
+            queries.insert(3, ('dashboard', f'budget periods ({query.model.__name__})', query))
+        return queries
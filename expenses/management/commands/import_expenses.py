@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.imports import IMPORT_BATCH_SIZE, import_expenses
+
+
+class Command(BaseCommand):
+    help = 'Import expenses for a user from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with date, description, amount and optional category columns')
+        parser.add_argument('--user', required=True, help='Username to import the expenses for')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                result = import_expenses(user, lines, batch_size=options['batch_size'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for line, message in result['errors']:
+            self.stderr.write(f'line {line}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} expenses in {result['elapsed']:.2f}s "
+            f"({result['rows_per_sec']:.0f} rows/sec), {len(result['errors'])} errors."
+        ))
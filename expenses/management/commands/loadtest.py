@@ -0,0 +1,92 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    '/api/expense-summary/',
+    '/api/async/expense-summary/',
+    '/api/dashboard/',
+]
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test running servers, e.g. the WSGI app against the ASGI app, '
+        'and report p50/p99 latency and requests/sec per endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to authenticate the requests as')
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Base URL of a server to test; repeat to compare servers '
+                                 '(default http://127.0.0.1:8000)')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f"Path to request; repeat for several (default {', '.join(DEFAULT_PATHS)})")
+        parser.add_argument('--requests', type=int, default=500, help='Requests per path and server')
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.create_session(user)}'
+        urls = options['urls'] or ['http://127.0.0.1:8000']
+        paths = options['paths'] or DEFAULT_PATHS
+
+        self.stdout.write(f"{'server':<30} {'path':<36} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>6}")
+        for url in urls:
+            for path in paths:
+                result = self.run(url.rstrip('/') + path, cookie, options['requests'], options['concurrency'])
+                self.stdout.write(
+                    f"{url:<30} {path:<36} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+                    f"{result['rps']:>8.1f} {result['errors']:>6}"
+                )
+
+    def create_session(self, user):
+        """Log the user in server-side and return the session key."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def run(self, url, cookie, total, concurrency):
+        def fetch(_):
+            request = urllib.request.Request(url, headers={'Cookie': cookie})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return (time.perf_counter() - started) * 1000, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, ok in results if ok]
+        return {
+            'p50': percentile(latencies, 50) if latencies else 0.0,
+            'p99': percentile(latencies, 99) if latencies else 0.0,
+            'rps': len(latencies) / elapsed if elapsed else 0.0,
+            'errors': total - len(latencies),
+        }
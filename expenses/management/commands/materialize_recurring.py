@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from expenses.recurring import MATERIALIZE_BATCH_SIZE, materialize_due
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the expenses of every recurring schedule that are due; safe to '
+        'rerun and to run from several workers at once'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Materialize occurrences up to this day, YYYY-MM-DD (default today)')
+        parser.add_argument('--batch-size', type=int, default=MATERIALIZE_BATCH_SIZE,
+                            help='Schedules claimed per transaction')
+
+    def handle(self, *args, **options):
+        until = parse_date(options['date']) if options['date'] else timezone.now().date()
+        if until is None:
+            raise CommandError('--date must be YYYY-MM-DD')
+
+        result = materialize_due(until, batch_size=options['batch_size'])
+        elapsed = result['elapsed']
+        self.stdout.write(self.style.SUCCESS(
+            f"Materialized {result['expenses']} expenses from {result['schedules']} schedules in "
+            f"{result['batches']} batches, {elapsed:.2f}s "
+            f"({result['expenses'] / elapsed if elapsed else 0:.0f} expenses/sec)."
+        ))
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.rollups import rebuild_monthly_spend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly spend rollup table from raw expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the rollup for this username')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        rows = rebuild_monthly_spend(user=user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} monthly spend rows.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from expenses.search import install_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Create the full-text search index over expense descriptions if missing, and re-index them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not install_search_index(connection):
+            rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS(f'Search index ready on {connection.vendor}.'))
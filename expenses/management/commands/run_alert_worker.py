@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses.alert_queue import process_pending, queue_metrics
+
+
+class Command(BaseCommand):
+    help = 'Process queued budget alert evaluations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending(limit=options['batch_size'])
+            if processed and options['verbosity'] >= 2:
+                metrics = queue_metrics()
+                self.stdout.write(
+                    f"processed={processed} depth={metrics['depth']} "
+                    f"avg_lag={metrics['avg_lag_seconds']:.3f}s max_lag={metrics['max_lag_seconds']:.3f}s"
+                )
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        metrics = queue_metrics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Queue drained: {metrics['processed']} jobs processed, {metrics['depth']} pending."
+        ))
@@ -0,0 +1,138 @@
+import math
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from expenses.anomalies import backfill_spending_stats
+from expenses.caching import bump_version
+from expenses.categorizer import train_categorizer
+from expenses.models import Budget, Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+# name: (merchants, median amount, relative frequency)
+CATEGORIES = {
+    'Groceries': (['Whole Foods', 'Trader Joe\'s', 'Safeway', 'Costco', 'Aldi'], 45, 20),
+    'Dining': (['Chipotle', 'Starbucks', 'Local Diner', 'Sushi Bar', 'Pizza Place'], 18, 18),
+    'Transport': (['Uber ride', 'Lyft ride', 'Metro card', 'Shell gas', 'Parking'], 15, 15),
+    'Utilities': (['Electric bill', 'Water bill', 'Internet', 'Phone plan'], 80, 4),
+    'Entertainment': (['Netflix', 'Cinema tickets', 'Concert', 'Spotify', 'Steam'], 20, 8),
+    'Shopping': (['Amazon', 'Target', 'IKEA', 'Best Buy', 'Zara'], 60, 10),
+    'Health': (['Pharmacy', 'Dentist', 'Gym membership', 'Doctor visit'], 40, 4),
+    'Travel': (['Airline ticket', 'Hotel', 'Airbnb', 'Car rental'], 250, 2),
+    'Home': (['Home Depot', 'Cleaning service', 'Furniture', 'Hardware store'], 70, 4),
+    'Education': (['Online course', 'Books', 'Tuition', 'Workshop'], 90, 2),
+}
+PASSWORD = 'synthetic'
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, categories, budgets and expenses for '
+        'benchmarking; the same --seed always produces the same data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--expenses', type=int, default=100000, help='Expenses per user')
+        parser.add_argument('--categories', type=int, default=len(CATEGORIES),
+                            help=f'Categories per user (at most {len(CATEGORIES)})')
+        parser.add_argument('--days', type=int, default=730, help='Days of history to spread expenses over')
+        parser.add_argument('--end-date', help='Last day of history, YYYY-MM-DD (default today)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix, e.g. synthetic0, synthetic1, ...')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help='Delete existing users with the prefix first')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['categories'] <= len(CATEGORIES):
+            raise CommandError(f'--categories must be between 1 and {len(CATEGORIES)}')
+        end = parse_date(options['end_date']) if options['end_date'] else timezone.now().date()
+        if end is None:
+            raise CommandError('--end-date must be YYYY-MM-DD')
+
+        usernames = [f"{options['prefix']}{index}" for index in range(options['users'])]
+        existing = User.objects.filter(username__in=usernames)
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"Users with prefix '{options['prefix']}' already exist; pass --flush to replace them")
+            existing.delete()
+
+        password = make_password(PASSWORD)
+        started = time.monotonic()
+        total = 0
+        for index, username in enumerate(usernames):
+            rng = random.Random(f"{options['seed']}:{index}")
+            with transaction.atomic():
+                user = User.objects.create(username=username, password=password)
+                categories = self.create_categories(user, options['categories'])
+                self.create_budgets(user, categories, end, options['expenses'] * 30 / options['days'], rng)
+                total += self.create_expenses(
+                    user, categories, end, options['days'], options['expenses'], options['batch_size'], rng
+                )
+            rebuild_monthly_spend(user=user)
+            backfill_spending_stats(user=user)
+            train_categorizer(user=user)
+            bump_version(user.pk)
+            self.stdout.write(f'{username}: {options["expenses"]} expenses')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(usernames)} users and {total} expenses in {elapsed:.1f}s '
+            f'({total / elapsed if elapsed else 0:.0f} expenses/sec); password is "{PASSWORD}".'
+        ))
+
+    def create_categories(self, user, count):
+        return Category.objects.bulk_create([
+            Category(name=name, user=user)
+            for name in list(CATEGORIES)[:count]
+        ])
+
+    def create_budgets(self, user, categories, end, per_month, rng):
+        total_weight = sum(CATEGORIES[category.name][2] for category in categories)
+        budgets = []
+        for category in categories:
+            merchants, median, weight = CATEGORIES[category.name]
+            # Roughly what a month of this category costs, give or take, so
+            # some budgets run over and some do not
+            expected = per_month * weight / total_weight * median * 1.2
+            monthly = Decimal(max(1.0, expected * rng.uniform(0.8, 1.3))).quantize(Decimal('1'))
+            budgets.append(Budget(
+                user=user,
+                category=category,
+                amount=monthly,
+                period='monthly',
+                start_date=end.replace(day=1) - timedelta(days=365)
+            ))
+        Budget.objects.bulk_create(budgets)
+
+    def create_expenses(self, user, categories, end, days, count, batch_size, rng):
+        weights = [CATEGORIES[category.name][2] for category in categories]
+        first = end - timedelta(days=days - 1)
+        batch = []
+        for _ in range(count):
+            category = rng.choices(categories, weights)[0]
+            merchants, median, weight = CATEGORIES[category.name]
+            # Log-normal around the category's median: mostly small, a long tail
+            amount = Decimal(max(0.5, median * math.exp(rng.gauss(0, 0.6)))).quantize(Decimal('0.01'))
+            batch.append(Expense(
+                user=user,
+                category=category,
+                amount=amount,
+                description=f'{rng.choice(merchants)} #{rng.randrange(1000, 9999)}',
+                date=first + timedelta(days=rng.randrange(days)),
+                learned=True
+            ))
+            if len(batch) >= batch_size:
+                Expense.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Expense.objects.bulk_create(batch)
+        return count
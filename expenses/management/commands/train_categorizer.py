@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.categorizer import train_categorizer
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the category suggestion models from expense history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only retrain the model of this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        written = train_categorizer(user=user)
+        self.stdout.write(self.style.SUCCESS(f'Trained {written} categorizer models.'))
@@ -0,0 +1,222 @@
+"""Per-request query count and latency instrumentation.
+
+``RequestMetricsMiddleware`` measures every request and aggregates the
+results per URL name. It records the number of SQL queries, time spent in
+the database, time spent rendering templates, and total latency. The
+aggregates are kept in process and served by ``views.metrics``. Views can be
+given a query budget in ``EXPENSES_QUERY_BUDGETS``; with
+``EXPENSES_QUERY_BUDGET_STRICT`` on (as in test settings), going over it
+raises ``QueryBudgetExceeded``.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+from .routers import replica_alias
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+_current = ContextVar('expenses_request_metrics', default=None)
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Counters for one request, shared by every thread working on it."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.queries += 1
+            self.db_time += duration
+
+    def add_template(self, duration):
+        with self._lock:
+            self.template_time += duration
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper crediting queries to the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - start)
+
+
+def install_query_timer(connection):
+    # Wrappers live on the connection wrapper, which outlives reconnects
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate:
+    """Wraps a backend template to time its rendering."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self._template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            metrics.add_template(time.perf_counter() - start)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with rendering time credited to the
+    current request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def record(name, metrics, elapsed):
+    """Fold one request's measurements into the per-view totals."""
+    elapsed_ms = elapsed * 1000
+    with _totals_lock:
+        totals = _totals.get(name)
+        if totals is None:
+            totals = _totals[name] = {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_ms': 0.0,
+                'template_ms': 0.0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'over_budget': 0,
+                'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        totals['requests'] += 1
+        totals['queries'] += metrics.queries
+        totals['max_queries'] = max(totals['max_queries'], metrics.queries)
+        totals['db_ms'] += metrics.db_time * 1000
+        totals['template_ms'] += metrics.template_time * 1000
+        totals['total_ms'] += elapsed_ms
+        totals['max_ms'] = max(totals['max_ms'], elapsed_ms)
+        totals['latency_buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        budget = query_budget(name)
+        if budget is not None and metrics.queries > budget:
+            totals['over_budget'] += 1
+
+
+def request_metrics():
+    """Return the aggregated measurements per URL name."""
+    with _totals_lock:
+        return {
+            name: {
+                'requests': totals['requests'],
+                'avg_queries': totals['queries'] / totals['requests'],
+                'max_queries': totals['max_queries'],
+                'query_budget': query_budget(name),
+                'over_budget': totals['over_budget'],
+                'avg_db_ms': round(totals['db_ms'] / totals['requests'], 3),
+                'avg_template_ms': round(totals['template_ms'] / totals['requests'], 3),
+                'avg_ms': round(totals['total_ms'] / totals['requests'], 3),
+                'max_ms': round(totals['max_ms'], 3),
+                'latency_buckets_ms': dict(zip(
+                    [str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf'],
+                    totals['latency_buckets']
+                )),
+            }
+            for name, totals in sorted(_totals.items())
+        }
+
+
+def reset_request_metrics():
+    with _totals_lock:
+        _totals.clear()
+
+
+def query_budget(name):
+    budget = getattr(settings, 'EXPENSES_QUERY_BUDGETS', {}).get(name)
+    if budget is not None and replica_alias() and name in getattr(settings, 'EXPENSES_REPLICA_VIEWS', ()):
+        # Routing reads the user's data version on the replica as well
+        budget += 1
+    return budget
+
+
+class RequestMetricsMiddleware:
+    """Measure each request and check it against its view's query budget."""
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, elapsed):
+        match = request.resolver_match
+        name = match.view_name if match else '<unresolved>'
+        record(name, metrics, elapsed)
+
+        if getattr(settings, 'EXPENSES_METRICS_HEADERS', settings.DEBUG):
+            response['X-Query-Count'] = str(metrics.queries)
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.2f}, '
+                f'tpl;dur={metrics.template_time * 1000:.2f}, '
+                f'total;dur={elapsed * 1000:.2f}'
+            )
+
+        budget = query_budget(name)
+        if budget is not None and metrics.queries > budget:
+            message = f'{name} ran {metrics.queries} queries, over its budget of {budget}'
+            if getattr(settings, 'EXPENSES_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
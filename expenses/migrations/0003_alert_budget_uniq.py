@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:11
+
+from django.db import migrations, models
+
+
+def drop_duplicate_budget_alerts(apps, schema_editor):
+    """Keep the newest copy of each budget alert, then recount the unread
+    counters of the users who lost one."""
+    Alert = apps.get_model('expenses', 'Alert')
+    AlertInbox = apps.get_model('expenses', 'AlertInbox')
+    seen = set()
+    duplicates = []
+    users = set()
+    for pk, user_id, *key in Alert.objects.filter(budget__isnull=False).order_by('-id').values_list(
+        'id', 'user_id', 'budget_id', 'period_start', 'alert_type', 'threshold'
+    ).iterator():
+        if tuple(key) in seen:
+            duplicates.append(pk)
+            users.add(user_id)
+        else:
+            seen.add(tuple(key))
+    for start in range(0, len(duplicates), 500):
+        Alert.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+    for user_id in users:
+        AlertInbox.objects.filter(user_id=user_id).update(
+            unread=Alert.objects.filter(user_id=user_id, is_read=False).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_budget_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('budget__isnull', False), ('threshold__isnull', True)), fields=('budget', 'period_start', 'alert_type'), name='alert_budget_exceeded_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('budget__isnull', False), ('threshold__isnull', False)), fields=('budget', 'period_start', 'alert_type', 'threshold'), name='alert_budget_threshold_uniq'),
+        ),
+    ]
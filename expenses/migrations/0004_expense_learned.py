@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+
+def mark_learned(apps, schema_editor):
+    """Until now train_categorizer learned every expense; materialized
+    recurring expenses were the ones never taught incrementally."""
+    Expense = apps.get_model('expenses', 'Expense')
+    Expense.objects.filter(recurring__isnull=True).update(learned=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_alert_budget_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='learned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_learned, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_expense_learned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseSearchEntry',
+            fields=[
+                ('expense', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='expenses.expense')),
+                ('description', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'expenses_expense_fts',
+                'managed': False,
+            },
+        ),
+    ]
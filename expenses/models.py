@@ -35,6 +35,11 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'end_date'], name='budget_user_period_idx'),
+        ]
+
     def __str__(self):
         return f"{self.amount} for {self.category} ({self.period})"
 
@@ -44,15 +49,119 @@ class Expense(models.Model):
     date = models.DateField(default=timezone.now)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='expenses')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
+    # The schedule an expense was materialized from; with the date it is the
+    # idempotency key that keeps reruns of materialize_recurring from duplicating
+    recurring = models.ForeignKey(
+        'RecurringExpense', on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses'
+    )
+    # Whether the categorizer was taught this expense: only categories a user
+    # chose are learned, not suggested, defaulted or scheduled ones
+    learned = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Matches the keyset ordering so listings never need a sort
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expense_user_cat_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring', 'date'], name='expense_recurring_date_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.amount} - {self.description[:30]}"
 
+class RecurringExpense(models.Model):
+    """An expense that repeats, e.g. rent or a subscription.
+
+    Occurs every ``interval`` days/weeks/months/years from ``start_date``
+    (monthly and yearly ones on the start date's day, clamped to the end of
+    shorter months) until ``end_date``. ``manage.py materialize_recurring``
+    turns due occurrences into expenses; ``next_date`` is the first one not
+    materialized yet, or null once the schedule has ended.
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    description = models.TextField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='recurring_expenses')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=0)
+    next_date = models.DateField(null=True, blank=True)
+    # Set by the materializing transaction that holds the schedule
+    claim = models.CharField(max_length=32, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_date', 'id']
+        indexes = [
+            models.Index(fields=['next_date', 'id'], name='recurring_next_date_idx'),
+            models.Index(fields=['user', 'next_date'], name='recurring_user_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} {self.get_frequency_display().lower()} - {self.description[:30]}"
+
+class MonthlySpend(models.Model):
+    """Per-user, per-category monthly totals kept in step with Expense writes."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_spend')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_spend')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['year', 'month']
+        unique_together = ['user', 'category', 'year', 'month']
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='monthlyspend_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.year}-{self.month:02d}: {self.total}"
+
+class SpendingStats(models.Model):
+    """Exponentially weighted mean/variance of expense amounts per category,
+    updated as each expense arrives."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_stats')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='spending_stats')
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Spending stats'
+        unique_together = ['user', 'category']
+
+    def __str__(self):
+        return f"{self.category}: mean {self.mean:.2f} over {self.count}"
+
+class CategorizerModel(models.Model):
+    """Per-user token counts behind category suggestions, updated as
+    expenses are added, edited and deleted (see expenses/categorizer.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='categorizer')
+    # {"docs": {category_id: expenses}, "tokens": {token: {category_id: expenses}}}
+    counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Categorizer for user {self.user_id}"
+
 class Alert(models.Model):
     ALERT_TYPES = [
         ('budget_exceeded', 'Budget Exceeded'),
@@ -65,10 +174,91 @@ class Alert(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     related_expense = models.ForeignKey(Expense, on_delete=models.SET_NULL, null=True, blank=True, related_name='alerts')
+    # Budget alerts record the budget period they fired for, so each period alerts once
+    budget = models.ForeignKey(Budget, on_delete=models.SET_NULL, null=True, blank=True, related_name='alerts')
+    period_start = models.DateField(null=True, blank=True)
+    threshold = models.PositiveSmallIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='alert_user_unread_idx'),
+            # Keyset pages of the inbox seek on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='alert_user_created_idx'),
+            models.Index(fields=['budget', 'period_start'], name='alert_budget_period_idx'),
+            # Retention purges the oldest alerts of every user
+            models.Index(fields=['created_at'], name='alert_created_idx'),
+        ]
+        # A budget alerts once per period and level; NULL thresholds never
+        # collide in a unique index, so exceeded alerts need their own
+        constraints = [
+            models.UniqueConstraint(
+                fields=['budget', 'period_start', 'alert_type'],
+                condition=models.Q(budget__isnull=False, threshold__isnull=True),
+                name='alert_budget_exceeded_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['budget', 'period_start', 'alert_type', 'threshold'],
+                condition=models.Q(budget__isnull=False, threshold__isnull=False),
+                name='alert_budget_threshold_uniq'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_alert_type_display()}: {self.message[:50]}"
+
+class AlertInbox(models.Model):
+    """Per-user alert counters, kept in step as alerts are created, read and
+    deleted (see expenses/inbox.py) so pages never count the alerts table."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='alert_inbox')
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.unread} unread alerts for user {self.user_id}"
+
+class DataVersion(models.Model):
+    """Per-user data version behind the aggregate cache keys and ETags (see
+    expenses/caching.py), bumped after every change to the user's data."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='data_version')
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"version {self.version} for user {self.user_id}"
+
+class AlertJob(models.Model):
+    """A pending budget alert evaluation for one (user, category).
+
+    Enqueuing again before the job is processed only refreshes it, so bursts
+    of expenses in a category coalesce into a single evaluation.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alert_jobs')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='alert_jobs')
+    related_expense = models.ForeignKey(Expense, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['enqueued_at']
+        unique_together = ['user', 'category']
+
+    def __str__(self):
+        return f"Alert check for {self.category} (user {self.user_id})"
+
+class ExpenseSearchEntry(models.Model):
+    """A row of SQLite's full-text index over expense descriptions.
+
+    The FTS5 table is created by ``search.install_search_index``, not by a
+    migration; mapping it lets searches join it to ``Expense`` on its rowid.
+    ``rank`` is only defined in a query that MATCHes the table.
+    """
+    expense = models.OneToOneField(
+        Expense, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry'
+    )
+    description = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'expenses_expense_fts'
@@ -0,0 +1,158 @@
+import base64
+import json
+from operator import attrgetter
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .search import search_expenses, search_terms
+
+FILTER_PARAMS = ('category', 'date_from', 'date_to', 'q')
+# Words of a search query that are kept
+SEARCH_MAX_TERMS = 10
+
+
+def expense_filters(params):
+    """Pick the expense_list filters out of a query dict, dropping blanks and
+    values that would not parse."""
+    filters = {}
+    category = params.get('category')
+    if category and str(category).isdigit():
+        filters['category'] = str(category)
+    for name in ('date_from', 'date_to'):
+        value = params.get(name)
+        if value and parse_date(value):
+            filters[name] = value
+    terms = search_terms(params.get('q') or '')
+    if terms:
+        filters['q'] = ' '.join(terms[:SEARCH_MAX_TERMS])
+    return filters
+
+
+def filter_expenses(expenses, filters):
+    """Apply filters produced by ``expense_filters`` to an Expense queryset."""
+    if 'category' in filters:
+        expenses = expenses.filter(category_id=filters['category'])
+    if 'date_from' in filters:
+        expenses = expenses.filter(date__gte=filters['date_from'])
+    if 'date_to' in filters:
+        expenses = expenses.filter(date__lte=filters['date_to'])
+    if 'q' in filters:
+        expenses = search_expenses(expenses, filters['q'])
+    return expenses
+
+
+def _encode(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(filters, key, direction='next'):
+    """Build an opaque cursor for the page next to ``key``."""
+    return _encode({
+        'f': filters,
+        'k': [key[0].isoformat(), key[1].isoformat(), key[2]],
+        'd': direction,
+    })
+
+
+def decode_cursor(cursor):
+    """Return ``(filters, key, direction)`` for a cursor.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        payload = _decode(cursor)
+        day, created_at, pk = payload['k']
+        key = (parse_date(day), parse_datetime(created_at), int(pk))
+        direction = payload.get('d', 'next')
+        filters = expense_filters(payload.get('f', {}))
+    except (TypeError, KeyError, ValueError, AttributeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if key[0] is None or key[1] is None or direction not in ('next', 'previous'):
+        raise ValueError('Invalid cursor')
+    return filters, key, direction
+
+
+def encode_alert_cursor(key, direction='next'):
+    """Build an opaque cursor for the alert page next to ``key``."""
+    return _encode({'k': [key[0].isoformat(), key[1]], 'd': direction})
+
+
+def decode_alert_cursor(cursor):
+    """Return ``(key, direction)`` for an alert cursor.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        payload = _decode(cursor)
+        created_at, pk = payload['k']
+        key = (parse_datetime(created_at), int(pk))
+        direction = payload.get('d', 'next')
+    except (TypeError, KeyError, ValueError, AttributeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if key[0] is None or direction not in ('next', 'previous'):
+        raise ValueError('Invalid cursor')
+    return key, direction
+
+
+def _seek(fields, key, lookup):
+    """Rows after ``key`` in the (fields) order, e.g. ``a < x OR (a = x AND
+    b < y)`` for ``lookup='lt'``."""
+    condition = Q()
+    for position, field in enumerate(fields):
+        condition |= Q(**dict(zip(fields[:position], key)), **{f'{field}__{lookup}': key[position]})
+    return condition
+
+
+def _keyset(rows, fields, key, direction, per_page, key_of):
+    newest_first = [f'-{field}' for field in fields]
+    if key is None:
+        rows = list(rows.order_by(*newest_first)[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        return {
+            'object_list': rows,
+            'next_key': key_of(rows[-1]) if more else None,
+            'previous_key': None,
+        }
+
+    if direction == 'next':
+        rows = list(rows.filter(_seek(fields, key, 'lt')).order_by(*newest_first)[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        return {
+            'object_list': rows,
+            'next_key': key_of(rows[-1]) if more else None,
+            'previous_key': key_of(rows[0]) if rows else None,
+        }
+
+    rows = list(rows.filter(_seek(fields, key, 'gt')).order_by(*fields)[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page][::-1]
+    return {
+        'object_list': rows,
+        'next_key': key_of(rows[-1]) if rows else None,
+        'previous_key': key_of(rows[0]) if more else None,
+    }
+
+
+def keyset_page(expenses, key=None, direction='next', per_page=10, key_of=attrgetter('date', 'created_at', 'id')):
+    """Return one page of ``expenses`` ordered newest first by
+    (date, created_at, id), seeking past ``key`` instead of using OFFSET.
+
+    ``key_of`` extracts the (date, created_at, id) key from a row, so the same
+    function pages model instances and ``values_list`` rows. Returns a dict
+    with ``object_list`` and the ``next_key``/``previous_key`` to build
+    cursors from (None when there is no such page).
+    """
+    return _keyset(expenses, ('date', 'created_at', 'id'), key, direction, per_page, key_of)
+
+
+def alert_page(alerts, key=None, direction='next', per_page=20):
+    """Like ``keyset_page`` for alerts, newest first by (created_at, id)."""
+    return _keyset(alerts, ('created_at', 'id'), key, direction, per_page, attrgetter('created_at', 'id'))
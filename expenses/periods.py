@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+
+def period_bounds(period, day):
+    """Return the (first, last) day of the calendar period containing ``day``.
+
+    Weeks run Monday to Sunday; months and years are calendar months and
+    years.
+    """
+    if period == 'daily':
+        return day, day
+    if period == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'monthly':
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    if period == 'yearly':
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f'Unknown budget period: {period}')
+
+
+def budget_window(budget, day):
+    """Return the (first, last) day of the budget's period containing ``day``,
+    clipped to the budget's own start and end dates.
+
+    Returns None if ``day`` is outside the budget.
+    """
+    if day < budget.start_date or (budget.end_date and day > budget.end_date):
+        return None
+    start, end = period_bounds(budget.period, day)
+    return max(start, budget.start_date), min(end, budget.end_date or end)
+
+
+def is_full_period(budget, window):
+    """True if ``window`` covers a whole calendar period of the budget."""
+    return window == period_bounds(budget.period, window[0])
+
+
+def budget_windows(budget, day, count):
+    """Return up to ``count`` windows of the budget, newest first, ending
+    with the one containing ``day``."""
+    windows = []
+    window = budget_window(budget, day)
+    while window and len(windows) < count:
+        windows.append(window)
+        window = budget_window(budget, window[0] - timedelta(days=1))
+    return windows
@@ -0,0 +1,178 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import ExtractMonth, TruncMonth, TruncWeek, TruncYear
+
+from .models import Category, Expense, MonthlySpend
+from .periods import period_bounds
+
+PIVOT_DIMENSIONS = ('year', 'month', 'month_of_year', 'week', 'category')
+PIVOT_MEASURES = ('sum', 'count', 'avg')
+# Dimensions the monthly rollup can answer
+ROLLUP_DIMENSIONS = {'year', 'month', 'month_of_year', 'category'}
+# Buckets are stepped to the day after the last one, which for the final
+# weeks and month of 9999 is past date.max
+PIVOT_MAX_YEAR = date.max.year - 1
+
+
+def _time_keys(dimension, start, end):
+    """Every bucket of a time dimension between ``start`` and ``end``."""
+    if dimension == 'month_of_year':
+        return list(range(1, 13))
+    period = {'year': 'yearly', 'month': 'monthly', 'week': 'weekly'}[dimension]
+    keys = []
+    bucket = period_bounds(period, start)[0]
+    while bucket <= end:
+        keys.append(bucket)
+        bucket = period_bounds(period, bucket)[1] + timedelta(days=1)
+    return keys
+
+
+def _key_count(dimension, start, end, categories):
+    """How many buckets ``_time_keys`` would return, without building them."""
+    if dimension == 'category':
+        return len(categories)
+    if dimension == 'month_of_year':
+        return 12
+    if dimension == 'year':
+        return end.year - start.year + 1
+    if dimension == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (period_bounds('weekly', end)[0] - period_bounds('weekly', start)[0]).days // 7 + 1
+
+
+def _label(dimension, key, categories):
+    if dimension == 'category':
+        return categories[key]
+    if dimension == 'year':
+        return str(key.year)
+    if dimension == 'month':
+        return key.strftime('%Y-%m')
+    if dimension == 'month_of_year':
+        return date(2000, key, 1).strftime('%b')
+    return key.isoformat()
+
+
+def _grouped_rows(user, start, end, dimensions):
+    """Yield ``(keys, total, count)`` per group, reading the monthly rollup
+    when the range is whole months and every dimension is month-grained."""
+    whole_months = start.day == 1 and end == period_bounds('monthly', end)[1]
+    if whole_months and set(dimensions) <= ROLLUP_DIMENSIONS:
+        rows = MonthlySpend.objects.filter(user=user).order_by()
+        rows = rows.filter(
+            year__gte=start.year, year__lte=end.year
+        ).exclude(year=start.year, month__lt=start.month).exclude(year=end.year, month__gt=end.month)
+        fields = {
+            'year': ('year',),
+            'month': ('year', 'month'),
+            'month_of_year': ('month',),
+            'category': ('category_id',),
+        }
+        grouped = rows.values(*{field for dimension in dimensions for field in fields[dimension]}).annotate(
+            pivot_total=Sum('total'), pivot_count=Sum('count')
+        )
+        for row in grouped:
+            keys = []
+            for dimension in dimensions:
+                if dimension == 'year':
+                    keys.append(date(row['year'], 1, 1))
+                elif dimension == 'month':
+                    keys.append(date(row['year'], row['month'], 1))
+                elif dimension == 'month_of_year':
+                    keys.append(row['month'])
+                else:
+                    keys.append(row['category_id'])
+            yield tuple(keys), row['pivot_total'], row['pivot_count']
+        return
+
+    expressions = {
+        'year': TruncYear('date', output_field=DateField()),
+        'month': TruncMonth('date', output_field=DateField()),
+        'month_of_year': ExtractMonth('date'),
+        'week': TruncWeek('date', output_field=DateField()),
+    }
+    rows = Expense.objects.filter(user=user, date__gte=start, date__lte=end).order_by()
+    rows = rows.annotate(**{
+        f'pivot_{dimension}': expressions[dimension] for dimension in dimensions if dimension != 'category'
+    })
+    names = [f'pivot_{dimension}' if dimension != 'category' else 'category_id' for dimension in dimensions]
+    for row in rows.values(*names).annotate(pivot_total=Sum('amount'), pivot_count=Count('id')):
+        yield tuple(row[name] for name in names), row['pivot_total'], row['pivot_count']
+
+
+def pivot(user, start, end, rows, columns=None, measures=('sum',)):
+    """Pivot the user's spending between ``start`` and ``end``.
+
+    ``rows`` and the optional ``columns`` are dimensions from
+    ``PIVOT_DIMENSIONS``, ``measures`` a subset of ``PIVOT_MEASURES``. The
+    result is dense: every bucket of each dimension in the range (every
+    category of the user) has a row or column, zero-filled, and each measure
+    is a row-major matrix (a flat list without ``columns``).
+
+    Raises ValueError for unknown dimensions or measures, a range ending after
+    ``PIVOT_MAX_YEAR``, or when the result would have more than
+    ``EXPENSES_PIVOT_MAX_CELLS`` cells.
+    """
+    dimensions = [rows] + ([columns] if columns else [])
+    for dimension in dimensions:
+        if dimension not in PIVOT_DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'; choose from {', '.join(PIVOT_DIMENSIONS)}")
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError('rows and columns must be different dimensions')
+    if not measures or any(measure not in PIVOT_MEASURES for measure in measures):
+        raise ValueError(f"measures must be among {', '.join(PIVOT_MEASURES)}")
+    if start > end:
+        raise ValueError('date_from must not be after date_to')
+    if end.year > PIVOT_MAX_YEAR:
+        raise ValueError(f'date_to must be in {PIVOT_MAX_YEAR} or earlier')
+
+    categories = dict(Category.objects.filter(user=user).order_by('name').values_list('id', 'name'))
+    cells = len(measures)
+    for dimension in dimensions:
+        cells *= _key_count(dimension, start, end, categories)
+    max_cells = getattr(settings, 'EXPENSES_PIVOT_MAX_CELLS', 20000)
+    if cells > max_cells:
+        raise ValueError(f'The pivot would have {cells} cells; narrow the range or dimensions (limit {max_cells})')
+
+    axes = [list(categories) if dimension == 'category' else _time_keys(dimension, start, end)
+            for dimension in dimensions]
+    positions = [{key: index for index, key in enumerate(keys)} for keys in axes]
+    width = len(axes[1]) if columns else 1
+    totals = [Decimal('0')] * (len(axes[0]) * width)
+    counts = [0] * len(totals)
+
+    for keys, total, count in _grouped_rows(user, start, end, dimensions):
+        try:
+            index = positions[0][keys[0]] * width + (positions[1][keys[1]] if columns else 0)
+        except KeyError:
+            # An expense in a category deleted since, or outside the buckets
+            continue
+        totals[index] += total or 0
+        counts[index] += count or 0
+
+    values = {
+        'sum': [float(total) for total in totals],
+        'count': counts,
+        'avg': [round(float(total) / count, 2) if count else 0.0 for total, count in zip(totals, counts)],
+    }
+
+    def axis(dimension, keys):
+        return {
+            'dimension': dimension,
+            'keys': [key.isoformat() if isinstance(key, date) else key for key in keys],
+            'labels': [_label(dimension, key, categories) for key in keys],
+        }
+
+    return {
+        'date_from': start.isoformat(),
+        'date_to': end.isoformat(),
+        'rows': axis(rows, axes[0]),
+        'columns': axis(columns, axes[1]) if columns else None,
+        'measures': {
+            measure: [values[measure][row * width:(row + 1) * width] for row in range(len(axes[0]))]
+            if columns else values[measure]
+            for measure in measures
+        },
+    }
@@ -0,0 +1,136 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Expense, MonthlySpend
+
+
+def _apply(user_id, category_id, day, amount, count):
+    """Add ``amount``/``count`` to the rollup bucket that ``day`` falls in."""
+    bucket = MonthlySpend.objects.filter(
+        user_id=user_id,
+        category_id=category_id,
+        year=day.year,
+        month=day.month
+    )
+    updated = bucket.update(total=F('total') + amount, count=F('count') + count)
+    if not updated:
+        try:
+            with transaction.atomic():
+                MonthlySpend.objects.create(
+                    user_id=user_id,
+                    category_id=category_id,
+                    year=day.year,
+                    month=day.month,
+                    total=amount,
+                    count=count
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            bucket.update(total=F('total') + amount, count=F('count') + count)
+    if count < 0:
+        bucket.filter(count__lte=0).delete()
+
+
+def add_expense(expense):
+    """Record a newly saved expense in the monthly rollup."""
+    _apply(expense.user_id, expense.category_id, expense.date, expense.amount, 1)
+
+
+def remove_expense(expense):
+    """Take an expense (or a snapshot of its previous state) out of the rollup."""
+    _apply(expense.user_id, expense.category_id, expense.date, -expense.amount, -1)
+
+
+def update_expense(previous, expense):
+    """Move an edited expense from its previous bucket to its current one."""
+    remove_expense(previous)
+    add_expense(expense)
+
+
+def add_totals(user_id, totals):
+    """Record pre-summed expenses, e.g. from a bulk insert.
+
+    ``totals`` maps ``(category_id, year, month)`` to ``(amount, count)``.
+    """
+    for (category_id, year, month), (amount, count) in totals.items():
+        _apply(user_id, category_id, date(year, month, 1), amount, count)
+
+
+def add_totals_many(totals):
+    """Record pre-summed expenses for many users with a few set-based queries.
+
+    ``totals`` maps ``(user_id, category_id, year, month)`` to ``(amount,
+    count)`` with positive counts. Existing buckets are locked and updated
+    with one ``bulk_update``, missing ones inserted with one
+    ``bulk_create``; if another writer creates one of those first, the
+    per-bucket path takes over.
+    """
+    if not totals:
+        return
+    with transaction.atomic():
+        buckets = MonthlySpend.objects.select_for_update().filter(
+            user_id__in={key[0] for key in totals},
+            year__in={key[2] for key in totals},
+            month__in={key[3] for key in totals}
+        )
+        existing = {}
+        for bucket in buckets:
+            key = (bucket.user_id, bucket.category_id, bucket.year, bucket.month)
+            if key in totals:
+                bucket.total += totals[key][0]
+                bucket.count += totals[key][1]
+                existing[key] = bucket
+        MonthlySpend.objects.bulk_update(existing.values(), ['total', 'count'], batch_size=1000)
+
+        missing = {key: value for key, value in totals.items() if key not in existing}
+        try:
+            with transaction.atomic():
+                MonthlySpend.objects.bulk_create([
+                    MonthlySpend(user_id=user_id, category_id=category_id, year=year, month=month,
+                                 total=amount, count=count)
+                    for (user_id, category_id, year, month), (amount, count) in missing.items()
+                ], batch_size=1000)
+        except IntegrityError:
+            for (user_id, category_id, year, month), (amount, count) in missing.items():
+                _apply(user_id, category_id, date(year, month, 1), amount, count)
+
+
+def rebuild_monthly_spend(user=None, batch_size=1000):
+    """Recompute the rollup from raw expenses, for one user or everybody.
+
+    Returns the number of rollup rows written.
+    """
+    expenses = Expense.objects.all()
+    rollups = MonthlySpend.objects.all()
+    if user is not None:
+        expenses = expenses.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    rows = expenses.order_by().annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date')
+    ).values('user', 'category', 'year', 'month').annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = MonthlySpend.objects.bulk_create(
+            [
+                MonthlySpend(
+                    user_id=row['user'],
+                    category_id=row['category'],
+                    year=row['year'],
+                    month=row['month'],
+                    total=row['total'],
+                    count=row['count']
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=batch_size
+        )
+    return len(created)
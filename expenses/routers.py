@@ -0,0 +1,116 @@
+"""Read-replica routing.
+
+``ReplicaRoutingMiddleware`` marks GET/HEAD requests and ``ReplicaRouter``
+sends the reads of the views in ``EXPENSES_REPLICA_VIEWS`` to the
+``EXPENSES_READ_REPLICA`` database. Writes always go to the primary.
+
+Replicas lag behind the primary. A request only reads from the replica once
+it holds the user's current data version (``expenses.caching``), so cached
+aggregates and ETags, which are keyed by that version, never describe older
+rows. A client that has just written (any unsafe request) is also pinned to
+the primary for ``EXPENSES_REPLICA_PIN_SECONDS`` by a cookie.
+"""
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caching import replica_caught_up
+
+PIN_COOKIE = 'expenses_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_reads = ContextVar('expenses_replica_reads', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'EXPENSES_READ_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+class ReplicaReads:
+    """Whether one request reads expense data from the replica; decided once
+    its view is known."""
+
+    def __init__(self):
+        self.use_replica = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Only expense data; sessions and users are read from the primary so
+        # a fresh login is never lost to replication lag. Reads inside a
+        # transaction on the primary must see its writes.
+        alias = replica_alias()
+        reads = _reads.get()
+        if (alias and reads is not None and reads.use_replica
+                and model._meta.app_label == 'expenses'
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances that were read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
+
+
+class ReplicaRoutingMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _reads.set(self.replica_reads(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _reads.set(self.replica_reads(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self.pin(request, response)
+
+    def replica_reads(self, request):
+        if request.method not in SAFE_METHODS or replica_alias() is None:
+            return None
+        try:
+            if int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time():
+                return None
+        except ValueError:
+            pass
+        return ReplicaReads()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reads = _reads.get()
+        if (reads is not None and request.user.is_authenticated
+                and request.resolver_match.view_name in getattr(settings, 'EXPENSES_REPLICA_VIEWS', ())):
+            reads.use_replica = replica_caught_up(request.user.pk, replica_alias())
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            pin_seconds = getattr(settings, 'EXPENSES_REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + pin_seconds),
+                max_age=pin_seconds, httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,148 @@
+"""Full-text search over expense descriptions.
+
+On SQLite an FTS5 table (``expenses_expense_fts``, mapped read-only as
+``ExpenseSearchEntry``) indexes the descriptions and is kept in sync by
+triggers, so bulk inserts and raw updates are covered too. On PostgreSQL a
+GIN index over ``to_tsvector('english', description)`` serves
+``SearchVector`` queries. ``install_search_index`` creates either one and
+runs after every ``migrate``. Other databases fall back to ``icontains``.
+
+Every word of a query must match, each as a prefix ("ube rid" finds "Uber
+ride").
+"""
+import re
+
+from django.db import connections
+from django.db.models import F, Lookup
+from django.db.models.expressions import RawSQL
+
+from .models import ExpenseSearchEntry
+
+FTS_TABLE = ExpenseSearchEntry._meta.db_table
+SEARCH_CONFIG = 'english'
+POSTGRES_INDEX = 'expense_description_search_idx'
+
+
+class Match(Lookup):
+    """``description__match``: an FTS5 MATCH restricted to the column."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+ExpenseSearchEntry._meta.get_field('description').register_lookup(Match)
+
+
+def search_terms(text):
+    """The words of a search query, lowercased; punctuation and operators are
+    dropped so user input can never form query syntax."""
+    return re.findall(r'\w+', text.lower())
+
+
+def _fts_query(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('description', config=SEARCH_CONFIG)
+
+
+def _tsquery(terms):
+    from django.contrib.postgres.search import SearchQuery
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_expenses(expenses, text):
+    """Narrow an Expense queryset to rows whose description matches ``text``.
+
+    Composes with any other filter and keeps the queryset's ordering.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return expenses
+    vendor = connections[expenses.db].vendor
+    if vendor == 'sqlite':
+        return expenses.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts_query(terms)]
+        ))
+    if vendor == 'postgresql':
+        return expenses.annotate(search_document=_vector()).filter(search_document=_tsquery(terms))
+    for term in terms:
+        expenses = expenses.filter(description__icontains=term)
+    return expenses
+
+
+def ranked_search(expenses, text):
+    """Like ``search_expenses``, ordered best match first, with the match
+    score as ``search_rank`` (higher is better)."""
+    terms = search_terms(text)
+    if not terms:
+        return expenses.none()
+    vendor = connections[expenses.db].vendor
+    if vendor == 'sqlite':
+        # Joined rather than a correlated subquery, so SQLite runs the MATCH
+        # once; FTS5's rank is bm25(), where more negative is a better match
+        return expenses.filter(search_entry__description__match=_fts_query(terms)).annotate(
+            search_rank=-F('search_entry__rank')
+        ).order_by('-search_rank', '-date', '-id')
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchRank
+        query = _tsquery(terms)
+        return expenses.annotate(
+            search_document=_vector(),
+            search_rank=SearchRank(F('search_document'), query)
+        ).filter(search_document=query).order_by('-search_rank', '-date', '-id')
+    return search_expenses(expenses, text).order_by('-date', '-id')
+
+
+def install_search_index(connection):
+    """Create the search index (and on SQLite its sync triggers) if missing.
+
+    Returns True when a new SQLite index was created and filled.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON expenses_expense '
+                f"USING GIN (to_tsvector('{SEARCH_CONFIG}'::regconfig, COALESCE(description, '')))"
+            )
+        return False
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        exists = cursor.fetchone() is not None
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            f"description, content='expenses_expense', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON expenses_expense BEGIN '
+            f'INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON expenses_expense BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); END"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description ON expenses_expense BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); "
+            f'INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END'
+        )
+    if not exists:
+        rebuild_search_index(connection)
+    return not exists
+
+
+def rebuild_search_index(connection):
+    """Re-index every description from scratch (SQLite only; the Postgres
+    index is maintained by the database)."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from expense_tracker.database import SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+from .caching import bump_on_commit
+from .metrics import install_query_timer
+from .models import Alert, AlertInbox, Budget, Category, DataVersion, Expense
+from .search import install_search_index
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Alert)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Bump the owner's data version once the change is committed."""
+    bump_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def create_data_version(sender, instance, created, raw=False, using=None, **kwargs):
+    """Start the user's data version with the account, so it reaches a
+    replica along with the user and requests never have to create it."""
+    if created and not raw:
+        DataVersion.objects.using(using).create(user=instance, version=time.time_ns())
+
+
+@receiver(post_save, sender=User)
+def create_alert_inbox(sender, instance, created, raw=False, using=None, **kwargs):
+    """A new user has no alerts, so the inbox starts empty instead of being
+    counted into existence by their first page."""
+    if created and not raw:
+        AlertInbox.objects.using(using).create(user=instance)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Credit every query on the connection to the request running it."""
+    install_query_timer(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection, getattr(settings, 'SQLITE_PRAGMAS', SQLITE_PRAGMAS))
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    """The full-text index is not a model, so ``migrate`` sets it up here."""
+    if sender.name == 'expenses' and router.allow_migrate(using, 'expenses'):
+        install_search_index(connections[using])
@@ -0,0 +1,122 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses import alert_queue, inbox
+from expenses.budgets import check_budget_alerts
+from expenses.models import Alert, AlertInbox, Budget, Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+
+class AlertQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('queue', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.budget = Budget.objects.create(
+            user=self.user, category=self.food, amount=Decimal('100.00'), start_date=date(2024, 1, 1)
+        )
+        self.today = timezone.now().date()
+        Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('150.00'), description='Spend', date=self.today
+        )
+        rebuild_monthly_spend(user=self.user)
+
+    def test_worker_failures_are_logged(self):
+        future = Future()
+        future.set_exception(RuntimeError('database went away'))
+
+        with self.assertLogs('expenses.alert_queue', 'ERROR') as logs:
+            alert_queue._log_failure(future)
+
+        self.assertIn('database went away', logs.output[0])
+
+    def test_queued_jobs_raise_each_alert_once(self):
+        for _ in range(2):
+            alert_queue.enqueue_alert_check(self.user, self.food.pk)
+            alert_queue.process_pending()
+
+        self.assertEqual(Alert.objects.filter(budget=self.budget).count(), 1)
+        self.assertEqual(alert_queue.queue_metrics()['depth'], 0)
+
+    def test_database_rejects_a_second_copy_of_a_budget_alert(self):
+        fields = dict(
+            user=self.user, alert_type='budget_exceeded', message='Over budget',
+            budget=self.budget, period_start=date(2024, 3, 1)
+        )
+        inbox.create_alert(**fields)
+
+        with self.assertRaises(IntegrityError):
+            inbox.create_alert(**fields)
+        # The failed insert rolled its counter change back with it
+        self.assertEqual(AlertInbox.objects.get(user=self.user).unread, 1)
+
+    def test_concurrent_check_skips_the_alert_another_worker_raised(self):
+        create_alert = inbox.create_alert
+
+        def raced(**fields):
+            # Another worker commits the same alert between the check and the insert
+            create_alert(**fields)
+            return create_alert(**fields)
+
+        with mock.patch('expenses.budgets.create_alert', raced):
+            created = check_budget_alerts(self.user, [self.food.pk], today=self.today)
+
+        self.assertEqual(created, [])
+        self.assertEqual(Alert.objects.filter(budget=self.budget).count(), 1)
+        self.assertEqual(AlertInbox.objects.get(user=self.user).unread, 1)
+
+    def test_metrics_report_the_queue(self):
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        alert_queue.enqueue_alert_check(self.user, self.food.pk)
+
+        response = self.client.get(reverse('expenses:metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['alert_queue']['depth'], 1)
+
+
+class ConcurrentAlertQueueTests(TransactionTestCase):
+    # Workers claim jobs on their own connections, so the rows must really
+    # be committed
+    def setUp(self):
+        self.user = User.objects.create_user('workers', password='secret')
+        today = timezone.now().date()
+        self.budgets = []
+        for index in range(20):
+            category = Category.objects.create(user=self.user, name=f'Category {index}')
+            self.budgets.append(Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('10.00'), start_date=date(2024, 1, 1)
+            ))
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal('15.00'), description='Spend', date=today
+            )
+        rebuild_monthly_spend(user=self.user)
+
+    def test_every_job_is_delivered_with_workers_racing(self):
+        for budget in self.budgets:
+            alert_queue.enqueue_alert_check(self.user, budget.category_id)
+
+        def drain():
+            try:
+                while alert_queue.process_pending(limit=5):
+                    pass
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for worker in [pool.submit(drain) for _ in range(4)]:
+                worker.result()
+
+        self.assertEqual(alert_queue.queue_metrics()['depth'], 0)
+        self.assertEqual(
+            set(Alert.objects.filter(alert_type='budget_exceeded').values_list('budget_id', flat=True)),
+            {budget.pk for budget in self.budgets}
+        )
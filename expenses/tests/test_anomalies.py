@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from expenses.anomalies import backfill_spending_stats, ewma_scan, ewma_update
+from expenses.models import Category, Expense, SpendingStats
+
+
+class EwmaScanTests(TestCase):
+    def test_matches_folding_one_amount_at_a_time(self):
+        rng = np.random.default_rng(0)
+        amounts = rng.gamma(2.0, 20.0, 5000).round(2)
+        starts = np.zeros(len(amounts), dtype=bool)
+        starts[[0, 1, 700, 701, 4999]] = True
+
+        mean, variance = ewma_scan(amounts, starts, 0.1)
+
+        state = None
+        for index, amount in enumerate(amounts.tolist()):
+            if starts[index]:
+                state = (0, 0.0, 0.0)
+            state = ewma_update(*state, amount, 0.1)
+            self.assertAlmostEqual(mean[index], state[1], places=9)
+            self.assertAlmostEqual(variance[index], state[2], delta=1e-9 * max(state[2], 1))
+
+
+class BackfillTests(TestCase):
+    def test_backfill_folds_each_category_in_date_order(self):
+        user = User.objects.create_user('backfill', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        food = Category.objects.create(user=user, name='Food')
+        rent = Category.objects.create(user=user, name='Rent')
+        history = {
+            food: ['12.50', '8.00', '40.00', '9.99'],
+            rent: ['900.00'],
+        }
+        for category, amounts in history.items():
+            # Created newest first, so creation order is not date order
+            for offset, amount in reversed(list(enumerate(amounts))):
+                Expense.objects.create(
+                    user=user, category=category, amount=Decimal(amount), description='Spend',
+                    date=date(2024, 1, 1) + timedelta(days=offset)
+                )
+        SpendingStats.objects.create(user=other, category=Category.objects.create(user=other, name='Other'))
+
+        self.assertEqual(backfill_spending_stats(user=user), 2)
+
+        for category, amounts in history.items():
+            state = (0, 0.0, 0.0)
+            for amount in amounts:
+                state = ewma_update(*state, float(amount), 0.1)
+            stats = SpendingStats.objects.get(user=user, category=category)
+            self.assertEqual(stats.count, state[0])
+            self.assertAlmostEqual(stats.mean, state[1])
+            self.assertAlmostEqual(stats.variance, state[2])
+        self.assertTrue(SpendingStats.objects.filter(user=other).exists())
+        self.assertEqual(backfill_spending_stats(user=other), 0)
@@ -0,0 +1,116 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from expenses.categorizer import build_counts
+from expenses.models import AlertJob, CategorizerModel, Category, Expense, MonthlySpend
+from expenses.rollups import rebuild_monthly_spend
+
+
+def rollup(user):
+    return sorted(MonthlySpend.objects.filter(user=user).values_list('category_id', 'year', 'month', 'total', 'count'))
+
+
+class BatchApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('batch', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.rent = Category.objects.create(user=self.user, name='Rent')
+        self.expense = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('10.00'), description='Lunch', date=date(2024, 3, 5)
+        )
+        self.doomed = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('4.50'), description='Coffee', date=date(2024, 3, 6)
+        )
+        rebuild_monthly_spend(user=self.user)
+        self.client.force_login(self.user)
+
+    def post(self, operations):
+        return self.client.post(
+            reverse('expenses:api_expense_batch'), json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def test_applies_creates_updates_and_deletes_together(self):
+        response = self.post([
+            {'op': 'create', 'amount': '25.00', 'description': 'Groceries', 'date': '2024-04-01', 'category': self.food.pk},
+            {'op': 'update', 'id': self.expense.pk, 'category': self.rent.pk},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['applied'])
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'updated', 'deleted'])
+        created = Expense.objects.get(pk=body['results'][0]['id'])
+        self.assertEqual((created.amount, created.category_id), (Decimal('25.00'), self.food.pk))
+        self.expense.refresh_from_db()
+        self.assertEqual(self.expense.category_id, self.rent.pk)
+        self.assertFalse(Expense.objects.filter(pk=self.doomed.pk).exists())
+
+        # Derived state matches what a rebuild from the rows produces
+        maintained = rollup(self.user)
+        rebuild_monthly_spend(user=self.user)
+        self.assertEqual(maintained, rollup(self.user))
+        # One queued alert evaluation per affected category
+        self.assertEqual(
+            set(AlertJob.objects.filter(user=self.user).values_list('category_id', flat=True)),
+            {self.food.pk, self.rent.pk}
+        )
+
+    def test_updates_the_categorizer_from_the_summed_changes(self):
+        self.post([
+            {'op': 'create', 'amount': '25.00', 'description': 'Groceries', 'date': '2024-04-01', 'category': self.food.pk},
+        ])
+        counts = CategorizerModel.objects.get(user=self.user).counts
+        self.assertEqual(counts, build_counts([('Groceries', Decimal('25.00'), self.food.pk)]))
+
+    def test_one_invalid_operation_applies_nothing(self):
+        before = rollup(self.user)
+        response = self.post([
+            {'op': 'create', 'amount': '25.00', 'description': 'Groceries', 'date': '2024-04-01', 'category': self.food.pk},
+            {'op': 'update', 'id': self.expense.pk, 'amount': '-3'},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertFalse(body['applied'])
+        self.assertEqual([result['status'] for result in body['results']], ['valid', 'invalid', 'valid'])
+        self.assertIn('amount', body['results'][1]['errors'])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(rollup(self.user), before)
+        self.assertFalse(AlertJob.objects.exists())
+
+    def test_rejects_other_users_expenses_and_repeated_ids(self):
+        other = User.objects.create_user('other')
+        theirs = Expense.objects.create(
+            user=other, category=Category.objects.create(user=other, name='Food'),
+            amount=Decimal('1.00'), description='Not yours', date=date(2024, 3, 5)
+        )
+        response = self.post([
+            {'op': 'delete', 'id': theirs.pk},
+            {'op': 'update', 'id': self.expense.pk, 'description': 'Brunch'},
+            {'op': 'delete', 'id': self.expense.pk},
+            {'op': 'create', 'amount': '1', 'description': 'x', 'date': '2024-04-01', 'category': theirs.category_id},
+        ])
+
+        results = response.json()['results']
+        self.assertEqual(results[0]['errors'], {'id': ['No such expense']})
+        self.assertEqual(results[1]['status'], 'valid')
+        self.assertIn('more than once', results[2]['errors']['id'][0])
+        self.assertIn('category', results[3]['errors'])
+        self.assertTrue(Expense.objects.filter(pk=theirs.pk).exists())
+
+    @override_settings(EXPENSES_BATCH_MAX_OPERATIONS=2)
+    def test_rejects_oversized_and_malformed_bodies(self):
+        response = self.post([{'op': 'delete', 'id': self.doomed.pk}] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 2', response.json()['error'])
+
+        response = self.client.post(reverse('expenses:api_expense_batch'), 'nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('expenses:api_expense_batch')).status_code, 405)
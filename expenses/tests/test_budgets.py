@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.budgets import budget_history
+from expenses.models import Budget, Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+
+class BudgetListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('budgets', password='secret')
+        self.today = timezone.now().date()
+        self.client.force_login(self.user)
+
+    def add_budgets(self, count):
+        for _ in range(count):
+            n = Category.objects.filter(user=self.user).count()
+            category = Category.objects.create(user=self.user, name=f'Category {n}')
+            Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('100.00'), start_date=date(self.today.year - 1, 1, 1)
+            )
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal('30.00'), description='Spend', date=self.today
+            )
+        Budget.objects.create(
+            user=self.user, category=category, amount=Decimal('50.00'),
+            start_date=date(2020, 1, 1), end_date=date(2020, 12, 31)
+        )
+        rebuild_monthly_spend(user=self.user)
+
+    def get(self):
+        """Request the page; returns how many active budgets it shows."""
+        response = self.client.get(reverse('expenses:budget_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(response.context['active_budgets'])
+
+    def test_query_count_does_not_grow_with_budgets(self):
+        self.add_budgets(1)
+        # The first request after logging in also saves the session
+        self.get()
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(self.get(), 1)
+        self.assertLessEqual(len(one), settings.EXPENSES_QUERY_BUDGETS['expenses:budget_list'])
+
+        self.add_budgets(15)
+        with self.assertNumQueries(len(one)):
+            self.assertEqual(self.get(), 16)
+
+    def test_spent_is_reported_per_budget(self):
+        self.add_budgets(3)
+
+        response = self.client.get(reverse('expenses:budget_list'))
+
+        for item in response.context['active_budgets']:
+            self.assertEqual(item['spent'], Decimal('30.00'))
+        self.assertEqual(len(response.context['expired_budgets']), 1)
+
+
+class BudgetHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('history', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.rent = Category.objects.create(user=self.user, name='Rent')
+        self.today = date(2025, 2, 12)
+
+    def spend(self, category, day, amount):
+        Expense.objects.create(
+            user=self.user, category=category, amount=Decimal(amount), description='Spend', date=day
+        )
+
+    def budget(self, period, start_date, category=None):
+        return Budget.objects.create(
+            user=self.user, category=category or self.food, amount=Decimal('100.00'),
+            period=period, start_date=start_date
+        )
+
+    def test_open_ended_monthly_budget_reports_last_months(self):
+        budget = self.budget('monthly', date(2022, 3, 15))
+        self.spend(self.food, date(2022, 3, 20), '999.00')
+        self.spend(self.food, date(2024, 9, 1), '10.00')
+        self.spend(self.food, date(2024, 12, 31), '20.00')
+        self.spend(self.food, date(2025, 1, 1), '5.00')
+        self.spend(self.food, date(2025, 2, 12), '7.00')
+        self.spend(self.rent, date(2025, 2, 1), '500.00')
+        rebuild_monthly_spend(user=self.user)
+
+        history = budget_history([budget], self.today)[budget.pk]
+
+        self.assertEqual(
+            [(item['start'], item['end']) for item in history],
+            [
+                (date(2024, 9, 1), date(2024, 9, 30)),
+                (date(2024, 10, 1), date(2024, 10, 31)),
+                (date(2024, 11, 1), date(2024, 11, 30)),
+                (date(2024, 12, 1), date(2024, 12, 31)),
+                (date(2025, 1, 1), date(2025, 1, 31)),
+                (date(2025, 2, 1), date(2025, 2, 28)),
+            ]
+        )
+        self.assertEqual([item['spent'] for item in history], [10, 0, 0, 20, 5, 7])
+        self.assertEqual(history[-1]['percent_used'], Decimal('7'))
+
+    def test_windows_are_clipped_to_the_start_date(self):
+        budget = self.budget('monthly', date(2024, 12, 20))
+        self.spend(self.food, date(2024, 12, 19), '50.00')
+        self.spend(self.food, date(2024, 12, 20), '15.00')
+        rebuild_monthly_spend(user=self.user)
+
+        history = budget_history([budget], self.today)[budget.pk]
+
+        self.assertEqual(len(history), 3)
+        self.assertEqual((history[0]['start'], history[0]['end']), (date(2024, 12, 20), date(2024, 12, 31)))
+        self.assertEqual(history[0]['spent'], Decimal('15.00'))
+
+    def test_every_period_matches_direct_sums(self):
+        day = date(2021, 6, 1)
+        while day <= date(2025, 2, 28):
+            self.spend(self.food, day, f'{day.toordinal() % 7 + 1}.25')
+            self.spend(self.rent, day, '3.00')
+            day += timedelta(days=3)
+        rebuild_monthly_spend(user=self.user)
+        budgets = [
+            self.budget(period, date(2021, 6, 15), category)
+            for period in ('daily', 'weekly', 'monthly', 'yearly')
+            for category in (self.food, self.rent)
+        ]
+
+        with self.assertNumQueries(2):
+            history = budget_history(budgets, self.today, periods=12)
+
+        for budget in budgets:
+            windows = history[budget.pk]
+            self.assertEqual(len(windows), 5 if budget.period == 'yearly' else 12)
+            for item in windows:
+                expected = Expense.objects.filter(
+                    user=self.user, category=budget.category, date__range=(item['start'], item['end'])
+                ).aggregate(total=Sum('amount'))['total'] or 0
+                self.assertEqual(item['spent'], expected, (budget.period, item['start']))
+        self.assertEqual(history[budgets[-1].pk][0]['start'], date(2021, 6, 15))
@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.caching import bump_version, cached, get_cache, get_version, version_scope
+from expenses.models import Category, DataVersion, Expense
+
+
+class DataVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cache', password='secret')
+
+    def test_version_is_kept_in_the_database(self):
+        version = get_version(self.user.pk)
+        get_cache().clear()
+
+        # Another process's cache is empty; it still reads the same version
+        self.assertEqual(get_version(self.user.pk), version)
+        self.assertEqual(DataVersion.objects.get(user=self.user).version, version)
+
+    def test_bump_from_another_process_invalidates_cached_values(self):
+        computed = []
+
+        def compute():
+            computed.append(len(computed) + 1)
+            return computed[-1]
+
+        self.assertEqual(cached(self.user, 'test', compute), 1)
+        self.assertEqual(cached(self.user, 'test', compute), 1)
+        # What bump_version does in another worker: only the row changes
+        DataVersion.objects.filter(user=self.user).update(version=F('version') + 1)
+        self.assertEqual(cached(self.user, 'test', compute), 2)
+
+    def test_bump_creates_a_missing_version(self):
+        bump_version(self.user.pk)
+        version = get_version(self.user.pk)
+        bump_version(self.user.pk)
+        self.assertEqual(get_version(self.user.pk), version + 1)
+
+    def test_deleting_a_user_leaves_no_version_behind(self):
+        category = Category.objects.create(user=self.user, name='Food')
+        Expense.objects.create(
+            user=self.user, category=category, amount=Decimal('5.00'), description='Lunch', date=date(2024, 3, 1)
+        )
+        user_id = self.user.pk
+
+        # The cascade deletes the expense, which signals a bump for the user
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.delete()
+
+        self.assertTrue(callbacks)
+        self.assertFalse(DataVersion.objects.filter(user_id=user_id).exists())
+
+    def test_scope_reads_the_version_once_and_sees_its_own_bumps(self):
+        version = get_version(self.user.pk)
+        with version_scope():
+            with self.assertNumQueries(1):
+                self.assertEqual(get_version(self.user.pk), version)
+                self.assertEqual(get_version(self.user.pk), version)
+            bump_version(self.user.pk)
+            self.assertEqual(get_version(self.user.pk), version + 1)
+
+
+class DataEtagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('etag', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client.force_login(self.user)
+        self.url = reverse('expenses:api_expense_summary')
+
+    def test_unchanged_data_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_in_another_process_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker's bump reaches this one only through the row
+        DataVersion.objects.filter(user=self.user).update(version=F('version') + 1)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal('12.00'), description='Lunch', date=date.today()
+            )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,142 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.categorizer import build_counts, features, train_categorizer
+from expenses.models import CategorizerModel, Category, Expense, RecurringExpense
+from expenses.recurring import materialize_due, reschedule
+
+
+class LearnedExpenseTests(TestCase):
+    """Only expenses whose category a user chose are in the model, and only
+    those are ever taken back out of it."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client.force_login(self.user)
+
+    def counts(self):
+        model = CategorizerModel.objects.filter(user=self.user).first()
+        return model.counts if model else build_counts([])
+
+    def assertModelHolds(self, *expenses):
+        self.assertEqual(self.counts(), build_counts([
+            (expense.description, expense.amount, expense.category_id) for expense in expenses
+        ]))
+
+    def import_csv(self, content):
+        # Committing bumps the data version, so the next import predicts
+        # with what this one learned
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('expenses:expense_import'), {
+                'file': SimpleUploadedFile('expenses.csv', content, content_type='text/csv'),
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_imported_rows_naming_a_category_are_learned(self):
+        self.import_csv(b'date,description,amount,category\n2024-03-01,Groceries,25.00,Food\n')
+        # Predicted into Food from the first import, but not learned
+        self.import_csv(b'date,description,amount,category\n2024-03-02,Groceries,25.00,\n')
+        named, predicted = Expense.objects.order_by('date')
+        self.assertEqual((predicted.category, named.learned, predicted.learned), (self.food, True, False))
+        self.assertModelHolds(named)
+
+        self.client.post(reverse('expenses:expense_delete', args=[predicted.pk]))
+        self.assertModelHolds(named)
+        self.client.post(reverse('expenses:expense_delete', args=[named.pk]))
+        self.assertModelHolds()
+
+    def test_editing_an_unlearned_expense_learns_it(self):
+        self.import_csv(b'date,description,amount,category\n2024-03-01,Groceries,25.00,Food\n')
+        self.import_csv(b'date,description,amount\n2024-03-02,Groceries,25.00\n')
+        named, predicted = Expense.objects.order_by('date')
+
+        response = self.client.post(reverse('expenses:expense_edit', args=[predicted.pk]), {
+            'amount': '25.00', 'description': 'Groceries', 'date': '2024-03-02', 'category': self.food.pk,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        predicted.refresh_from_db()
+        self.assertTrue(predicted.learned)
+        self.assertModelHolds(named, predicted)
+
+    def test_materialized_recurring_expenses_are_never_learned(self):
+        schedule = RecurringExpense(
+            user=self.user, category=self.food, amount=Decimal('800.00'), description='Rent',
+            frequency='monthly', start_date=date(2024, 1, 1)
+        )
+        reschedule(schedule)
+        schedule.save()
+        self.client.post(reverse('expenses:expense_add'), {
+            'amount': '800.00', 'description': 'Rent', 'date': '2023-12-01', 'category': self.food.pk,
+        })
+        paid = Expense.objects.get(recurring=None)
+        materialize_due(date(2024, 3, 1))
+        rent = list(Expense.objects.filter(recurring=schedule))
+        self.assertEqual(len(rent), 3)
+        self.assertModelHolds(paid)
+
+        self.client.post(reverse('expenses:expense_delete', args=[rent[0].pk]))
+        self.client.post(reverse('expenses:api_expense_batch'), json.dumps({'operations': [
+            {'op': 'update', 'id': rent[1].pk, 'amount': '850.00'},
+            {'op': 'delete', 'id': rent[2].pk},
+        ]}), content_type='application/json')
+        self.assertModelHolds(paid)
+
+        # Setting the category in a batch is the caller's choice, so it is learned
+        self.client.post(reverse('expenses:api_expense_batch'), json.dumps({'operations': [
+            {'op': 'update', 'id': rent[1].pk, 'category': self.food.pk},
+        ]}), content_type='application/json')
+        rent[1].refresh_from_db()
+        self.assertModelHolds(paid, rent[1])
+
+    def test_training_reads_only_learned_expenses(self):
+        learned = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('9.00'), description='Lunch',
+            date=date(2024, 3, 1), learned=True
+        )
+        Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('9.00'), description='Suggested lunch',
+            date=date(2024, 3, 2)
+        )
+
+        train_categorizer(user=self.user)
+
+        self.assertModelHolds(learned)
+
+
+class SuggestApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('suggest', password='secret')
+        self.client.force_login(self.user)
+        self.url = reverse('expenses:api_category_suggest')
+
+    def test_amounts_an_expense_cannot_hold_are_rejected(self):
+        for amount in ['1e400', '1e-400', '0', '-5', '10000000000']:
+            with self.subTest(amount=amount):
+                response = self.client.get(self.url, {'description': 'Lunch', 'amount': amount})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('amount', response.json()['error'])
+
+    def test_extreme_amounts_fall_into_the_outermost_buckets(self):
+        self.assertEqual(features('Lunch', Decimal('1e400')), features('Lunch', Decimal('9999999999.99')))
+        self.assertEqual(features('Lunch', Decimal('1e-400')), features('Lunch', Decimal('0.01')))
+
+    def test_a_cold_suggest_after_a_write_stays_within_its_query_budget(self):
+        food = Category.objects.create(user=self.user, name='Food')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('expenses:expense_add'), {
+                'amount': '9.00', 'description': 'Lunch', 'date': '2024-03-01', 'category': food.pk,
+            })
+
+        # Strict test settings raise QueryBudgetExceeded on a query too many
+        response = self.client.get(self.url, {'description': 'Lunch', 'amount': '9.00'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['suggestions'][0]['category'], 'Food')
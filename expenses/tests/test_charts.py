@@ -0,0 +1,44 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from expenses.charts import chart_series
+from expenses.models import Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+
+class ChartSeriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('charts', password='secret')
+        category = Category.objects.create(user=self.user, name='Food')
+        # Wednesday 2025-03-05 is the last day charted
+        self.today = date(2025, 3, 5)
+        for day, amount in [
+            (date(2025, 1, 31), '1.00'),
+            (date(2025, 2, 2), '2.00'),
+            (date(2025, 2, 3), '3.00'),
+            (date(2025, 2, 9), '4.00'),
+            (date(2025, 3, 5), '5.00'),
+            (date(2025, 3, 6), '100.00'),
+        ]:
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal(amount), description='Spend', date=day
+            )
+        rebuild_monthly_spend(user=self.user)
+
+    def test_weeks_start_on_monday_and_are_zero_filled(self):
+        series = chart_series(self.user, self.today, months=2, granularity='week')
+
+        self.assertEqual(series['start'], '2025-01-27')
+        self.assertEqual(series['labels'][:3], ['Jan 27', 'Feb 03', 'Feb 10'])
+        self.assertEqual(series['data'], [3.0, 7.0, 0.0, 0.0, 0.0, 5.0])
+
+    def test_days_and_months(self):
+        days = chart_series(self.user, self.today, months=1, granularity='day')
+        months = chart_series(self.user, self.today, months=3, granularity='month')
+
+        self.assertEqual(days['data'], [0.0] * 4 + [5.0])
+        self.assertEqual(months['labels'], ['Jan 2025', 'Feb 2025', 'Mar 2025'])
+        self.assertEqual(months['data'], [1.0, 9.0, 105.0])
@@ -0,0 +1,51 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+
+class DashboardApiTests(TransactionTestCase):
+    # The sections are queried from worker threads, on their own connections,
+    # so the rows must be committed
+    def setUp(self):
+        self.user = User.objects.create_user('dashboard', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.today = timezone.now().date()
+        Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('10.00'), description='Lunch', date=self.today
+        )
+        rebuild_monthly_spend(user=self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('expenses:api_dashboard')
+
+    def test_refetch_after_a_write_returns_new_totals(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.json()['category_totals'], [['Food', 10.0, 1]])
+
+        response = self.client.post(
+            reverse('expenses:api_expense_batch'),
+            json.dumps({'operations': [{
+                'op': 'create', 'amount': '5.50', 'description': 'Coffee',
+                'date': self.today.isoformat(), 'category': self.food.pk,
+            }]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        refetch = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(refetch.status_code, 200)
+        self.assertNotEqual(refetch['ETag'], first['ETag'])
+        self.assertEqual(refetch.json()['category_totals'], [['Food', 15.5, 2]])
+        self.assertEqual(refetch.json()['recent_expenses'][0][4], 'Coffee')
+
+    def test_unchanged_data_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
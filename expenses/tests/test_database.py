@@ -0,0 +1,34 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from expenses.models import Category
+
+
+class SqliteTransactionTests(TransactionTestCase):
+    # Two connections, so the rows must really be committed
+    def setUp(self):
+        self.user = User.objects.create_user('writer', password='secret')
+
+    def test_a_transaction_can_write_after_another_connection_committed(self):
+        def commit_elsewhere():
+            try:
+                Category.objects.create(user=self.user, name='Elsewhere')
+            finally:
+                connection.close()
+
+        other = threading.Thread(target=commit_elsewhere)
+        with transaction.atomic():
+            list(Category.objects.select_for_update().filter(user=self.user))
+            other.start()
+            # A deferred BEGIN would let the other commit land here and then
+            # refuse this transaction's write with "database is locked"
+            other.join(timeout=0.5)
+            Category.objects.create(user=self.user, name='Here')
+        other.join()
+
+        self.assertEqual(
+            set(Category.objects.filter(user=self.user).values_list('name', flat=True)), {'Here', 'Elsewhere'}
+        )
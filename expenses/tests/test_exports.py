@@ -0,0 +1,66 @@
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.models import Category, Expense
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('export', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.client.force_login(self.user)
+
+    def add_expenses(self, count):
+        start = date(2020, 1, 1)
+        Expense.objects.bulk_create([
+            Expense(
+                user=self.user, category=self.food, amount=Decimal('12.34'),
+                description=f'Synthetic expense number {n}', date=start + timedelta(days=n % 1500)
+            )
+            for n in range(count)
+        ], batch_size=2000)
+
+    def export(self, export_format='csv'):
+        """Stream the export; returns ``(lines, bytes, peak memory)``."""
+        response = self.client.get(reverse('expenses:export_expenses'), {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = size = 0
+        tracemalloc.start()
+        try:
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+                size += len(chunk)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return lines, size, peak
+
+    def test_memory_stays_flat_as_the_export_grows(self):
+        self.add_expenses(5000)
+        lines, size, small_peak = self.export()
+        self.assertEqual(lines, 5001)
+
+        self.add_expenses(35000)
+        lines, size, large_peak = self.export()
+
+        self.assertEqual(lines, 40001)
+        # Eight times the rows, about the same peak: only a chunk of rows is
+        # held at a time, never the whole export
+        self.assertLess(large_peak, small_peak * 1.25)
+        self.assertLess(large_peak, size)
+
+    def test_json_lines(self):
+        self.add_expenses(3)
+
+        response = self.client.get(reverse('expenses:export_expenses'), {'format': 'jsonl'})
+
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 3)
+        self.assertIn('"category":"Food"', rows[0])
+        self.assertEqual(self.client.get(reverse('expenses:export_expenses'), {'format': 'xml'}).status_code, 400)
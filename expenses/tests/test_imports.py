@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.models import Category, Expense, MonthlySpend
+
+
+class ExpenseImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('import', password='secret')
+        self.client.force_login(self.user)
+
+    def upload(self, content):
+        return self.client.post(reverse('expenses:expense_import'), {
+            'file': SimpleUploadedFile('expenses.csv', content, content_type='text/csv'),
+        })
+
+    def test_imports_rows_and_reports_bad_ones(self):
+        response = self.upload(
+            b'\xef\xbb\xbfdate,description,amount,category\n'
+            b'2024-03-01,Groceries,25.00,Food\n'
+            b'2024-03-02,Lunch,12.50,Food\n'
+            b'not a date,Broken,1.00,Food\n'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['imported'], 2)
+        self.assertEqual(response.context['errors'], [(4, 'invalid date')])
+        food = Category.objects.get(user=self.user, name='Food')
+        self.assertEqual(
+            MonthlySpend.objects.get(user=self.user, category=food, year=2024, month=3).total, Decimal('37.50')
+        )
+
+    def test_non_utf8_file_is_a_form_error(self):
+        # Excel's "CSV" on Windows is cp1252
+        content = 'date,description,amount\n2024-03-01,Café crème,3.20\n'.encode('cp1252')
+
+        response = self.upload(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('not UTF-8', response.context['form'].errors['file'][0])
+        self.assertIsNone(response.context['result'])
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+
+    def test_undecodable_row_rolls_back_the_import(self):
+        content = b'date,description,amount\n' + b'2024-03-01,Fine,1.00\n' * 3000 + b'2024-03-02,Caf\xe9,3.20\n'
+
+        response = self.upload(content)
+
+        self.assertIn('not UTF-8', response.context['form'].errors['file'][0])
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+        self.assertFalse(MonthlySpend.objects.filter(user=self.user).exists())
+
+    def test_malformed_csv_is_a_form_error(self):
+        # A field past the csv module's size limit
+        content = b'date,description,amount\n2024-03-01,Lunch,3.20\n2024-03-02,"' + b'x' * 200000 + b'",1.00\n'
+
+        response = self.upload(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('is not valid CSV', response.context['form'].errors['file'][0])
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+
+    def test_nul_characters_are_row_errors(self):
+        response = self.upload(b'date,description,amount\n2024-03-01,Lunch\x00,3.20\n2024-03-02,Dinner,8.00\n')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['imported'], 1)
+        self.assertEqual(response.context['errors'], [(2, 'contains a NUL character')])
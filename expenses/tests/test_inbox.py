@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses import inbox
+from expenses.caching import get_version
+from expenses.models import Alert, AlertInbox, Budget, Category, Expense
+
+
+class AlertInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('inbox', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.budget = Budget.objects.create(
+            user=self.user, category=self.food, amount=Decimal('100.00'), start_date=date(2024, 1, 1)
+        )
+        self.client.force_login(self.user)
+
+    def alert(self, user=None, **fields):
+        fields.setdefault('alert_type', 'budget_exceeded')
+        fields.setdefault('message', 'Over budget')
+        return inbox.create_alert(user=user or self.user, **fields)
+
+    def assertCounter(self, user):
+        """The counter matches the alerts table."""
+        self.assertEqual(
+            AlertInbox.objects.get(user=user).unread,
+            Alert.objects.filter(user=user, is_read=False).count()
+        )
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        alerts = [self.alert() for _ in range(4)]
+        self.alert(user=self.other)
+        self.alert(is_read=True)
+        self.assertEqual(inbox.unread_count(self.user.pk), 4)
+
+        self.assertEqual(inbox.mark_read(self.user.pk, [alerts[0].pk, alerts[1].pk]), 2)
+        # Already read: no change
+        self.assertEqual(inbox.mark_read(self.user.pk, [alerts[0].pk]), 2)
+        self.assertEqual(inbox.mark_unread(self.user.pk, [alerts[0].pk]), 3)
+        self.assertEqual(inbox.delete_alerts(self.user.pk, [alerts[0].pk, alerts[1].pk]), 2)
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+        # Another user's alerts are out of reach
+        self.assertEqual(inbox.delete_alerts(self.user.pk, [Alert.objects.get(user=self.other).pk]), 0)
+
+        self.assertEqual(inbox.mark_read(self.user.pk), 0)
+        self.assertCounter(self.user)
+        self.assertCounter(self.other)
+
+    def test_missing_inbox_is_created_from_the_true_count(self):
+        self.alert()
+        self.alert()
+        AlertInbox.objects.filter(user=self.user).delete()
+
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+        self.alert()
+        self.assertCounter(self.user)
+
+    def test_deleting_many_alerts_bumps_the_version_once(self):
+        alerts = [self.alert() for _ in range(5)]
+        version = get_version(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            inbox.delete_alerts(self.user.pk, [alert.pk for alert in alerts])
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_version(self.user.pk), version + 1)
+
+    def test_compaction_collapses_duplicates_and_purges_old_alerts(self):
+        expense = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('900.00'), description='Spend', date=date(2024, 3, 1)
+        )
+        copies = [self.alert(related_expense=expense, alert_type='irregular_spending') for _ in range(3)]
+        inbox.mark_read(self.user.pk, [copies[2].pk])
+        old = self.alert(user=self.other)
+        Alert.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = inbox.compact_alerts(retention_days=180)
+
+        self.assertEqual((result['duplicates'], result['purged']), (2, 1))
+        # The newest copy is kept, and stays unread since older copies were
+        kept = Alert.objects.get(user=self.user)
+        self.assertEqual((kept.pk, kept.is_read), (copies[2].pk, False))
+        self.assertCounter(self.user)
+        self.assertCounter(self.other)
+
+    def test_alerts_page_marks_the_shown_alerts_read(self):
+        for _ in range(3):
+            self.alert()
+
+        response = self.client.get(reverse('expenses:alerts'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['active_alerts']), 3)
+        self.assertEqual(response.context['active_alerts_count'], 0)
+        self.assertCounter(self.user)
+
+    def test_bulk_actions(self):
+        alerts = [self.alert() for _ in range(3)]
+        url = reverse('expenses:update_alerts')
+
+        self.client.post(url, {'action': 'read', 'alert_ids': [alerts[0].pk, alerts[1].pk]})
+        self.assertEqual(inbox.unread_count(self.user.pk), 1)
+        self.client.post(url, {'action': 'unread', 'alert_ids': [alerts[0].pk]})
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+        self.client.post(url, {'action': 'delete', 'alert_ids': [alerts[0].pk]})
+        self.assertEqual(inbox.unread_count(self.user.pk), 1)
+        self.client.post(url, {'action': 'read', 'all': '1'})
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+        self.assertEqual(self.client.post(url, {'action': 'archive'}).status_code, 400)
+        self.assertCounter(self.user)
@@ -0,0 +1,63 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from expenses.caching import DataVersionMiddleware
+from expenses.metrics import QueryBudgetExceeded, RequestMetricsMiddleware, request_metrics, reset_request_metrics
+from expenses.routers import ReplicaRoutingMiddleware
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('metrics', password='secret')
+        self.client.force_login(self.user)
+        reset_request_metrics()
+
+    def test_views_stay_within_their_budgets(self):
+        # Test settings turn on EXPENSES_QUERY_BUDGET_STRICT, so every view
+        # requested by the suite is checked
+        response = self.client.get(reverse('expenses:api_expense_summary'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request_metrics()['expenses:api_expense_summary']['over_budget'], 0)
+
+    @override_settings(EXPENSES_QUERY_BUDGETS={'expenses:api_expense_summary': 2})
+    def test_going_over_budget_fails_in_strict_mode(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'over its budget of 2'):
+            self.client.get(reverse('expenses:api_expense_summary'))
+
+    @override_settings(EXPENSES_QUERY_BUDGETS={'expenses:api_expense_summary': 2}, EXPENSES_QUERY_BUDGET_STRICT=False)
+    def test_going_over_budget_is_counted_otherwise(self):
+        with self.assertLogs('expenses.metrics', 'WARNING'):
+            response = self.client.get(reverse('expenses:api_expense_summary'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request_metrics()['expenses:api_expense_summary']['over_budget'], 1)
+
+    def test_middleware_runs_async_views_without_a_thread_hop(self):
+        async def get_response(request):
+            pass
+
+        for middleware in (RequestMetricsMiddleware, ReplicaRoutingMiddleware, DataVersionMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(get_response)), middleware)
+            self.assertFalse(iscoroutinefunction(middleware(lambda request: None)), middleware)
+
+
+class AsyncMetricsTests(TransactionTestCase):
+    # The dashboard sections are queried from worker threads, on their own
+    # connections, so the rows must be committed
+
+    def setUp(self):
+        self.user = User.objects.create_user('metrics', password='secret')
+        self.client.force_login(self.user)
+        reset_request_metrics()
+
+    @override_settings(EXPENSES_METRICS_HEADERS=True)
+    def test_async_views_are_measured(self):
+        response = self.client.get(reverse('expenses:api_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        # Including the queries the dashboard sections run in worker threads
+        self.assertGreater(int(response['X-Query-Count']), 3)
+        self.assertEqual(request_metrics()['expenses:api_dashboard']['requests'], 1)
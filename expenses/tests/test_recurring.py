@@ -0,0 +1,98 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.models import Category, Expense, MonthlySpend, RecurringExpense
+from expenses import recurring
+from expenses.recurring import materialize_due, reschedule
+
+
+class MaterializeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recurring', password='secret')
+        self.rent = Category.objects.create(user=self.user, name='Rent')
+        self.schedule = RecurringExpense(
+            user=self.user, category=self.rent, amount=Decimal('800.00'), description='Rent',
+            frequency='monthly', start_date=date(2024, 1, 1)
+        )
+        reschedule(self.schedule)
+        self.schedule.save()
+        self.client.force_login(self.user)
+
+    def rollup_count(self):
+        return sum(MonthlySpend.objects.filter(user=self.user).values_list('count', flat=True))
+
+    def test_reruns_add_nothing(self):
+        self.assertEqual(materialize_due(date(2024, 3, 15))['expenses'], 3)
+        self.schedule.refresh_from_db()
+        reschedule(self.schedule)
+        self.schedule.save()
+
+        self.assertEqual(materialize_due(date(2024, 3, 15))['expenses'], 0)
+        self.assertEqual(Expense.objects.filter(recurring=self.schedule).count(), 3)
+        self.assertEqual(self.rollup_count(), 3)
+
+    def test_database_rejects_a_second_expense_for_one_occurrence(self):
+        materialize_due(date(2024, 1, 15))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Expense.objects.create(
+                user=self.user, category=self.rent, amount=Decimal('800.00'), description='Rent',
+                date=date(2024, 1, 1), recurring=self.schedule
+            )
+
+    def test_rollup_counts_only_rows_inserted(self):
+        plan = recurring._occurrences
+        calls = []
+
+        def raced(schedules, pending, existing):
+            # Another writer adds the February rent between the read and the insert
+            if not calls:
+                Expense.objects.create(
+                    user=self.user, category=self.rent, amount=Decimal('800.00'), description='Rent',
+                    date=date(2024, 2, 1), recurring=self.schedule
+                )
+            calls.append(len(existing))
+            return plan(schedules, pending, existing)
+
+        with mock.patch('expenses.recurring._occurrences', raced):
+            result = materialize_due(date(2024, 3, 15))
+
+        # Planned again after the insert failed, now seeing February
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(result['expenses'], 2)
+        self.assertEqual(Expense.objects.filter(recurring=self.schedule).count(), 3)
+        self.assertEqual(self.rollup_count(), 2)
+
+    def test_an_occurrence_cannot_be_moved_onto_another(self):
+        materialize_due(date(2024, 3, 15))
+        january, february, march = Expense.objects.filter(recurring=self.schedule).order_by('date')
+        url = reverse('expenses:expense_edit', args=[january.pk])
+        fields = {'amount': '800.00', 'description': 'Rent', 'category': self.rent.pk}
+
+        response = self.client.post(url, {**fields, 'date': '2024-02-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('date', response.context['form'].errors)
+
+        response = self.client.post(url, {**fields, 'date': '2024-01-03'})
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.post(reverse('expenses:api_expense_batch'), json.dumps({'operations': [
+            {'op': 'update', 'id': february.pk, 'date': '2024-03-01'},
+            {'op': 'update', 'id': march.pk, 'amount': '810.00'},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertIn('date', results[0]['errors'])
+        self.assertEqual(results[1]['status'], 'valid')
+
+        response = self.client.post(reverse('expenses:api_expense_batch'), json.dumps({'operations': [
+            {'op': 'update', 'id': february.pk, 'date': '2024-02-02'},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
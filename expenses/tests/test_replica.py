@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.caching import bump_version, get_version
+from expenses.models import Category, DataVersion, MonthlySpend
+from expenses.routers import PIN_COOKIE
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # Reads inside a transaction on the primary never go to the replica
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # Per test, so the replica counts as migrated again when it is
+        # flushed afterwards
+        self.enterContext(self.settings(EXPENSES_READ_REPLICA='replica'))
+        self.today = timezone.now().date()
+        self.user = User.objects.create_user('replica', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.spend(10)
+        User.objects.using('replica').create(pk=self.user.pk, username=self.user.username)
+        Category.objects.using('replica').create(pk=self.food.pk, user_id=self.user.pk, name='Food')
+        self.client.force_login(self.user)
+        self.url = reverse('expenses:api_expense_summary')
+
+    def spend(self, total, using='default'):
+        MonthlySpend.objects.using(using).update_or_create(
+            user_id=self.user.pk, category_id=self.food.pk, year=self.today.year, month=self.today.month,
+            defaults={'total': Decimal(total), 'count': 1}
+        )
+
+    def replicate(self, total):
+        """Bring the replica up to the primary's version, holding ``total``
+        (differing from the primary's, to tell where a read went)."""
+        self.spend(total, using='replica')
+        DataVersion.objects.using('replica').update_or_create(
+            user_id=self.user.pk, defaults={'version': get_version(self.user.pk)}
+        )
+
+    def monthly_total(self, **extra):
+        response = self.client.get(self.url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['monthly_total']
+
+    def test_reads_from_a_caught_up_replica(self):
+        self.replicate(11)
+
+        self.assertEqual(self.monthly_total(), 11.0)
+
+    def test_lagging_replica_is_not_read_or_cached(self):
+        self.replicate(11)
+        self.assertEqual(self.monthly_total(), 11.0)
+        # A write on the primary the replica has not received yet
+        self.spend(25)
+        bump_version(self.user.pk)
+
+        self.assertEqual(self.monthly_total(), 25.0)
+        # Once it catches up the cached value, read from the primary under
+        # the same version, is served
+        self.replicate(25)
+        self.assertEqual(self.monthly_total(), 25.0)
+
+    def test_replica_without_the_current_version_reads_the_primary(self):
+        self.assertEqual(self.monthly_total(), 10.0)
+
+    def test_pinned_client_reads_the_primary(self):
+        self.replicate(11)
+        self.client.cookies[PIN_COOKIE] = str(int(timezone.now().timestamp()) + 60)
+
+        self.assertEqual(self.monthly_total(), 10.0)
+
+    def test_views_that_write_are_not_routed(self):
+        # Showing alerts marks them read
+        self.assertNotIn('expenses:alerts', settings.EXPENSES_REPLICA_VIEWS)
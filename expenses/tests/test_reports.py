@@ -0,0 +1,69 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from expenses.models import Category, Expense
+from expenses.rollups import rebuild_monthly_spend
+
+
+class ReportYearTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reports', password='secret')
+        food = Category.objects.create(user=self.user, name='Food')
+        Expense.objects.create(
+            user=self.user, category=food, amount=Decimal('12.00'), description='Lunch', date=date(2024, 5, 1)
+        )
+        rebuild_monthly_spend(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_reports_reject_years_outside_the_calendar(self):
+        for year in ['10000', '1', '0', '-5', 'soon']:
+            response = self.client.get(reverse('expenses:reports'), {'year': year})
+            self.assertEqual(response.status_code, 400, year)
+
+    def test_reports_accept_the_edge_years(self):
+        for year in ['2', '9999']:
+            response = self.client.get(reverse('expenses:reports'), {'year': year})
+            self.assertEqual(response.status_code, 200, year)
+        response = self.client.get(reverse('expenses:reports'), {'year': '2024'})
+        self.assertEqual(response.context['monthly_totals'][4], 12.0)
+
+    def test_export_rejects_years_outside_the_calendar(self):
+        url = reverse('expenses:export_report')
+        self.assertEqual(self.client.get(url, {'year': '10000', 'report_type': 'detailed'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'year': '9999', 'report_type': 'detailed'}).status_code, 200)
+
+
+class ReportPivotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pivot', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        for day in [date(2024, 1, 30), date(2024, 2, 2), date(2024, 2, 3)]:
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal('10.00'), description='Lunch', date=day
+            )
+        rebuild_monthly_spend(user=self.user)
+        self.client.force_login(self.user)
+
+    def get(self, **params):
+        return self.client.get(reverse('expenses:api_report_pivot'), params)
+
+    def test_weeks_are_zero_filled(self):
+        response = self.get(date_from='2024-01-22', date_to='2024-02-11', rows='week', measures='sum,count')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['measures']['sum'], [0.0, 30.0, 0.0])
+        self.assertEqual(data['measures']['count'], [0, 3, 0])
+
+    def test_ranges_reaching_the_last_year_are_rejected(self):
+        for rows in ['week', 'month', 'year']:
+            response = self.get(date_from='9999-01-01', date_to='9999-12-31', rows=rows)
+            self.assertEqual(response.status_code, 400, rows)
+            self.assertIn('9998', response.json()['error'])
+
+        response = self.get(date_from='9998-12-01', date_to='9998-12-31', rows='week', columns='category')
+        self.assertEqual(response.status_code, 200)
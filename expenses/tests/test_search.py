@@ -0,0 +1,41 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery
+from django.test import TestCase
+
+from expenses.models import Category, Expense
+from expenses.search import ranked_search
+
+
+class RankedSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('search', password='secret')
+        category = Category.objects.create(user=self.user, name='Travel')
+        for day, description in enumerate(['Uber ride home', 'Uber', 'Train ticket'], start=1):
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal('10.00'), description=description,
+                date=date(2024, 3, day)
+            )
+
+    def test_best_match_comes_first(self):
+        ranked = list(ranked_search(Expense.objects.filter(user=self.user), 'uber'))
+
+        self.assertEqual([expense.description for expense in ranked], ['Uber', 'Uber ride home'])
+        self.assertGreater(ranked[0].search_rank, ranked[1].search_rank)
+
+    def test_ranked_results_compose_as_a_subquery(self):
+        # Inside a subquery Django aliases the expense table, which the
+        # index join has to follow
+        best = ranked_search(Expense.objects.filter(category=OuterRef('pk')), 'ube')
+
+        categories = Category.objects.annotate(best=Subquery(best.values('description')[:1]))
+
+        self.assertEqual(categories.get(user=self.user).best, 'Uber')
+
+    def test_matched_expenses_can_still_be_deleted(self):
+        ranked_search(Expense.objects.filter(user=self.user), 'uber').delete()
+
+        self.assertEqual(list(ranked_search(Expense.objects.filter(user=self.user), 'uber')), [])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import async_views, views
 
 app_name = 'expenses'
 
@@ -24,10 +24,18 @@ urlpatterns = [
     
     # Expenses
     path('expenses/', views.expense_list, name='expense_list'),
+    path('expenses/export/', views.export_expenses, name='export_expenses'),
+    path('expenses/import/', views.expense_import, name='expense_import'),
     path('expenses/add/', views.expense_add, name='expense_add'),
     path('expenses/<int:pk>/edit/', views.expense_edit, name='expense_edit'),
     path('expenses/<int:pk>/delete/', views.expense_delete, name='expense_delete'),
     
+    # Recurring expenses
+    path('recurring/', views.recurring_list, name='recurring_list'),
+    path('recurring/add/', views.recurring_add, name='recurring_add'),
+    path('recurring/<int:pk>/edit/', views.recurring_edit, name='recurring_edit'),
+    path('recurring/<int:pk>/delete/', views.recurring_delete, name='recurring_delete'),
+    
     # Budgets
     path('budgets/', views.budget_list, name='budget_list'),
     path('budgets/set/', views.budget_set, name='budget_set'),
@@ -36,13 +44,26 @@ urlpatterns = [
     
     # Reports
     path('reports/', views.reports, name='reports'),
+    path('reports/export/', views.export_report, name='export_report'),
     
     # Alerts
     path('alerts/', views.alerts, name='alerts'),
     path('alerts/<int:alert_id>/delete/', views.delete_alert, name='delete_alert'),
     path('alerts/clear/', views.clear_alerts, name='clear_alerts'),
+    path('alerts/update/', views.update_alerts, name='update_alerts'),
     
     # API Endpoints
     path('api/expense-summary/', views.api_expense_summary, name='api_expense_summary'),
     path('api/expense-chart-data/', views.api_expense_chart_data, name='api_expense_chart_data'),
+    path('api/expenses/', views.api_expense_list, name='api_expense_list'),
+    path('api/categories/suggest/', views.api_category_suggest, name='api_category_suggest'),
+    path('api/expenses/batch/', views.api_expense_batch, name='api_expense_batch'),
+    path('api/expenses/search/', views.api_expense_search, name='api_expense_search'),
+    path('api/reports/pivot/', views.api_report_pivot, name='api_report_pivot'),
+    path('api/dashboard/', async_views.api_dashboard, name='api_dashboard'),
+    path('api/metrics/', views.metrics, name='metrics'),
+    
+    # Async API Endpoints (concurrent queries when served over ASGI)
+    path('api/async/expense-summary/', async_views.api_expense_summary, name='async_api_expense_summary'),
+    path('api/async/expense-chart-data/', async_views.api_expense_chart_data, name='async_api_expense_chart_data'),
 ]
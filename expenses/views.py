@@ -1,13 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, F, Q
+from django.db import transaction
+from django.db.models import Sum, F
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date
+from datetime import date, timedelta
+from copy import copy
+import io
+import json
 from decimal import Decimal
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 
 @login_required
 def profile(request):
@@ -18,8 +24,26 @@ def profile(request):
     return render(request, 'expenses/profile.html', context)
 
 
-from .models import Category, Budget, Expense, Alert
-from .forms import CategoryForm, BudgetForm, ExpenseForm, SignUpForm, LoginForm
+from .models import Category, Budget, Expense, Alert, MonthlySpend, RecurringExpense
+from .forms import (CategoryForm, BudgetForm, ExpenseForm, ExpenseImportForm, RecurringExpenseForm, SignUpForm,
+                    LoginForm)
+from .alert_queue import enqueue_alert_check, queue_metrics
+from .analytics import user_columns, year_report
+from .batch import apply_batch
+from .anomalies import observe_expense
+from .budgets import active_budgets, budget_history, evaluate_budgets
+from . import rollups
+from .caching import cache_stats, cached, data_etag
+from . import categorizer, inbox
+from .charts import chart_series
+from .imports import import_expenses
+from .metrics import request_metrics
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, streaming_export
+from .pivots import pivot
+from .recurring import reschedule
+from .search import ranked_search
+from .pagination import (alert_page, decode_alert_cursor, decode_cursor, encode_alert_cursor, encode_cursor,
+                         expense_filters, filter_expenses, keyset_page)
 
 def signup(request):
     if request.method == 'POST':
@@ -34,64 +58,8 @@ def signup(request):
 
 @login_required
 def dashboard(request):
-    # Get recent expenses
-    recent_expenses = Expense.objects.filter(user=request.user).order_by('-date')[:5]
-    
-    # Get current month's expenses by category
-    current_month = timezone.now().month
-    current_year = timezone.now().year
-    
-    monthly_expenses = Expense.objects.filter(
-        user=request.user,
-        date__year=current_year,
-        date__month=current_month
-    ).values('category__name').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
-    
-    # Calculate total spent this month
-    total_spent = sum(expense['total'] for expense in monthly_expenses)
-    
-    # Get budgets for the current period
-    today = timezone.now().date()
-    active_budgets = Budget.objects.filter(
-        user=request.user,
-        start_date__lte=today
-    ).filter(
-        Q(end_date__isnull=True) | Q(end_date__gte=today)
-    )
-    
-    # Calculate budget vs actuals
-    budget_data = []
-    for budget in active_budgets:
-        expenses = Expense.objects.filter(
-            user=request.user,
-            category=budget.category,
-            date__gte=budget.start_date,
-            date__lte=budget.end_date if budget.end_date else today
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        budget_data.append({
-            'category': budget.category.name,
-            'budget': budget.amount,
-            'spent': expenses,
-            'remaining': budget.amount - expenses,
-            'percent_used': min(100, (expenses / budget.amount * 100) if budget.amount > 0 else 0)
-        })
-    
-    # Get unread alerts
-    unread_alerts = Alert.objects.filter(user=request.user, is_read=False).count()
-    
-    context = {
-        'recent_expenses': recent_expenses,
-        'monthly_expenses': monthly_expenses,
-        'total_spent': total_spent,
-        'budget_data': budget_data,
-        'unread_alerts': unread_alerts,
-    }
-    
-    return render(request, 'expenses/dashboard.html', context)
+    # The widgets are filled in client-side from api_dashboard
+    return render(request, 'expenses/dashboard.html')
 
 @login_required
 def category_list(request):
@@ -129,45 +97,72 @@ def category_edit(request, pk):
 def category_delete(request, pk):
     category = get_object_or_404(Category, pk=pk, user=request.user)
     if request.method == 'POST':
-        category.delete()
+        with transaction.atomic():
+            categorizer.forget_category(request.user.pk, category.pk)
+            category.delete()
         messages.success(request, 'Category deleted successfully!')
         return redirect('expenses:category_list')
     return render(request, 'expenses/confirm_delete.html', {'object': category, 'type': 'category'})
 
 @login_required
 def expense_list(request):
-    expenses = Expense.objects.filter(user=request.user).order_by('-date')
-    
-    # Filtering
-    category_id = request.GET.get('category')
-    if category_id:
-        expenses = expenses.filter(category_id=category_id)
-    
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    
-    if date_from:
-        expenses = expenses.filter(date__gte=date_from)
-    if date_to:
-        expenses = expenses.filter(date__lte=date_to)
-    
-    # Pagination
-    paginator = Paginator(expenses, 10)  # Show 10 expenses per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    expenses = Expense.objects.filter(user=request.user).select_related('category')
+    
+    # Filtering; a cursor carries the filters of the listing it came from
+    filters = expense_filters(request.GET)
+    key, direction = None, 'next'
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            filters, key, direction = decode_cursor(cursor)
+        except ValueError:
+            pass
+    expenses = filter_expenses(expenses, filters)
+    
+    # Keyset pagination
+    page = keyset_page(expenses, key, direction, per_page=EXPENSES_PER_PAGE)
+    total_count = _expense_count(request.user, expenses, filters)
     
     categories = Category.objects.filter(user=request.user).order_by('name')
     
     context = {
-        'expenses': page_obj,
+        'expenses': page['object_list'],
+        'next_cursor': encode_cursor(filters, page['next_key']) if page['next_key'] else None,
+        'previous_cursor': encode_cursor(filters, page['previous_key'], 'previous') if page['previous_key'] else None,
+        'total_count': total_count,
         'categories': categories,
-        'selected_category': int(category_id) if category_id else '',
-        'date_from': date_from or '',
-        'date_to': date_to or '',
+        'selected_category': filters.get('category', ''),
+        'date_from': filters.get('date_from', ''),
+        'date_to': filters.get('date_to', ''),
+        'q': filters.get('q', ''),
     }
     
     return render(request, 'expenses/expense_list.html', context)
 
+EXPENSES_PER_PAGE = 10
+
+def _expense_count(user, expenses, filters):
+    """Total matching expenses, cached until the user's data changes."""
+    return cached(
+        user, 'expense_count', lambda: expenses.order_by().count(),
+        *(f'{name}={value}' for name, value in sorted(filters.items()))
+    )
+
+@login_required
+def export_expenses(request):
+    """Stream the user's expenses, with the expense_list filters applied"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format')
+    
+    filters = expense_filters(request.GET)
+    expenses = filter_expenses(Expense.objects.filter(user=request.user), filters)
+    rows = expenses.order_by('-date', '-created_at', '-id').values_list(
+        'date', 'description', 'category__name', 'amount'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    return streaming_export(['date', 'description', 'category', 'amount'], rows, export_format, 'expenses')
+
 @login_required
 def expense_add(request):
     if request.method == 'POST':
@@ -175,56 +170,68 @@ def expense_add(request):
         if form.is_valid():
             expense = form.save(commit=False)
             expense.user = request.user
-            expense.save()
+            expense.learned = True
+            with transaction.atomic():
+                expense.save()
+                rollups.add_expense(expense)
+                categorizer.learn(expense)
+                # Budget alerts are evaluated in the background
+                enqueue_alert_check(expense.user, expense.category_id, expense)
+                observe_expense(expense)
             messages.success(request, 'Expense added successfully!')
             
-            # Check budget and create alert if exceeded
-            check_budget_alert(expense)
-            
             return redirect('expenses:expense_list')
     else:
         form = ExpenseForm(user=request.user)
     
     return render(request, 'expenses/expense_form.html', {'form': form, 'title': 'Add Expense'})
 
-def check_budget_alert(expense):
-    """Check if expense exceeds any budget and create alert if it does"""
-    today = timezone.now().date()
-    
-    # Get all active budgets for this category
-    budgets = Budget.objects.filter(
-        user=expense.user,
-        category=expense.category,
-        start_date__lte=today
-    ).filter(
-        Q(end_date__isnull=True) | Q(end_date__gte=today)
-    )
+@login_required
+def expense_import(request):
+    result = None
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_expenses(request.user, lines)
+            except ValueError as exc:
+                form.add_error('file', str(exc))
+            else:
+                if result['imported']:
+                    messages.success(
+                        request,
+                        f"Imported {result['imported']} expenses ({result['rows_per_sec']:.0f} rows/sec)."
+                    )
+                if result['categorized']:
+                    messages.info(request, f"{result['categorized']} uncategorized rows were given a suggested category.")
+                if result['errors']:
+                    messages.warning(request, f"{len(result['errors'])} rows could not be imported.")
+    else:
+        form = ExpenseImportForm()
     
-    for budget in budgets:
-        # Calculate total expenses in the budget period
-        total_expenses = Expense.objects.filter(
-            user=expense.user,
-            category=expense.category,
-            date__gte=budget.start_date,
-            date__lte=budget.end_date if budget.end_date else today
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Check if budget is exceeded
-        if total_expenses > budget.amount:
-            Alert.objects.create(
-                user=expense.user,
-                alert_type='budget_exceeded',
-                message=f'Budget exceeded for {expense.category.name}! You have spent {total_expenses} out of {budget.amount} {budget.get_period_display()}.',
-                related_expense=expense
-            )
+    return render(request, 'expenses/expense_import.html', {
+        'form': form,
+        'result': result,
+        'errors': result['errors'][:100] if result else [],
+    })
 
 @login_required
 def expense_edit(request, pk):
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
     if request.method == 'POST':
+        # Form validation mutates the instance, so keep the stored state
+        previous = copy(expense)
         form = ExpenseForm(request.user, request.POST, instance=expense)
         if form.is_valid():
-            form.save()
+            # The category the user saved is theirs now, even on an expense
+            # that was imported or scheduled with another
+            expense.learned = True
+            with transaction.atomic():
+                form.save()
+                rollups.update_expense(previous, expense)
+                categorizer.relearn(previous, expense)
+                enqueue_alert_check(expense.user, expense.category_id, expense)
             messages.success(request, 'Expense updated successfully!')
             return redirect('expenses:expense_list')
     else:
@@ -235,7 +242,10 @@ def expense_edit(request, pk):
 def expense_delete(request, pk):
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
     if request.method == 'POST':
-        expense.delete()
+        with transaction.atomic():
+            rollups.remove_expense(expense)
+            categorizer.forget(expense)
+            expense.delete()
         messages.success(request, 'Expense deleted successfully!')
         return redirect('expenses:expense_list')
     return render(request, 'expenses/confirm_delete.html', {'object': expense, 'type': 'expense'})
@@ -243,29 +253,16 @@ def expense_delete(request, pk):
 @login_required
 def budget_list(request):
     today = timezone.now().date()
-    active_budgets = Budget.objects.filter(
-        user=request.user,
-        start_date__lte=today
-    ).filter(
-        Q(end_date__isnull=True) | Q(end_date__gte=today)
-    ).order_by('-start_date')
-    
-    # Calculate spent amounts for each budget
-    budget_data = []
-    for budget in active_budgets:
-        expenses = Expense.objects.filter(
-            user=request.user,
-            category=budget.category,
-            date__gte=budget.start_date,
-            date__lte=budget.end_date if budget.end_date else today
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        budget_data.append({
-            'budget': budget,
-            'spent': expenses,
-            'remaining': budget.amount - expenses,
-            'percent_used': min(100, (expenses / budget.amount * 100) if budget.amount > 0 else 0)
-        })
+    
+    # Calculate spent amounts for each budget's current period
+    budget_data = evaluate_budgets(
+        active_budgets(request.user, today).order_by('-start_date'), today
+    )
+    
+    # Utilization over the recent periods
+    history = budget_history([item['budget'] for item in budget_data], today)
+    for item in budget_data:
+        item['history'] = history[item['budget'].pk]
     
     # Get expired budgets
     expired_budgets = Budget.objects.filter(
@@ -316,155 +313,516 @@ def budget_delete(request, pk):
     return render(request, 'expenses/confirm_delete.html', {'object': budget, 'type': 'budget'})
 
 @login_required
-def reports(request):
-    # Default to current year
-    year = int(request.GET.get('year', timezone.now().year))
+def recurring_list(request):
+    schedules = RecurringExpense.objects.filter(user=request.user).select_related('category').order_by(
+        F('next_date').asc(nulls_last=True), 'description'
+    )
+    return render(request, 'expenses/recurring_list.html', {'schedules': schedules})
+
+@login_required
+def recurring_add(request):
+    if request.method == 'POST':
+        form = RecurringExpenseForm(request.user, request.POST)
+        if form.is_valid():
+            schedule = form.save(commit=False)
+            schedule.user = request.user
+            reschedule(schedule)
+            schedule.save()
+            messages.success(request, 'Recurring expense added successfully!')
+            return redirect('expenses:recurring_list')
+    else:
+        form = RecurringExpenseForm(request.user, initial={'start_date': timezone.now().date()})
     
-    # Get monthly expenses for the selected year
-    monthly_expenses = Expense.objects.filter(
-        user=request.user,
-        date__year=year
-    ).values('date__month').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('date__month')
-    
-    # Get category-wise expenses for the year
-    category_expenses = Expense.objects.filter(
-        user=request.user,
-        date__year=year
-    ).values('category__name').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
+    return render(request, 'expenses/recurring_form.html', {'form': form, 'title': 'Add Recurring Expense'})
+
+@login_required
+def recurring_edit(request, pk):
+    schedule = get_object_or_404(RecurringExpense, pk=pk, user=request.user)
+    if request.method == 'POST':
+        form = RecurringExpenseForm(request.user, request.POST, instance=schedule)
+        if form.is_valid():
+            schedule = form.save(commit=False)
+            # Continue after what has been materialized under the old schedule
+            last = schedule.expenses.order_by('-date').values_list('date', flat=True).first()
+            reschedule(schedule, last)
+            schedule.save()
+            messages.success(request, 'Recurring expense updated successfully!')
+            return redirect('expenses:recurring_list')
+    else:
+        form = RecurringExpenseForm(request.user, instance=schedule)
+    return render(request, 'expenses/recurring_form.html', {'form': form, 'title': 'Edit Recurring Expense'})
+
+@login_required
+def recurring_delete(request, pk):
+    schedule = get_object_or_404(RecurringExpense, pk=pk, user=request.user)
+    if request.method == 'POST':
+        # Expenses already materialized are kept
+        schedule.delete()
+        messages.success(request, 'Recurring expense deleted successfully!')
+    return redirect('expenses:recurring_list')
+
+# Compact separators for JSON API bodies
+COMPACT_JSON = {'separators': (',', ':')}
+
+def _data_etag(request, *args, **kwargs):
+    # Responses depend only on the user's data and on today's date, so polls
+    # can be answered with a 304 before any aggregate is looked at
+    return data_etag(request.user.pk, timezone.now().date())
+
+# Reports compare against the previous year, so it must be a date too
+REPORT_YEARS = range(date.min.year + 1, date.max.year + 1)
+
+def _report_year(params):
+    """The ``year`` parameter, default this year; ValueError if it is not
+    a year that can be reported on."""
+    year = int(params.get('year', timezone.now().year))
+    if year not in REPORT_YEARS:
+        raise ValueError(f'year must be between {REPORT_YEARS.start} and {REPORT_YEARS.stop - 1}')
+    return year
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
+def reports(request):
+    try:
+        year = _report_year(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid year')
+    context = cached(request.user, 'reports', lambda: _reports_context(request.user, year), year)
+    return render(request, 'expenses/reports.html', context)
+
+# Chart colours, assigned to categories in order of spend
+CATEGORY_COLORS = [
+    '#4361ee', '#3f37c9', '#4cc9f0', '#4895ef', '#560bad',
+    '#f72585', '#7209b7', '#3a0ca3', '#b5179e', '#480ca8',
+]
+
+def _reports_context(user, year):
+    # Every breakdown comes from one columnar load of the user's expenses
+    columns = user_columns(user)
+    report = year_report(columns, year)
+    
+    # Category totals for the year, largest first
+    order = [code for code in report['category_totals'].argsort()[::-1] if report['category_counts'][code]]
+    total_spent = float(report['category_totals'].sum())
+    category_totals = [
+        {
+            'name': columns.category_names[code],
+            'total': float(report['category_totals'][code]),
+            'count': int(report['category_counts'][code]),
+            'percentage': float(report['category_totals'][code]) / total_spent * 100 if total_spent else 0,
+            'color': CATEGORY_COLORS[index % len(CATEGORY_COLORS)],
+        }
+        for index, code in enumerate(order)
+    ]
     
-    # Prepare data for charts
     months = [f"{month:02d}" for month in range(1, 13)]
-    monthly_totals = [0] * 12
-    
-    for expense in monthly_expenses:
-        month_index = expense['date__month'] - 1
-        monthly_totals[month_index] = float(expense['total'])
+    monthly_totals = [round(total, 2) for total in report['monthly_totals'].tolist()]
+    top_expenses = Expense.objects.filter(pk__in=report['top_ids']).values('date', 'description', 'amount')
     
     # Get available years for the dropdown
-    years = Expense.objects.filter(user=request.user).dates('date', 'year').order_by('-year')
-    years = [d.year for d in years]
+    years = MonthlySpend.objects.filter(user=user).values_list('year', flat=True)
+    years = sorted(set(years), reverse=True)
     if not years:  # If no expenses yet, just show current year
         years = [timezone.now().year]
     
-    context = {
+    return {
         'year': year,
         'years': years,
         'months': months,
         'monthly_totals': monthly_totals,
-        'category_expenses': category_expenses,
+        'category_expenses': [
+            {'category__name': item['name'], 'total': item['total'], 'count': item['count']}
+            for item in category_totals
+        ],
+        'category_totals': category_totals,
+        'total_spent': total_spent,
+        'top_expenses': sorted(top_expenses, key=lambda expense: expense['amount'], reverse=True),
+        'trend_labels': json.dumps([date(year, month, 1).strftime('%b') for month in range(1, 13)]),
+        'trend_data': json.dumps(monthly_totals),
+        'category_names': json.dumps([item['name'] for item in category_totals]),
+        'category_amounts': json.dumps([item['total'] for item in category_totals]),
+        'category_colors': json.dumps([item['color'] for item in category_totals]),
+        'time_series_labels': json.dumps([f'W{week + 1}' for week in range(len(report['weekly_totals']))]),
+        'time_series_data': json.dumps([round(total, 2) for total in report['weekly_totals'].tolist()]),
+        'day_of_week_data': json.dumps([round(total, 2) for total in report['weekday_averages'].tolist()]),
     }
+
+@login_required
+def export_report(request):
+    """Stream a report for one year
+    
+    ``report_type`` picks the breakdown: ``summary`` (month x category),
+    ``time`` (monthly totals), ``category`` (category totals) or
+    ``detailed`` (every transaction in the year).
+    """
+    params = request.POST if request.method == 'POST' else request.GET
+    export_format = params.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format')
+    try:
+        year = _report_year(params)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid year')
+    
+    report_type = params.get('report_type', 'summary')
+    rollup = MonthlySpend.objects.filter(user=request.user, year=year)
+    
+    if report_type == 'summary':
+        columns = ['month', 'category', 'total', 'count']
+        rows = rollup.order_by('month', 'category__name').values_list(
+            'month', 'category__name', 'total', 'count'
+        )
+    elif report_type == 'time':
+        columns = ['month', 'total', 'count']
+        rows = rollup.values('month').annotate(
+            total=Sum('total'),
+            count=Sum('count')
+        ).order_by('month').values_list('month', 'total', 'count')
+    elif report_type == 'category':
+        columns = ['category', 'total', 'count']
+        rows = rollup.values('category__name').annotate(
+            total=Sum('total'),
+            count=Sum('count')
+        ).order_by('-total').values_list('category__name', 'total', 'count')
+    elif report_type == 'detailed':
+        columns = ['date', 'description', 'category', 'amount']
+        rows = Expense.objects.filter(
+            user=request.user,
+            date__gte=date(year, 1, 1),
+            date__lte=date(year, 12, 31)
+        ).order_by('date', 'created_at', 'id').values_list(
+            'date', 'description', 'category__name', 'amount'
+        )
+    else:
+        return HttpResponseBadRequest('Unsupported report type')
     
-    return render(request, 'expenses/reports.html', context)
+    return streaming_export(
+        columns, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), export_format, f'report-{year}-{report_type}'
+    )
 
 @login_required
 def alerts(request):
-    alerts = Alert.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Mark all unread alerts as read
-    unread_alerts = alerts.filter(is_read=False)
-    if unread_alerts.exists():
-        unread_alerts.update(is_read=True)
+    key, direction = None, 'next'
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            key, direction = decode_alert_cursor(cursor)
+        except ValueError:
+            pass
+    page = alert_page(Alert.objects.filter(user=request.user), key, direction, per_page=ALERTS_PER_PAGE)
+    
+    # Only the alerts on this page have been seen; they still show as new
+    # this once
+    shown_unread = [alert.pk for alert in page['object_list'] if not alert.is_read]
+    if shown_unread:
+        unread = inbox.mark_read(request.user.pk, shown_unread)
+    else:
+        unread = inbox.unread_count(request.user.pk)
     
-    return render(request, 'expenses/alerts.html', {'alerts': alerts})
+    context = {
+        'active_alerts': page['object_list'],
+        'active_alerts_count': unread,
+        'next_cursor': encode_alert_cursor(page['next_key']) if page['next_key'] else None,
+        'previous_cursor': encode_alert_cursor(page['previous_key'], 'previous') if page['previous_key'] else None,
+    }
+    return render(request, 'expenses/alerts.html', context)
+
+ALERTS_PER_PAGE = 20
+# Bulk actions on selected alerts
+ALERT_ACTIONS = ('read', 'unread', 'delete')
 
 @login_required
 def delete_alert(request, alert_id):
     alert = get_object_or_404(Alert, id=alert_id, user=request.user)
-    alert.delete()
+    inbox.delete_alerts(request.user.pk, [alert.pk])
     messages.success(request, 'Alert deleted successfully!')
     return redirect('expenses:alerts')
 
 @login_required
 def clear_alerts(request):
-    Alert.objects.filter(user=request.user).delete()
+    inbox.delete_alerts(request.user.pk)
     messages.success(request, 'All alerts cleared successfully!')
     return redirect('expenses:alerts')
 
+@login_required
+@require_http_methods(['POST'])
+def update_alerts(request):
+    """Mark the selected alerts (``alert_ids``) read or unread, or delete
+    them; ``all`` marks every alert read."""
+    action = request.POST.get('action')
+    if action not in ALERT_ACTIONS:
+        return HttpResponseBadRequest(f"action must be one of {', '.join(ALERT_ACTIONS)}")
+    if action == 'read' and request.POST.get('all'):
+        inbox.mark_read(request.user.pk)
+        messages.success(request, 'All alerts marked as read.')
+        return redirect('expenses:alerts')
+    
+    alert_ids = [int(pk) for pk in request.POST.getlist('alert_ids') if pk.isdigit()]
+    if action == 'delete':
+        count = inbox.delete_alerts(request.user.pk, alert_ids)
+        messages.success(request, f'{count} alerts deleted.')
+    elif action == 'read':
+        inbox.mark_read(request.user.pk, alert_ids)
+        messages.success(request, 'Selected alerts marked as read.')
+    else:
+        inbox.mark_unread(request.user.pk, alert_ids)
+        messages.success(request, 'Selected alerts marked as unread.')
+    return redirect('expenses:alerts')
+
 # API Views
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
 def api_expense_summary(request):
     """API endpoint for expense summary data"""
     today = timezone.now().date()
+    data = cached(request.user, 'expense_summary', lambda: _expense_summary_data(request.user, today), today)
+    return JsonResponse(data, json_dumps_params=COMPACT_JSON)
+
+def _expense_summary_data(user, today):
     last_month = today - timedelta(days=30)
-    
-    # Total spent this month
-    monthly_total = Expense.objects.filter(
-        user=request.user,
-        date__year=today.year,
-        date__month=today.month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Total spent last month
-    last_month_total = Expense.objects.filter(
-        user=request.user,
-        date__year=last_month.year,
-        date__month=last_month.month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
+    return _summary_payload(
+        _month_total(user, today),
+        _month_total(user, last_month),
+        _top_categories(user, today)
+    )
+
+def _month_total(user, day):
+    """Total spent in the month containing ``day``"""
+    return MonthlySpend.objects.filter(
+        user=user,
+        year=day.year,
+        month=day.month
+    ).aggregate(total=Sum('total'))['total'] or 0
+
+def _top_categories(user, day):
+    """Top spending categories in the month containing ``day``"""
+    return list(MonthlySpend.objects.filter(
+        user=user,
+        year=day.year,
+        month=day.month
+    ).values('category__name').annotate(
+        total=Sum('total')
+    ).order_by('-total')[:5])
+
+def _summary_payload(monthly_total, last_month_total, top_categories):
     # Calculate percentage change
     if last_month_total > 0:
         percent_change = ((monthly_total - last_month_total) / last_month_total) * 100
     else:
         percent_change = 0
     
-    # Top spending categories this month
-    top_categories = Expense.objects.filter(
-        user=request.user,
-        date__year=today.year,
-        date__month=today.month
-    ).values('category__name').annotate(
-        total=Sum('amount')
-    ).order_by('-total')[:5]
-    
-    data = {
+    return {
         'monthly_total': float(monthly_total),
         'percent_change': float(percent_change),
-        'top_categories': list(top_categories)
+        'top_categories': top_categories
     }
-    
-    return JsonResponse(data)
+
+CHART_GRANULARITIES = ('day', 'week', 'month')
+CHART_MAX_MONTHS = 36
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
 def api_expense_chart_data(request):
-    """API endpoint for expense chart data"""
-    # Get expenses for the last 6 months
-    today = timezone.now().date()
-    six_months_ago = today - timedelta(days=180)
+    """API endpoint for expense chart data
+    
+    Accepts ``months`` (window size, default 6) and ``granularity``
+    (day/week/month, default month) and returns zero-filled ``labels`` and
+    ``data`` columns.
+    """
+    granularity = request.GET.get('granularity', 'month')
+    if granularity not in CHART_GRANULARITIES:
+        return JsonResponse({'error': 'granularity must be one of day, week, month'}, status=400)
+    try:
+        months = int(request.GET.get('months', 6))
+    except ValueError:
+        return JsonResponse({'error': 'months must be an integer'}, status=400)
+    months = max(1, min(months, CHART_MAX_MONTHS))
     
-    # Get monthly totals
-    monthly_expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=six_months_ago,
-        date__lte=today
-    ).extra({
-        'month': "date_trunc('month', date)"
-    }).values('month').annotate(
-        total=Sum('amount')
-    ).order_by('month')
-    
-    # Prepare data for chart
-    months = []
-    amounts = []
-    
-    for expense in monthly_expenses:
-        months.append(expense['month'].strftime('%b %Y'))
-        amounts.append(float(expense['total']))
+    today = timezone.now().date()
+    data = cached(
+        request.user, 'expense_chart',
+        lambda: chart_series(request.user, today, months, granularity),
+        today, months, granularity
+    )
+    return JsonResponse(data, json_dumps_params=COMPACT_JSON)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
+def api_report_pivot(request):
+    """API endpoint pivoting spending over a date range
+    
+    Takes ``date_from``/``date_to`` (default this year to date), ``rows`` and
+    optional ``columns`` dimensions (year, month, month_of_year, week,
+    category) and comma-separated ``measures`` (sum, count, avg).
+    """
+    today = timezone.now().date()
+    try:
+        start = parse_date(request.GET.get('date_from') or '') or date(today.year, 1, 1)
+        end = parse_date(request.GET.get('date_to') or '') or today
+    except ValueError:
+        return JsonResponse({'error': 'dates must be YYYY-MM-DD'}, status=400)
+    measures = [measure for measure in request.GET.get('measures', 'sum').split(',') if measure]
+    
+    try:
+        data = cached(
+            request.user, 'report_pivot',
+            lambda: pivot(request.user, start, end, request.GET.get('rows', 'month'),
+                          request.GET.get('columns') or None, measures),
+            start, end, request.GET.get('rows', 'month'), request.GET.get('columns'), ','.join(measures)
+        )
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(data, json_dumps_params=COMPACT_JSON)
+
+API_EXPENSES_PER_PAGE = 50
+API_EXPENSES_MAX_PER_PAGE = 500
+
+@login_required
+def api_expense_list(request):
+    """API endpoint listing expenses as compact rows
+    
+    Takes the expense_list filters plus ``cursor``, ``limit`` and ``count=1``
+    to include the (cached) total.
+    """
+    filters = expense_filters(request.GET)
+    key, direction = None, 'next'
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            filters, key, direction = decode_cursor(cursor)
+        except ValueError:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', API_EXPENSES_PER_PAGE))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    limit = max(1, min(limit, API_EXPENSES_MAX_PER_PAGE))
+    
+    expenses = filter_expenses(Expense.objects.filter(user=request.user), filters)
+    page = keyset_page(
+        expenses.values_list('id', 'date', 'created_at', 'amount', 'category_id', 'category__name', 'description'),
+        key, direction, per_page=limit,
+        key_of=lambda row: (row[1], row[2], row[0])
+    )
     
     data = {
-        'labels': months,
-        'datasets': [{
-            'label': 'Monthly Expenses',
-            'data': amounts,
-            'backgroundColor': 'rgba(54, 162, 235, 0.2)',
-            'borderColor': 'rgba(54, 162, 235, 1)',
-            'borderWidth': 1
-        }]
+        'columns': ['id', 'date', 'amount', 'category_id', 'category', 'description'],
+        'rows': [
+            [pk, day.isoformat(), str(amount), category_id, category, description]
+            for pk, day, created_at, amount, category_id, category, description in page['object_list']
+        ],
+        'next': encode_cursor(filters, page['next_key']) if page['next_key'] else None,
+        'previous': encode_cursor(filters, page['previous_key'], 'previous') if page['previous_key'] else None,
     }
+    if request.GET.get('count') == '1':
+        data['count'] = _expense_count(request.user, expenses, filters)
     
     return JsonResponse(data)
+
+@login_required
+@require_http_methods(['POST'])
+def api_expense_batch(request):
+    """API endpoint applying many expense writes in one transaction
+    
+    Takes a JSON body ``{"operations": [...]}`` of creates, updates and
+    deletes (see expenses/batch.py) and returns one result per operation.
+    Either all of them are applied or, with a 400, none is.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'body must be JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'body must be a JSON object'}, status=400)
+    
+    try:
+        applied, results = apply_batch(request.user, payload.get('operations'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(
+        {'applied': applied, 'results': results}, status=200 if applied else 400, json_dumps_params=COMPACT_JSON
+    )
+
+API_SUGGESTIONS = 3
+API_SUGGESTIONS_MAX = 10
+
+@login_required
+def api_category_suggest(request):
+    """API endpoint suggesting categories for an expense
+    
+    Takes ``description``, optional ``amount`` and ``limit``; returns the
+    user's likeliest categories with their probabilities, learned from the
+    user's own history.
+    """
+    description = request.GET.get('description', '').strip()
+    if not description:
+        return JsonResponse({'error': 'description is required'}, status=400)
+    amount = None
+    if request.GET.get('amount'):
+        try:
+            amount = Decimal(request.GET['amount'])
+        except ArithmeticError:
+            amount = Decimal('NaN')
+        if not amount.is_finite() or not categorizer.MIN_AMOUNT <= amount <= categorizer.MAX_AMOUNT:
+            return JsonResponse({
+                'error': f'amount must be a number from {categorizer.MIN_AMOUNT} to {categorizer.MAX_AMOUNT}'
+            }, status=400)
+    try:
+        limit = int(request.GET.get('limit', API_SUGGESTIONS))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    limit = max(1, min(limit, API_SUGGESTIONS_MAX))
+    
+    return JsonResponse({
+        'suggestions': categorizer.suggest_categories(request.user, description, amount, limit),
+    }, json_dumps_params=COMPACT_JSON)
+
+API_SEARCH_RESULTS = 20
+API_SEARCH_MAX_RESULTS = 200
+
+@login_required
+def api_expense_search(request):
+    """API endpoint for ranked full-text search over descriptions
+    
+    Takes ``q`` plus the expense_list filters and ``limit``; every word of
+    ``q`` must match as a prefix. Best matches come first.
+    """
+    filters = expense_filters(request.GET)
+    if 'q' not in filters:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', API_SEARCH_RESULTS))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    limit = max(1, min(limit, API_SEARCH_MAX_RESULTS))
+    
+    # ranked_search applies q itself, with the ranking
+    expenses = filter_expenses(Expense.objects.filter(user=request.user), {
+        name: value for name, value in filters.items() if name != 'q'
+    })
+    rows = ranked_search(expenses, filters['q']).values_list(
+        'id', 'date', 'amount', 'category_id', 'category__name', 'description', 'search_rank'
+    )[:limit]
+    
+    return JsonResponse({
+        'query': filters['q'],
+        'columns': ['id', 'date', 'amount', 'category_id', 'category', 'description', 'rank'],
+        'rows': [
+            [pk, day.isoformat(), str(amount), category_id, category, description, round(rank, 6)]
+            for pk, day, amount, category_id, category, description, rank in rows
+        ],
+    }, json_dumps_params=COMPACT_JSON)
+
+@staff_member_required
+def metrics(request):
+    """Per-view request measurements, aggregate cache hit rates and the
+    alert queue's depth and lag"""
+    return JsonResponse({
+        'views': request_metrics(),
+        'cache': cache_stats(),
+        'alert_queue': queue_metrics(),
+    })
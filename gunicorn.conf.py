@@ -0,0 +1,17 @@
+"""Gunicorn configuration.
+
+WSGI:  gunicorn -c gunicorn.conf.py expense_tracker.wsgi:application
+ASGI:  gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker expense_tracker.asgi:application
+
+The async API views (expenses.async_views) only run their queries
+concurrently when served over ASGI.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+accesslog = '-'